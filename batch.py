@@ -0,0 +1,719 @@
+"""
+This module is used for crawling whole folders of Summary files/webpages in
+batch. Each file is handed to a pool of worker processes, and every worker
+runs the same steps as main.py does for a single file:
+
+    file_operation.file_read -> pq -> summary.Summary -> output sinks
+
+The parser backend of the document ('pyquery' or 'lxml') could be chosen by
+'-b', see in parser_backend.py. With '--manifest', the files unchanged since
+the last run are skipped, see in manifest.py. With '--cache', the result of
+a page already crawled (same content) is taken from the cache, see in
+result_cache.py. With '--prune', the html is shrunk before it's parsed, see
+in html_prune.py. The pages could also be read straight out of .zip and
+.tar(.gz/.bz2/.xz) archives given as inputs, see in sources.py. With
+'--delta', only the changes of each property since its last crawled version
+are written into the sinks, see in delta_store.py. With '--metrics', the
+timings of each step and segment are aggregated from all workers and written
+into a snapshot file, see in metrics.py.
+
+Usage:
+    python batch.py F:/.../Offices F:/.../Multifamily -p 8 -s json -s redis
+    python batch.py "F:/.../2018_5_25_new_source_files/*/0*.html" -b lxml
+    python batch.py dumps/2018_5_25.zip "dumps/*.tar.gz" -s jsonl
+    python batch.py dumps/2018_6_25.zip -s jsonl --delta output/delta.db
+
+Functions:
+    collect_files(inputs) -> sorted list of file paths
+    get_file_id(file_path) -> file id, e.g. '020-1' for '.../020-1.html'
+    crawl_file(file_path, backend, only, prune, input_mode) -> Summary object
+    crawl_html(html, file_id, backend, only, prune) -> summary.Summary object
+    save_delta(delta, sinks, json_path, writers) -> None
+    make_writers(sinks, jsonl_path, redis_url, ...) -> dict of the batched
+        writers
+    run_batch(inputs, processes, sinks, json_path, chunksize) -> stats dict
+"""
+
+
+import argparse
+import glob
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import re
+import time
+import delta_store
+import dup_policy
+import extraction_plan
+import file_operation
+import html_prune
+import id_add
+import jsonl_sink
+import manifest
+import metrics
+import parser_backend
+import record_store
+import redis_writer
+import result_cache
+import sources
+import stream_extract
+import summary
+
+
+HTML_EXTENSIONS = ('.html', '.htm')
+PRUNE_MODES = ('blocks', 'regions')
+INPUT_MODES = ('mmap', 'read', 'stream')
+SINKS = ('json', 'jsonl', 'redis', 'redis-batch', 'csv')
+# The max number of the new versions of the delta store not committed, the
+# sinks are flushed and the versions committed after them.
+DELTA_COMMIT_RECORDS = 1000
+
+# Settings and sink writers of each worker process, assigned by
+# _init_worker().
+_worker_settings = {}
+_worker_writers = {}
+_worker_cache = None
+_worker_manifest = None
+# The (file_path, fingerprint) of the files whose results are still buffered
+# in the sink writers of the worker, not recorded into the manifest yet.
+_worker_unflushed = []
+
+
+def collect_files(inputs):
+    """collect_files(inputs) -> <list obj. of file paths>
+
+    :param:
+    :inputs: Folders, files or glob patterns (like 'Offices/*.html' or
+        'dumps/**/*.html'). Folders are walked recursively and only the
+        files with the extensions in HTML_EXTENSIONS are collected. The
+        archives are left to sources.collect_archives().
+
+    :return: Sorted list of the file paths without duplicates.
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.update(os.path.join(root, name) for name in names
+                             if name.lower().endswith(HTML_EXTENSIONS))
+        elif os.path.isfile(item):
+            if not sources.is_archive(item):
+                files.add(item)
+        else:
+            files.update(path for path in glob.glob(item, recursive=True)
+                         if os.path.isfile(path) and
+                         not sources.is_archive(path))
+    return sorted(files)
+
+
+def get_file_id(file_path):
+    """The file id is the file name without the '.htm(l)' extension."""
+    return re.match(r".*(?=.htm)", os.path.basename(file_path)).group()
+
+
+def crawl_file(file_path, backend='pyquery', only=None, prune=None,
+               input_mode='mmap'):
+    """crawl_file(file_path, backend, only, prune, input_mode)
+        -> <summary.Summary obj.>
+
+    The single-file crawling path shared by main.py and the batch workers,
+    so both of them give the same result for the same file.
+
+    :param:
+    :backend: The parser backend of the document, see in parser_backend.py.
+    :only: The segments titles to be crawled, by default (None) all of them.
+    :prune: Shrink the html before it's parsed, 'blocks' (empty the script,
+        style, svg... blocks out of the crawled regions) or 'regions' (also
+        keep only the header and '#content' regions), by default (None) not
+        pruned, see in html_prune.py.
+    :input_mode: 'mmap' (the file is memory-mapped and parsed from bytes,
+        see in parser_backend.parse_file()), 'read' (the file is read and
+        decoded into a str first) or 'stream' (only the nodes to be crawled
+        are kept while the file is parsed, see in stream_extract.py, for the
+        very large files). The pruned files are always read.
+    """
+    if input_mode == 'stream' and not prune:
+        return stream_extract.crawl_file(file_path, get_file_id(file_path),
+                                         backend, only)
+    if input_mode == 'mmap' and not prune:
+        with metrics.timer('parse_seconds', backend=backend, input='mmap'):
+            doc = parser_backend.parse_file(file_path, backend)
+        with metrics.timer('summary_seconds'):
+            return summary.Summary(doc, get_file_id(file_path), only=only)
+    with metrics.timer('read_seconds'):
+        file = file_operation.file_read(file_path)
+    return crawl_html(file, get_file_id(file_path), backend, only, prune)
+
+
+def crawl_html(html, file_id, backend='pyquery', only=None, prune=None):
+    """crawl_html(html, file_id, backend, only, prune) -> <Summary obj.>
+
+    The same as crawl_file(), for the source code already read (e.g. sent to
+    the daemon.py).
+    """
+    if prune:
+        with metrics.timer('prune_seconds', mode=prune):
+            html = html_prune.prune(html, keep_regions=(prune == 'regions'))
+    with metrics.timer('parse_seconds', backend=backend):
+        doc = parser_backend.parse(html, backend)
+    with metrics.timer('summary_seconds'):
+        return summary.Summary(doc, file_id, only=only)
+
+
+def extractor_version(only=None, spec_file=None, dup_policy_file=None):
+    """The version of the results for the manifest and the result cache, the
+    results of the 'only' segments, or of another spec than the default one
+    (see in extraction_plan.py), are different from the whole ones. The
+    duplicated labels are resolved by the policy file (see in
+    dup_policy.py), so its hash is part of the version if it's used."""
+    version = summary.EXTRACTOR_VERSION
+    path = extraction_plan.spec_path(spec_file)
+    if os.path.abspath(path) != extraction_plan.DEFAULT_SPEC_FILE:
+        version = '{0}:{1}@{2}'.format(version, os.path.basename(path),
+                                       extraction_plan.load_spec(path)
+                                       .get('version', ''))
+    policy_hash = dup_policy.policy_hash(dup_policy_file)
+    if policy_hash:
+        version = '{0}:policy@{1}'.format(version, policy_hash[:12])
+    if not only:
+        return version
+    return '{0}:{1}'.format(version, ','.join(sorted(only)))
+
+
+def save_result(result, file_id, sinks, json_path, writers=None):
+    """Write one Summary.result into each of the selected output sinks.
+
+    :param:
+    :writers: Dict of the batched sink writers of this process, like
+        {'jsonl': <jsonl_sink.JsonlSink obj.>,
+         'redis-batch': <redis_writer.RedisBatchWriter obj.>}
+    """
+    if 'json' in sinks:
+        with metrics.timer('sink_seconds', sink='json'):
+            file_operation.save_json(json_path, file_id, result)
+    for name, writer in (writers or {}).items():
+        if name in sinks:
+            with metrics.timer('sink_seconds', sink=name):
+                writer.write(result)
+    if 'redis' in sinks:
+        # Only imported when needed, the Redis server is not always available
+        # for the batch runs.
+        import redisdb
+        with metrics.timer('sink_seconds', sink='redis'):
+            redisdb.save_in_redis('Summary', result, 0)
+
+
+def save_delta(delta, sinks, json_path, writers=None):
+    """Write one delta record (see in delta_store.py) into each of the
+    selected output sinks, as save_result() does. The json file is named by
+    the key and the version of the property, like '020-1-v3.json', and the
+    Redis hash of the property is updated in place.
+    """
+    if 'json' in sinks:
+        with metrics.timer('sink_seconds', sink='json'):
+            file_operation.save_json(json_path, '{0}-v{1}'.format(
+                delta_store.record_key(delta),
+                delta[delta_store.VERSION_KEY]), delta)
+    writers = writers or {}
+    if 'jsonl' in writers:
+        with metrics.timer('sink_seconds', sink='jsonl'):
+            writers['jsonl'].write(delta)
+    if 'redis-batch' in writers:
+        with metrics.timer('sink_seconds', sink='redis-batch'):
+            writers['redis-batch'].write_delta(delta)
+
+
+def make_writers(sinks, jsonl_path='output/jsonl/',
+                 redis_url='redis://localhost:6379/0',
+                 jsonl_rotate_bytes=256 * 1024 * 1024,
+                 jsonl_rotate_records=None, jsonl_fsync=False):
+    """make_writers(sinks, jsonl_path, redis_url, ...)
+        -> <dict obj. of writers>
+
+    Create the batched writers of the selected sinks for save_result(), the
+    'jsonl' sink writes one shard per process, rotated by the
+    'jsonl_rotate_bytes' or 'jsonl_rotate_records' and os.fsync()ed after
+    each batch if 'jsonl_fsync', see in jsonl_sink.JsonlSink. The writers
+    have to be closed to flush the buffered records.
+    """
+    writers = {}
+    if 'jsonl' in sinks:
+        writers['jsonl'] = jsonl_sink.JsonlSink(
+            jsonl_path, rotate_bytes=jsonl_rotate_bytes,
+            rotate_records=jsonl_rotate_records, fsync=jsonl_fsync)
+    if 'redis-batch' in sinks:
+        writers['redis-batch'] = redis_writer.RedisBatchWriter(redis_url)
+    return writers
+
+
+def _init_worker(settings):
+    """Initialize the worker process by the settings of run_batch()."""
+    global _worker_cache, _worker_manifest
+    _worker_settings.update(settings)
+    # With the delta output, the results are written by the main process.
+    if not settings['delta']:
+        _worker_writers.update(make_writers(
+            settings['sinks'], settings['jsonl_path'], settings['redis_url'],
+            **settings['jsonl_options']))
+    # The buffered records are flushed when the worker exits normally
+    # (pool.close() and pool.join()).
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
+    if settings['manifest']:
+        # The members of the archives are checked by the workers, after they
+        # are read.
+        _worker_manifest = manifest.Manifest(
+            settings['manifest'],
+            extractor_version(settings['only'], settings['spec_file'],
+                              settings['dup_policy_file']))
+    if settings['cache_path']:
+        _worker_cache = result_cache.ResultCache(
+            settings['cache_path'],
+            extractor_version(settings['only'], settings['spec_file'],
+                              settings['dup_policy_file']),
+            settings['cache_max_bytes'])
+    # Load the duplicate label resolution policy and compile the spec of the
+    # segments once per worker.
+    dup_policy.load_policy(settings['dup_policy_file'])
+    extraction_plan.load_plan(settings['spec_file'])
+    if settings['metrics']:
+        metrics.enable()
+
+
+def _close_worker():
+    """Close the sink writers of the worker, then record the files whose
+    results were buffered in them into the manifest. Nothing is recorded if
+    a writer fails, so these files are processed again by the next run."""
+    for writer in _worker_writers.values():
+        writer.close()
+    if _worker_manifest is not None:
+        for file_path, fingerprint in _worker_unflushed:
+            _worker_manifest.record(file_path, *fingerprint)
+        del _worker_unflushed[:]
+        _worker_manifest.close()
+
+
+def _crawl_worker(task):
+    """Worker of the process pool -> (file_path, error message or None, info)
+
+    :task: The file path, or a member of an archive, see in sources.py. The
+        file_path of a member is '<archive>!<member>'.
+
+    :info: Dict as {'fingerprint': (size, mtime, content hash) or None,
+        'flushed': [(file_path, fingerprint), ...], 'skipped': bool,
+        'cache_hit': bool, 'bytes': size of the file, 'metrics': snapshot
+        or None}. The fingerprint is taken before the file is read, the one
+        of a member is (size, 0, content hash), and the member unchanged
+        since the last run is skipped. The files are only recorded into the
+        manifest (by the main process) once their results are written out of
+        the buffers of the sink writers, so 'flushed' has the files of this
+        worker since the last flush, or nothing while the writers still
+        buffer some results. The metrics snapshot only contains the values
+        of this file, it's merged by the main process. With the 'csv' sink or the delta output, the result is sent
+        back to the main process as info['result'].
+    """
+    info = {'fingerprint': None, 'flushed': [], 'skipped': False,
+            'cache_hit': False, 'bytes': 0, 'metrics': None, 'result': None}
+    file_path = sources.task_name(task)
+    try:
+        # The file id of a member is taken from its name in the archive.
+        file_id = get_file_id(task if isinstance(task, str) else task[2])
+        content_hash = None
+        data = None
+        if not isinstance(task, str):
+            with metrics.timer('read_seconds', input='archive'):
+                data = sources.read_task(task)
+            info['bytes'] = len(data)
+            if _worker_manifest is not None or _worker_cache is not None:
+                content_hash = hashlib.sha1(data).hexdigest()
+            if _worker_manifest is not None:
+                if _worker_manifest.is_unchanged_member(
+                        file_path, len(data), content_hash):
+                    info['skipped'] = True
+                    return file_path, None, _take_metrics(info)
+                info['fingerprint'] = (len(data), 0, content_hash)
+        elif _worker_settings['manifest']:
+            info['fingerprint'] = manifest.fingerprint(file_path)
+            content_hash = info['fingerprint'][2]
+        result = None
+        if _worker_cache is not None:
+            if data is None:
+                content_hash = content_hash or manifest.file_hash(file_path)
+                info['bytes'] = os.path.getsize(file_path)
+            with metrics.timer('cache_seconds', op='get'):
+                result = _worker_cache.get(content_hash, info['bytes'])
+        if result is not None:
+            # The same page may be saved as another file.
+            result.update(id_add.ID(file_id))
+            info['cache_hit'] = True
+        else:
+            if data is not None:
+                result = crawl_html(sources.decode(data), file_id,
+                                    _worker_settings['backend'],
+                                    _worker_settings['only'],
+                                    _worker_settings['prune']).result
+            else:
+                result = crawl_file(file_path, _worker_settings['backend'],
+                                    _worker_settings['only'],
+                                    _worker_settings['prune'],
+                                    _worker_settings['input_mode']).result
+            if _worker_cache is not None:
+                with metrics.timer('cache_seconds', op='put'):
+                    _worker_cache.put(content_hash, result)
+        if 'csv' in _worker_settings['sinks'] or _worker_settings['delta']:
+            info['result'] = result
+        if not _worker_settings['delta']:
+            save_result(result, file_id, _worker_settings['sinks'],
+                        _worker_settings['json_path'], _worker_writers)
+        if info['fingerprint']:
+            _worker_unflushed.append((file_path, info['fingerprint']))
+        if not any(writer.buffered for writer in _worker_writers.values()):
+            info['flushed'] = list(_worker_unflushed)
+            del _worker_unflushed[:]
+    except Exception as e:
+        metrics.incr('files_total', status='failed')
+        return file_path, "{0}: {1}".format(type(e).__name__, e), \
+            _take_metrics(info)
+    metrics.incr('files_total',
+                 status='cached' if info['cache_hit'] else 'ok')
+    return file_path, None, _take_metrics(info)
+
+
+def _take_metrics(info):
+    """Move the metrics recorded since the last file into the info."""
+    if metrics.enabled():
+        info['metrics'] = metrics.snapshot()
+        metrics.reset()
+    return info
+
+
+def run_batch(inputs, processes=None, sinks=('json',),
+              json_path='output/json/', chunksize=4, report_every=100,
+              dup_policy_file=None, backend='pyquery',
+              jsonl_path='output/jsonl/', csv_path='output/csv/',
+              redis_url='redis://localhost:6379/0', manifest_path=None,
+              cache_path=None, cache_max_bytes=1024 ** 3, only=None,
+              prune=None, metrics_path=None, metrics_format='json',
+              metrics_interval=10.0, input_mode='mmap', spec_file=None,
+              delta_path=None, jsonl_rotate_bytes=256 * 1024 * 1024,
+              jsonl_rotate_records=None, jsonl_fsync=False):
+    """run_batch(inputs, processes, sinks, json_path, chunksize) -> dict
+
+    :param:
+    :inputs: See in batch.collect_files(), and the archives in
+        sources.collect_archives(), whose members are crawled after the files.
+    :processes: The number of worker processes, by default (None) all cores
+        of the machine (os.cpu_count()) are used.
+    :sinks: The output sinks of each Summary.result, see in SINKS.
+    :json_path: The folder of the json files when 'json' is in sinks.
+    :chunksize: The number of files sent to a worker at one time.
+    :report_every: Log the progress (files/sec) after every n files.
+    :dup_policy_file: The duplicate label resolution policy, see in
+        dup_policy.load_policy().
+    :backend: The parser backend of the document, see in parser_backend.py.
+    :jsonl_path: The folder of the json lines files when 'jsonl' is in sinks.
+    :csv_path: The folder of the 'summary.csv' file when 'csv' is in sinks.
+        The results are kept in a record_store.RecordStore by the main
+        process, and the csv file (whose header is the union of all keys) is
+        written when the batch finishes. The file is replaced by each run,
+        so the 'csv' sink can't be used with the manifest or the delta
+        output.
+    :redis_url: The Redis url when 'redis-batch' is in sinks, see in
+        redis_writer.py.
+    :manifest_path: The SQLite manifest of the incremental crawling, by
+        default (None) all files are processed, see in manifest.py.
+    :cache_path: The SQLite result cache, by default (None) not used, see in
+        result_cache.py.
+    :cache_max_bytes: The max size of the result cache.
+    :only: The segments titles to be crawled, by default (None) all of them.
+    :prune: See in batch.crawl_file().
+    :metrics_path: The file of the metrics snapshot, by default (None) the
+        metrics are disabled, see in metrics.py.
+    :metrics_format: The format of the snapshot, 'json' or 'prometheus'.
+    :metrics_interval: The seconds between two snapshots during the batch,
+        the last one is written when the batch finishes.
+    :input_mode: See in batch.crawl_file().
+    :spec_file: The json spec of the segments, see in
+        extraction_plan.load_spec().
+    :jsonl_rotate_bytes, jsonl_rotate_records, jsonl_fsync: The rotation
+        and the fsync of the 'jsonl' files, see in batch.make_writers().
+    :delta_path: The SQLite store of the last version of each property, by
+        default (None) the whole results are written. Otherwise the results
+        are compared with the store by the main process, and only the delta
+        records of the changed properties are written into the 'json',
+        'jsonl' and 'redis-batch' sinks, see in delta_store.py. The 'only'
+        results aren't whole versions of the properties, so they can't be
+        compared. A property found again in another file of the batch (the
+        same ID) is counted as failed.
+
+    :return: Dict of the batch statistics as {'files': n, 'skipped': n,
+        'failed': n, 'seconds': t, 'files_per_sec': r}, and
+        {'cache_hit_ratio': r, 'cache_bytes_saved': n} if the cache is used,
+        and {'delta': delta_store.DeltaStore.stats()} with the delta output.
+    """
+    if delta_path and 'redis' in sinks:
+        raise ValueError("The delta output isn't supported by the 'redis' "
+                         "sink, use the 'redis-batch' sink instead.")
+    if delta_path and only:
+        raise ValueError("The delta output needs the whole results, it "
+                         "isn't supported with the 'only' segments.")
+    if 'csv' in sinks and (manifest_path or delta_path):
+        raise ValueError("The 'csv' sink is written from the results of "
+                         "this run only, it isn't supported with the "
+                         "manifest (the skipped files would be lost) or "
+                         "the delta output.")
+    # The unknown 'only' segments would fail every file.
+    extraction_plan.compile_spec(extraction_plan.load_spec(spec_file)) \
+        .check_only(only)
+    files = collect_files(inputs)
+    archives = sources.collect_archives(inputs)
+    skipped = 0
+    mf = None
+    if manifest_path:
+        mf = manifest.Manifest(manifest_path,
+                               extractor_version(only, spec_file,
+                                                 dup_policy_file))
+        pending = mf.pending(files)
+        skipped = len(files) - len(pending)
+        files = pending
+    processes = processes or os.cpu_count() or 1
+    # file_operation.save_json() joins the folder and file name directly.
+    json_path = os.path.join(json_path, '')
+    if 'json' in sinks:
+        os.makedirs(json_path, exist_ok=True)
+    logging.info("Batch crawling {0} files ({1} unchanged skipped) and {2} "
+                 "archives with {3} processes ({4})...".format(
+                     len(files), skipped, len(archives), processes, backend))
+
+    failed = 0
+    start = time.perf_counter()
+    settings = {
+        'sinks': tuple(sinks),
+        'json_path': json_path,
+        'jsonl_path': jsonl_path,
+        'redis_url': redis_url,
+        'dup_policy_file': dup_policy_file,
+        'spec_file': spec_file,
+        'backend': backend,
+        'manifest': manifest_path,
+        'cache_path': cache_path,
+        'cache_max_bytes': cache_max_bytes,
+        'only': only,
+        'prune': prune,
+        'metrics': bool(metrics_path),
+        'input_mode': input_mode,
+        'delta': bool(delta_path),
+        'jsonl_options': {'jsonl_rotate_bytes': jsonl_rotate_bytes,
+                          'jsonl_rotate_records': jsonl_rotate_records,
+                          'jsonl_fsync': jsonl_fsync}
+    }
+    snapshot_writer = None
+    if metrics_path:
+        metrics.enable()
+        snapshot_writer = metrics.SnapshotWriter(
+            metrics_path, metrics_format, metrics_interval)
+    cache_hits = 0
+    cache_bytes_saved = 0
+    store = record_store.RecordStore() if 'csv' in sinks else None
+    deltas = None
+    delta_writers = {}
+    # The flushed files of the workers, recorded into the manifest once the
+    # delta records of the main process are flushed too.
+    flushed = []
+    if delta_path:
+        deltas = delta_store.DeltaStore(delta_path)
+        delta_writers = make_writers(sinks, jsonl_path, redis_url,
+                                     **settings['jsonl_options'])
+    # The members of the tar archives are sent with their content, so the
+    # tasks are fed to the pool only as fast as they're finished.
+    feed = sources.BoundedFeed(
+        itertools.chain(files, sources.iter_archive_tasks(archives)),
+        max(64, processes * chunksize * 4))
+    # The number of the archive members isn't known before they're read.
+    total = len(files) if not archives else '?'
+    done = 0
+    skipped_members = 0
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(settings,)) as pool:
+        try:
+            for done, (file_path, error, info) in enumerate(
+                    pool.imap_unordered(_crawl_worker, feed, chunksize), 1):
+                feed.release()
+                if info['skipped']:
+                    # A member of an archive unchanged since the last run.
+                    skipped_members += 1
+                    continue
+                if info['cache_hit']:
+                    cache_hits += 1
+                    cache_bytes_saved += info['bytes']
+                if not error and deltas is not None:
+                    try:
+                        delta = deltas.delta(info['result'])
+                    except ValueError as e:
+                        # The same property is in two files of the batch,
+                        # the second one isn't recorded into the manifest.
+                        error = "{0}: {1}".format(type(e).__name__, e)
+                        info['flushed'] = [f for f in info['flushed']
+                                           if f[0] != file_path]
+                    else:
+                        if delta is not None:
+                            save_delta(delta, sinks, json_path,
+                                       delta_writers)
+                if error:
+                    failed += 1
+                    logging.warning("Failed: {0} -> {1}".format(file_path,
+                                                                error))
+                elif store is not None:
+                    store.add(info['result'])
+                if mf is not None:
+                    flushed.extend(info['flushed'])
+                if deltas is not None and \
+                        deltas.staged >= DELTA_COMMIT_RECORDS:
+                    for writer in delta_writers.values():
+                        writer.flush()
+                # The new versions of the delta store and the files of the
+                # manifest are committed once the delta records are written
+                # out of the buffers of the sinks.
+                if not any(writer.buffered
+                           for writer in delta_writers.values()):
+                    if deltas is not None:
+                        deltas.commit()
+                    if mf is not None:
+                        for path, fingerprint in flushed:
+                            mf.record(path, *fingerprint)
+                        flushed = []
+                if snapshot_writer is not None:
+                    metrics.merge(info['metrics'])
+                    snapshot_writer.maybe_write()
+                if done % report_every == 0:
+                    elapsed = time.perf_counter() - start
+                    logging.info("{0}/{1} files, {2:.2f} files/sec"
+                                 .format(done, total, done / elapsed))
+        finally:
+            # Stop the feeding thread of the pool if the batch failed.
+            feed.close()
+        # Let the workers exit normally to flush their sinks.
+        pool.close()
+        pool.join()
+    for writer in delta_writers.values():
+        writer.close()
+    if deltas is not None:
+        deltas.commit()
+    elapsed = time.perf_counter() - start
+    done -= skipped_members
+    skipped += skipped_members
+    if mf is not None:
+        for path, fingerprint in flushed:
+            mf.record(path, *fingerprint)
+        mf.close()
+    if snapshot_writer is not None:
+        snapshot_writer.write()
+    if store is not None:
+        store.write_csv(csv_path, 'summary')
+        logging.info("Csv of {0} is saved into {1}".format(
+            store.stats(), csv_path))
+
+    stats = {
+        'files': done,
+        'skipped': skipped,
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'files_per_sec': round(done / elapsed, 2) if elapsed else 0.0
+    }
+    if cache_path:
+        stats['cache_hit_ratio'] = round(cache_hits / done, 4) \
+            if done else 0.0
+        stats['cache_bytes_saved'] = cache_bytes_saved
+    if deltas is not None:
+        stats['delta'] = deltas.stats()
+        deltas.close()
+    logging.info("Batch finished: {0}".format(stats))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Crawl the Summary files/webpages of whole folders.')
+    parser.add_argument('inputs', nargs='+',
+                        help='folders, files or glob patterns')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='worker processes (default: all cores)')
+    parser.add_argument('-s', '--sink', action='append', choices=SINKS,
+                        dest='sinks', help='output sinks (default: json)')
+    parser.add_argument('--json-path', default='output/json/',
+                        help='folder of the json output files')
+    parser.add_argument('--jsonl-path', default='output/jsonl/',
+                        help='folder of the json lines output files')
+    parser.add_argument('--jsonl-rotate-mb', type=int, default=256,
+                        help='start a new json lines file after this size')
+    parser.add_argument('--jsonl-rotate-records', type=int, default=None,
+                        help='start a new json lines file after this number '
+                             'of records')
+    parser.add_argument('--jsonl-fsync', action='store_true',
+                        help='fsync the json lines files after each batch')
+    parser.add_argument('--csv-path', default='output/csv/',
+                        help='folder of the csv output file')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/0',
+                        help='Redis url of the redis-batch sink')
+    parser.add_argument('--manifest', default=None,
+                        help='SQLite manifest, skip the unchanged files')
+    parser.add_argument('--cache', default=None,
+                        help='SQLite cache of the results of crawled pages')
+    parser.add_argument('--cache-max-mb', type=int, default=1024,
+                        help='max size of the result cache (MB)')
+    parser.add_argument('--delta', default=None,
+                        help='SQLite store of the last versions, only write '
+                             'the changes of each property')
+    parser.add_argument('--only', action='append', default=None,
+                        help='only crawl this segment, like "Sale"')
+    parser.add_argument('--prune', default=None, choices=PRUNE_MODES,
+                        help='shrink the html before it is parsed')
+    parser.add_argument('--input', default='mmap', choices=INPUT_MODES,
+                        dest='input_mode',
+                        help='memory-map the files, read them as str, or '
+                             'stream them (for the very large files)')
+    parser.add_argument('--metrics', default=None,
+                        help='file of the metrics snapshot')
+    parser.add_argument('--metrics-format', default='json',
+                        choices=metrics.FORMATS,
+                        help='format of the metrics snapshot')
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help='seconds between two metrics snapshots')
+    parser.add_argument('--chunksize', type=int, default=4,
+                        help='files sent to a worker at one time')
+    parser.add_argument('--dup-policy', default=None,
+                        help='json policy of the duplicate label resolution')
+    parser.add_argument('--spec', default=None,
+                        help='json spec of the segments to be crawled')
+    parser.add_argument('-b', '--backend', default='pyquery',
+                        choices=parser_backend.BACKENDS,
+                        help='parser backend of the documents')
+    args = parser.parse_args()
+
+    logging.basicConfig(filename='CoStar_log.log', level=logging.DEBUG)
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logging.getLogger().addHandler(console)
+
+    run_batch(args.inputs, args.processes, args.sinks or ('json',),
+              args.json_path, args.chunksize,
+              dup_policy_file=args.dup_policy, backend=args.backend,
+              jsonl_path=args.jsonl_path, csv_path=args.csv_path,
+              redis_url=args.redis_url,
+              manifest_path=args.manifest, cache_path=args.cache,
+              cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+              only=args.only, prune=args.prune, metrics_path=args.metrics,
+              metrics_format=args.metrics_format,
+              metrics_interval=args.metrics_interval,
+              input_mode=args.input_mode, spec_file=args.spec,
+              delta_path=args.delta,
+              jsonl_rotate_bytes=args.jsonl_rotate_mb * 1024 * 1024,
+              jsonl_rotate_records=args.jsonl_rotate_records,
+              jsonl_fsync=args.jsonl_fsync)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+This package is used for measuring the extraction performance on synthetic
+Summary pages, so the regressions could be compared across commits.
+
+Modules:
+    page_gen.py -> generate the synthetic Summary pages with configurable size
+    run.py -> time the parsing, each Summary segment, crawl_table and
+        pairs_gene, and save the timings into a json file
+
+Usage (from the root folder of the repository):
+    python -m benchmark.run
+    python -m benchmark.run --sizes small large -r 10 -o output/benchmark/
+    python -m benchmark.run --compare output/benchmark/old.json
+"""
@@ -0,0 +1,252 @@
+"""
+This module is used for generating the synthetic Summary pages, which have
+the same structure (css classes, ids and data-bind attributes) as the saved
+CoStar Summary pages crawled by summary.Summary.
+
+The size of the page is configured by the number of tenants rows, traffic
+rows, market conditions sub-tables, amenities and demographics rows. The
+pages are generated by a seeded random generator, the same arguments always
+give the same page.
+
+Usage:
+    python -m benchmark.page_gen output/benchmark/pages --tenants 500
+
+Functions:
+    page(tenants, traffic, market_tables, amenities, demographics, seed)
+        -> str of the html
+    write_pages(folder, count, **sizes) -> list of the file paths
+"""
+
+
+import argparse
+import os
+import random
+
+
+# The sub-tables of 'Market Conditions' and their data-bind, see in
+# summary.Summary.market_conditions(). 'Submarket Sales Activity' is always
+# the last sub-table, which has the 'Current', 'Prev Year' headers.
+MARKET_TABLES = [
+    ('Vacancy Rates', 'hasVacancyRate'),
+    ('Submarket Leasing Activity', 'hasTwelveMonthActivity'),
+    ('Same Store Asking Rent Per SF', 'hasAskingRent'),
+    ('Concessions', 'hasConcessions'),
+    ('Under Construction Units', 'hasConstructionUnits')
+]
+LAST_MARKET_TABLE = ('Submarket Sales Activity', 'hasSalesActivity')
+AMENITIES_PARTS = ('Unit Amenities', 'Site Amenities')
+DEMOGRAPHICS_RADIUS = ('1 Mile', '3 Mile', '5 Mile')
+TRANSPORTATION = ('hasSubways', 'hasCommuterRail', 'hasAirports')
+
+
+def _pairs(attr, pairs):
+    out = ['<div {0}>'.format(attr)]
+    for k, v in pairs:
+        out.append('<div class="label-value-pair"><span class="label">{0}'
+                   '</span><span>{1}</span></div>'.format(k, v))
+    out.append('</div>')
+    return '\n'.join(out)
+
+
+def _table(attr, headers, rows):
+    out = ['<table {0}><thead><tr>'.format(attr)]
+    out += ['<th>{0}</th>'.format(h) for h in headers]
+    out.append('</tr></thead><tbody>')
+    for r in rows:
+        out.append('<tr>' + ''.join('<td>{0}</td>'.format(c) for c in r) +
+                   '</tr>')
+    out.append('</tbody></table>')
+    return '\n'.join(out)
+
+
+def page(tenants=20, traffic=10, market_tables=3, amenities=10,
+         demographics=5, seed=1):
+    """page(tenants, traffic, market_tables, ...) -> <str obj. of the html>
+
+    :param:
+    :tenants: The number of rows of the Tenants table.
+    :traffic: The number of rows of the Traffic table.
+    :market_tables: The number of sub-tables of Market Conditions
+        (1 to len(MARKET_TABLES) + 1), the last one is always the
+        'Submarket Sales Activity'.
+    :amenities: The number of amenities of each amenities part.
+    :demographics: The number of rows of the Demographics table.
+    :seed: The seed of the random values.
+    """
+    rnd = random.Random(seed)
+    s = ['<html><head><title>Summary</title>'
+         '<script>var viewModel = {"html": "<div></div>"};</script>'
+         '<style>.label {font-weight: bold}</style></head><body>',
+         '<div class="subHeaderContainer">'
+         '<div style="float:left">{0} E Franklin St - Plaza</div>'
+         '<b>Chapel Hill, NC 27514</b></div>'.format(rnd.randint(1, 999)),
+         '<div id="content">']
+
+    s.append('<h1>Sale</h1>')
+    s.append(_pairs('data-viewmodelname="propertySale"',
+                    [('Sold Price', '${0},000'.format(rnd.randint(1, 9999))),
+                     ('Date', 'Apr 2014'), ('Sale Type', 'Investment')]))
+    s.append('<h1>For Lease</h1>')
+    # The duplicate 'Total Available' is chosen by pairs_gene(inp=1).
+    s.append(_pairs('data-viewmodelname="propertyForLease"',
+                    [('Smallest Space', '{0} SF'.format(rnd.randint(1, 999))),
+                     ('Total Available', ' '),
+                     ('Total Available', '{0} SF'.format(rnd.randint(1, 99))),
+                     ('% Leased', '{0}%'.format(rnd.randint(0, 100)))]))
+    s.append('<h1>Building</h1>')
+    s.append(_pairs('data-viewmodelname="propertyBuildingInformation"',
+                    [('Type', '3 Star Retail'), ('Class', 'B'),
+                     ('Year Built', str(rnd.randint(1900, 2018))),
+                     ('RBA', '{0} SF'.format(rnd.randint(1000, 99999)))]))
+    s.append('<a data-bind="attr: {{ href: WalkScoreHelpLink }}">Walk Score'
+             '</a><span data-bind="text: FormattedWalkScore">Walkable ({0})'
+             '</span>'.format(rnd.randint(0, 100)))
+    s.append('<a data-bind="attr: {{ href: TransitScoreHelpLink }}">'
+             'Transit Score</a><span data-bind="text: FormattedTransitScore">'
+             'Good ({0})</span>'.format(rnd.randint(0, 100)))
+    s.append('<h1>Land</h1>')
+    s.append(_pairs('data-viewmodelname="propertyLand"',
+                    [('Land Acres', '{0:.2f} AC'.format(rnd.random() * 9)),
+                     ('Zoning', 'C-1')]))
+    s.append('<h1>Location</h1>')
+    s.append(_pairs('class="property-location"',
+                    [('Zip', '27514'), ('Submarket', 'Chapel Hill'),
+                     ('Market', 'Raleigh')]))
+    s.append('<h1>Property Contacts</h1>')
+    s.append(_pairs('class="property-contacts"',
+                    [('True Owner', 'Owner Co'), ('Architect', 'Arch Inc')]))
+
+    s.append('<h1>Amenities</h1><div class="amenities">')
+    for part in AMENITIES_PARTS:
+        s.append('<div class="amenities-header">{0}</div>'
+                 '<div class="{1}"><div class="amenities-content">'
+                 .format(part, part.lower().replace(' ', '-')))
+        s += ['<div>{0} {1}</div>'.format(part.split()[0], i)
+              for i in range(amenities)]
+        s.append('</div></div>')
+    s.append('</div>')
+
+    s.append('<h1>Tenants</h1>')
+    s.append(_table('id="TenantsTable"',
+                    ['Name', 'Industry', 'SF Occupied', 'Exp Date'],
+                    [['<div>&#8226;</div>Tenant {0}'.format(i), 'Retailers',
+                      '{0} SF'.format(rnd.randint(100, 9000)), '-']
+                     for i in range(tenants)]))
+    s.append('<h1>Traffic</h1>')
+    s.append(_table('id="TrafficTable"',
+                    ['Collection Street', 'Cross Street', 'Traffic Vol'],
+                    [['Street {0}'.format(i), 'Cross {0}'.format(i),
+                      str(rnd.randint(100, 99999))]
+                     for i in range(traffic)]))
+    s.append('<h1>Unit Mix</h1>')
+    s.append(_table('id="UnitMixTable"', ['Bed', 'Bath', 'Units'],
+                    [['1', '1', str(rnd.randint(1, 99))],
+                     ['2', '2', str(rnd.randint(1, 99))]]))
+    s.append('<h1>Space</h1><div data-viewmodelname="propertySpaces">')
+    s.append(_table('', ['Floor', 'SF Available', 'Use'],
+                    [['P 2nd', '1,000', 'Office'],
+                     ['P 3rd', '2,000', 'Office']]))
+    s.append('</div>')
+    s.append('<h1>Leasing Activity</h1>')
+    s.append(_table('id="LeasingActivityTable"', ['Sign Date', 'SF', 'Rent'],
+                    [['Dec 2017', '1,200', '-'], ['Feb 2018', '900', '$21']]))
+
+    s.append('<h1>Demographics</h1>')
+    s.append(_table('id="DemogrpahicsTable"', ('',) + DEMOGRAPHICS_RADIUS,
+                    [['Population {0}'.format(i)] +
+                     [str(rnd.randint(100, 99999)) for _ in DEMOGRAPHICS_RADIUS]
+                     for i in range(demographics)]))
+    s.append(_table('id="DemogrpahicsTrendTable"', ('',) + DEMOGRAPHICS_RADIUS,
+                    [['Growth {0}'.format(i)] +
+                     ['{0}%'.format(rnd.randint(0, 9))
+                      for _ in DEMOGRAPHICS_RADIUS]
+                     for i in range(demographics)]))
+
+    s.append('<h1>Assessment</h1><div id="assesmentInformationContainer">'
+             '<div data-bind="if: showAssessedYear()"><span>2017</span></div>'
+             '<div class="column"><div class="row"></div>'
+             '<div class="row">Total</div><div class="row">Per SF</div></div>')
+    for sub in ('Improvements', 'Land', 'Total Value'):
+        s.append('<div class="column"><div class="row">'
+                 '<span class="subheader">{0}</span></div>'
+                 '<div class="row">${1}</div><div class="row">${2:.2f}</div>'
+                 '</div>'.format(sub, rnd.randint(1000, 999999),
+                                 rnd.random() * 100))
+    s.append('</div>')
+
+    s.append('<h1>Market Conditions</h1>'
+             '<div class="property-marketConditions">'
+             '<div class="section-header column">Current</div>'
+             '<div class="section-header column">YOY Change</div>')
+    tables = MARKET_TABLES[:max(market_tables - 1, 0)] + [LAST_MARKET_TABLE]
+    for title, bind in tables:
+        s.append('<h4>{0}</h4><div data-bind="visible: {1}">'
+                 .format(title, bind))
+        if bind == LAST_MARKET_TABLE[1]:
+            s.append('<div class="table-row"><div class="headerLabel">Current'
+                     '</div><div class="headerLabel">Prev Year</div></div>')
+        for r in ('Subject Property', 'Submarket', 'Market'):
+            s.append('<div class="table-row"><div>{0}</div><div>{1}%</div>'
+                     '<div>{2}%</div></div>'
+                     .format(r, rnd.randint(0, 20), rnd.randint(-5, 5)))
+        s.append('</div>')
+    s.append('</div>')
+
+    s.append('<h1>Public Transportation</h1>'
+             '<div class="public-transportation-layout">')
+    for bind in TRANSPORTATION:
+        s.append("<div data-bind='visible: {0}'><div class='head'>"
+                 "<div class='column'>{1}</div><div class='column'>Drive</div>"
+                 "<div class='column'>Distance</div></div>"
+                 "<div data-bind='foreach: data.Items'>".format(bind, bind[3:]))
+        for r in range(2):
+            s.append("<div class='row'><div class='column'>Stop {0}</div>"
+                     "<div class='column'>{1} min</div>"
+                     "<div class='column'>{2:.1f} mi</div></div>"
+                     .format(r, rnd.randint(1, 30), rnd.random() * 9))
+        s.append('</div></div>')
+    s.append('</div>')
+
+    s.append('<h1>Documents</h1><h1>Building Notes</h1>')
+    s.append('</div><script>window.loaded = true;</script></body></html>')
+    return '\n'.join(s)
+
+
+def write_pages(folder, count=1, **sizes):
+    """write_pages(folder, count, **sizes) -> <list obj. of the file paths>
+
+    Write 'count' pages (with different seeds) into the folder, named as the
+    saved pages are, like '001-1.html'. The sizes are passed to page().
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, '{0:03d}-1.html'.format(i + 1))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(page(seed=i + 1, **sizes))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic Summary pages.')
+    parser.add_argument('folder', help='folder of the generated pages')
+    parser.add_argument('-n', '--count', type=int, default=1,
+                        help='number of pages')
+    parser.add_argument('--tenants', type=int, default=20)
+    parser.add_argument('--traffic', type=int, default=10)
+    parser.add_argument('--market-tables', type=int, default=3)
+    parser.add_argument('--amenities', type=int, default=10)
+    parser.add_argument('--demographics', type=int, default=5)
+    args = parser.parse_args()
+    paths = write_pages(args.folder, args.count, tenants=args.tenants,
+                        traffic=args.traffic,
+                        market_tables=args.market_tables,
+                        amenities=args.amenities,
+                        demographics=args.demographics)
+    print("{0} pages are written into {1}".format(len(paths), args.folder))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+This module is used for timing the extraction on the synthetic Summary pages
+of benchmark/page_gen.py, separately for:
+
+    parse               parser_backend.parse() of the html
+    index               Summary(lazy=True), the sections index and titles
+    segment.<Title>     each Summary segment method, like 'segment.Tenants'
+    crawl_table         tool_funcs.crawl_table() of the Tenants table
+    rearrange_table.<Table>
+                        tool_funcs.rearrange_table_numbering_headers() of the
+                        crawled Tenants or Traffic table
+    rearrange_table_numpy.<Table>
+                        the same with the former numpy transpose of the rows,
+                        for comparing (only if numpy is installed)
+    pairs_gene          tool_funcs.pairs_gene() of the For Lease pairs
+    summary             the whole Summary(...).result of a parsed document
+
+The hits and misses of the per-document selector memo (see in
+section_index.py) over all benchmarks of a page size are saved as its
+'selector_memo'.
+
+Each benchmark is run 'repeat' times on each page size, and the min, median,
+mean and max (in milliseconds) are saved into a json file named by the git
+commit, like 'output/benchmark/bench-0b5c7ef-20180525-101500.json', so the
+files of two commits could be compared by '--compare'.
+
+Usage (from the root folder of the repository):
+    python -m benchmark.run --sizes small medium -r 10
+    python -m benchmark.run --compare output/benchmark/bench-old.json
+
+Functions:
+    run(sizes, repeat, backend) -> dict of the timings
+    save(report, folder) -> path of the json file
+    compare(old, new, threshold) -> list of the regressions
+"""
+
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import parser_backend
+import section_index
+import summary
+import tool_funcs
+from benchmark import page_gen
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The page sizes, see the arguments of page_gen.page().
+SIZES = {
+    'small': dict(tenants=5, traffic=5, market_tables=2, amenities=5,
+                  demographics=3),
+    'medium': dict(tenants=50, traffic=20, market_tables=4, amenities=20,
+                   demographics=10),
+    'large': dict(tenants=500, traffic=200, market_tables=6, amenities=100,
+                  demographics=50)
+}
+WEB_ID = '001-1'
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The numbered-header tables of the page, benchmarked on their own.
+NUMBERED_TABLES = ('Tenants', 'Traffic')
+
+
+def _stats(seconds):
+    ms = [s * 1000 for s in seconds]
+    return {
+        'repeat': len(ms),
+        'min_ms': round(min(ms), 4),
+        'median_ms': round(statistics.median(ms), 4),
+        'mean_ms': round(statistics.mean(ms), 4),
+        'max_ms': round(max(ms), 4)
+    }
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _numpy_numbering_headers(table, pre_add):
+    """The former tool_funcs.rearrange_table_numbering_headers(), whose data
+    is transposed by numpy (only the rectangular tables)."""
+    h = ["{0}_{1}".format(pre_add, item) for item in table['headers']]
+    d = table['data']
+    t_headers = [item + "_" + str(i + 1) for item in h for i in range(len(d))]
+    t_data = numpy.array(d).ravel('F').tolist()
+    return t_headers, t_data
+
+
+def bench_page(html, repeat=5, backend='pyquery'):
+    """bench_page(html, repeat, backend) -> {benchmark name: stats dict}"""
+    timings = {}
+
+    def add(name, seconds):
+        timings.setdefault(name, []).append(seconds)
+
+    for _ in range(repeat):
+        gc.collect()
+        add('parse', _timed(parser_backend.parse, html, backend))
+
+        # The segments are memoized by the Summary, so each round crawls a
+        # new document.
+        doc = parser_backend.parse(html, backend)
+        start = time.perf_counter()
+        s = summary.Summary(doc, WEB_ID, lazy=True)
+        add('index', time.perf_counter() - start)
+        for title in s.titles_in_web:
+            method = s.all_titles_methods.get(title)
+            if method is not None:
+                add('segment.' + title, _timed(lambda: list(method())))
+
+        doc = parser_backend.parse(html, backend)
+        add('crawl_table', _timed(
+            tool_funcs.crawl_table, doc, '#TenantsTable thead th',
+            '#TenantsTable tbody tr', 'td', 'Tenants', 'numbering_headers',
+            replace_string="•\n"))
+        for name in NUMBERED_TABLES:
+            table = {
+                'headers': tool_funcs.crawl_table_headers(
+                    doc, '#{0}Table thead th'.format(name)),
+                'data': tool_funcs.crawl_table_data(
+                    doc, False, '#{0}Table tbody tr'.format(name), [], 'td',
+                    "", None, None)
+            }
+            add('rearrange_table.' + name, _timed(
+                tool_funcs.rearrange_table_numbering_headers, table, name))
+            if numpy is not None:
+                add('rearrange_table_numpy.' + name, _timed(
+                    _numpy_numbering_headers, table, name))
+        add('pairs_gene', _timed(lambda: list(tool_funcs.pairs_gene(
+            doc, '[data-viewmodelname="propertyForLease"]', 'For Lease',
+            inp=1))))
+
+        doc = parser_backend.parse(html, backend)
+        add('summary', _timed(lambda: summary.Summary(doc, WEB_ID).result))
+    return {name: _stats(seconds) for name, seconds in timings.items()}
+
+
+def _git_commit():
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+            stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=REPO_ROOT, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + '-dirty' if dirty else commit
+
+
+def run(sizes=('small', 'medium', 'large'), repeat=5, backend='pyquery'):
+    """run(sizes, repeat, backend) -> <dict obj. of the report>
+
+    :param:
+    :sizes: The names of the page sizes in SIZES.
+    :repeat: The number of times each benchmark is run.
+    :backend: The parser backend, see in parser_backend.py.
+    """
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': backend,
+            'repeat': repeat,
+            'extractor_version': summary.EXTRACTOR_VERSION
+        },
+        'sizes': {}
+    }
+    for size in sizes:
+        html = page_gen.page(**SIZES[size])
+        section_index.clear()
+        # The Summary prints its progress, which isn't part of the report.
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = bench_page(html, repeat, backend)
+        report['sizes'][size] = {
+            'page': dict(SIZES[size], bytes=len(html.encode('utf-8'))),
+            'results': results,
+            'selector_memo': section_index.stats()
+        }
+    return report
+
+
+def save(report, folder='output/benchmark/'):
+    """Save the report into the folder -> path of the json file"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'bench-{0}-{1}.json'.format(
+        report['meta']['commit'], time.strftime('%Y%m%d-%H%M%S')))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare(old, new, threshold=1.1):
+    """compare(old, new, threshold) -> <list obj. of the regressions>
+
+    Print the median of each benchmark of the old and new reports, and
+    return the (size, name, ratio) of those slower than old * threshold.
+    """
+    regressions = []
+    print("{0:<8} {1:<40} {2:>11} {3:>11} {4:>7}".format(
+        'size', 'benchmark', 'old ms', 'new ms', 'ratio'))
+    for size, new_size in new['sizes'].items():
+        old_results = old['sizes'].get(size, {}).get('results', {})
+        for name, stats in sorted(new_size['results'].items()):
+            if name not in old_results:
+                continue
+            old_ms = old_results[name]['median_ms']
+            new_ms = stats['median_ms']
+            ratio = new_ms / old_ms if old_ms else float('inf')
+            flag = ''
+            if ratio > threshold:
+                flag = ' <- slower'
+                regressions.append((size, name, round(ratio, 3)))
+            print("{0:<8} {1:<40} {2:>11.3f} {3:>11.3f} {4:>7.2f}{5}".format(
+                size, name, old_ms, new_ms, ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the extraction on synthetic Summary pages.')
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium',
+                                                       'large'],
+                        choices=sorted(SIZES), help='page sizes')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='times of each benchmark')
+    parser.add_argument('-b', '--backend', default='pyquery',
+                        choices=parser_backend.BACKENDS,
+                        help='parser backend of the documents')
+    parser.add_argument('-o', '--output', default='output/benchmark/',
+                        help='folder of the json report')
+    parser.add_argument('--compare', default=None,
+                        help='json report of a former run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='ratio of the medians counted as regression')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.backend)
+    path = save(report, args.output)
+    print("Benchmark report is saved into {0}".format(path))
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old = json.load(f)
+        regressions = compare(old, report, args.threshold)
+        if regressions:
+            print("{0} benchmarks are slower than {1}x: {2}".format(
+                len(regressions), args.threshold, regressions))
+            sys.exit(1)
+    else:
+        for size, data in report['sizes'].items():
+            for name, stats in sorted(data['results'].items()):
+                print("{0:<8} {1:<40} {2:>11.3f} ms".format(
+                    size, name, stats['median_ms']))
+            print("{0:<8} selector memo: {1}".format(
+                size, data['selector_memo']))
+
+
+if __name__ == '__main__':
+    main()
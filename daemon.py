@@ -0,0 +1,262 @@
+"""
+This module is used for crawling the Summary pages by a long-lived process.
+main.py pays the interpreter start, the imports of pyquery/lxml and the
+logging setup for each page, while the daemon does them once, then each page
+only costs its parsing and extraction.
+
+The requests are json lines, each one is answered by one json line:
+
+    {"path": "F:/.../Offices/020-1.html"}
+    {"html": "<html>...</html>", "id": "020-1"}
+    {"path": "...", "only": ["Sale", "Tenants"], "return": false}
+    {"cmd": "ping"} / {"cmd": "stats"} / {"cmd": "shutdown"}
+
+    -> {"ok": true, "id": "020-1", "ms": 12.5, "result": {...}}
+    -> {"ok": false, "id": "020-1", "error": "FileNotFoundError: ..."}
+
+A line which isn't a json object is taken as a file path. The result is
+forwarded into the sinks of the daemon (see in SINKS) if any, and it's
+returned in the answer unless "return" is false (by default it's only
+returned when there's no sink).
+
+The requests are read from stdin (answered into stdout, the progress printed
+by Summary goes into stderr), or from a Unix socket, whose connections are
+served by threads while the crawling is done one page at a time.
+
+Usage:
+    python daemon.py --stdio
+    python daemon.py --socket /tmp/costar.sock -b lxml -s jsonl
+    echo '{"path": "Offices/020-1.html"}' | nc -U /tmp/costar.sock
+
+Classes:
+    Daemon(backend, prune, sinks, ...) -> daemon, daemon.handle(line)
+Functions:
+    serve_stdio(daemon, stdin, stdout)
+    serve_unix(daemon, socket_path)
+"""
+
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import batch
+import dup_policy
+import extraction_plan
+import jsonl_sink
+import parser_backend
+import section_index
+import selector_cache
+
+
+# The sinks of batch.SINKS which write each result on its own. The 'csv'
+# file is written from the records of a whole batch, so it isn't supported.
+SINKS = tuple(sink for sink in batch.SINKS if sink != 'csv')
+
+
+class Daemon(object):
+    """
+    :param:
+    :backend: The parser backend of the document, see in parser_backend.py.
+    :prune: See in batch.crawl_file().
+    :sinks: The output sinks of the results, see in SINKS, by default
+        (empty) the results are only returned.
+    :json_path, jsonl_path, redis_url: See in batch.run_batch().
+    """
+
+    def __init__(self, backend='pyquery', prune=None, sinks=(),
+                 json_path='output/json/', jsonl_path='output/jsonl/',
+                 redis_url='redis://localhost:6379/0'):
+        unsupported = set(sinks) - set(SINKS)
+        if unsupported:
+            raise ValueError("The sinks {0} aren't supported by the daemon"
+                             .format(sorted(unsupported)))
+        self.backend = backend
+        self.prune = prune
+        self.sinks = tuple(sinks)
+        self.json_path = os.path.join(json_path, '')
+        if 'json' in self.sinks:
+            os.makedirs(self.json_path, exist_ok=True)
+        self.writers = batch.make_writers(self.sinks, jsonl_path, redis_url)
+        self.requests = 0
+        self.failed = 0
+        self.closed = False
+        self._start = time.time()
+        # The pages are crawled one at a time, the Summary, the duplicate
+        # policy and the sinks aren't thread safe.
+        self._lock = threading.Lock()
+
+    def handle(self, line):
+        """handle(line) -> <dict obj. of the answer>"""
+        line = line.strip()
+        if line.startswith('{'):
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                return {'ok': False, 'error': 'Bad request: {0}'.format(e)}
+        else:
+            request = {'path': line}
+        if 'cmd' in request:
+            return self._command(request['cmd'])
+
+        answer = {'ok': True, 'id': request.get('id')}
+        start = time.perf_counter()
+        with self._lock:
+            if self.closed:
+                return {'ok': False, 'id': answer['id'],
+                        'error': 'The daemon is shut down'}
+            self.requests += 1
+            try:
+                if 'html' in request:
+                    s = batch.crawl_html(request['html'],
+                                         request.get('id') or '',
+                                         self.backend, request.get('only'),
+                                         self.prune)
+                else:
+                    path = request['path']
+                    answer['id'] = answer['id'] or batch.get_file_id(path)
+                    s = batch.crawl_file(path, self.backend,
+                                         request.get('only'), self.prune)
+                result = s.result
+                batch.save_result(result, answer['id'], self.sinks,
+                                  self.json_path, self.writers)
+            except Exception as e:
+                self.failed += 1
+                logging.warning("Failed: {0} -> {1}: {2}".format(
+                    request.get('path', answer['id']), type(e).__name__, e))
+                return {'ok': False, 'id': answer['id'],
+                        'error': '{0}: {1}'.format(type(e).__name__, e)}
+        answer['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        if request.get('return', not self.sinks):
+            answer['result'] = result
+        return answer
+
+    def _command(self, cmd):
+        if cmd == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if cmd == 'stats':
+            return {'ok': True, 'requests': self.requests,
+                    'failed': self.failed,
+                    'uptime': round(time.time() - self._start, 3),
+                    'selector_cache': selector_cache.stats(),
+                    'selector_memo': section_index.stats()}
+        if cmd == 'shutdown':
+            self.close()
+            return {'ok': True}
+        return {'ok': False, 'error': "Unknown cmd '{0}'".format(cmd)}
+
+    def close(self):
+        """Flush and close the sink writers."""
+        with self._lock:
+            if not self.closed:
+                for writer in self.writers.values():
+                    writer.close()
+                self.closed = True
+
+
+def serve_stdio(daemon, stdin=None, stdout=None):
+    """Answer the requests of stdin into stdout, until EOF or 'shutdown'."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout.buffer
+    # Summary prints its progress, which would break the answers.
+    sys.stdout = sys.stderr
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(jsonl_sink.dumps(daemon.handle(line)))
+        stdout.flush()
+        if daemon.closed:
+            return
+    daemon.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            daemon = self.server.crawl_daemon
+            self.wfile.write(jsonl_sink.dumps(daemon.handle(line)))
+            self.wfile.flush()
+            if daemon.closed:
+                # shutdown() waits for serve_forever(), which runs in the
+                # main thread.
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+def serve_unix(daemon, socket_path):
+    """Answer the requests of each connection of the Unix socket."""
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("Unix sockets aren't supported on this platform, "
+                      "use --stdio instead.")
+    if os.path.exists(socket_path):
+        # Left by a former daemon which wasn't shut down.
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _Handler)
+    server.daemon_threads = True
+    server.crawl_daemon = daemon
+    # Summary prints its progress, which is not needed by the clients.
+    sys.stdout = sys.stderr
+    logging.info("Daemon (pid {0}) is listening on {1}".format(
+        os.getpid(), socket_path))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        daemon.close()
+        os.remove(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Crawl the Summary files/webpages by a warm process.')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--stdio', action='store_true',
+                       help='read the requests from stdin')
+    group.add_argument('--socket', default=None,
+                       help='path of the Unix socket to listen on')
+    parser.add_argument('-b', '--backend', default='pyquery',
+                        choices=parser_backend.BACKENDS,
+                        help='parser backend of the documents')
+    parser.add_argument('--prune', default=None, choices=batch.PRUNE_MODES,
+                        help='shrink the html before it is parsed')
+    parser.add_argument('-s', '--sink', action='append', choices=SINKS,
+                        dest='sinks', help='forward the results to the sink')
+    parser.add_argument('--json-path', default='output/json/',
+                        help='folder of the json output files')
+    parser.add_argument('--jsonl-path', default='output/jsonl/',
+                        help='folder of the json lines output files')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/0',
+                        help='Redis url of the redis-batch sink')
+    parser.add_argument('--dup-policy', default=None,
+                        help='json policy of the duplicate label resolution')
+    parser.add_argument('--spec', default=None,
+                        help='json spec of the segments to be crawled')
+    args = parser.parse_args()
+
+    logging.basicConfig(filename='CoStar_log.log', level=logging.DEBUG)
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(logging.INFO)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logging.getLogger().addHandler(console)
+
+    dup_policy.load_policy(args.dup_policy)
+    extraction_plan.load_plan(args.spec)
+    daemon = Daemon(args.backend, args.prune, args.sinks or (),
+                    args.json_path, args.jsonl_path, args.redis_url)
+    if args.stdio:
+        serve_stdio(daemon)
+    else:
+        serve_unix(daemon, args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+This module is used for the change detection of the properties crawled again
+from each new dump. Most segments of a property (like Building, Land or
+Assessment) don't change between two dumps, so only the changes of each
+Summary.result are written into the sinks, instead of the whole result.
+
+The last version of each property is saved in a SQLite database (zlib
+compressed json), keyed by the '   ID' of the result, or by its address if
+it has no ID. The result of a new dump is compared with it, and a delta
+record is returned if anything is changed:
+
+    {
+        '   ID': '020-1', '  Address': ..., '  City': ..., '  State': ...,
+        '  Zip': ...,
+        '_version': 3,
+        '_added': {key: value, ...},
+        '_changed': {key: new value, ...},
+        '_removed': [key, ...]
+    }
+
+The version counts the changed snapshots of the property, from 1 (the first
+one, all its keys are added). Nothing is returned or saved if the result is
+unchanged, so the writes and the versions follow the changes rather than the
+number of pages crawled. The records have to be whole results, not of some
+segments only (see the 'only' of batch.run_batch()), since the keys missing
+from a record are taken as removed.
+
+The new versions are only committed by commit(), after their delta records
+are written into the sinks, so a version is never saved without its delta
+record. Each property can be compared only once by a store (one run), a
+second record of the same key (e.g. the same ID in two folders) raises a
+ValueError, instead of one of them being taken as the change of the other.
+
+Classes:
+    DeltaStore(db_path) -> store, store.delta(result) -> delta record or None,
+        store.commit()
+Functions:
+    record_key(record) -> str, the key of the property
+    diff(old, new) -> (added dict, changed dict, removed list)
+"""
+
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+
+ID_KEY = '   ID'
+ADDRESS_KEYS = ('  Address', '  City', '  State', '  Zip')
+VERSION_KEY = '_version'
+ADDED_KEY = '_added'
+CHANGED_KEY = '_changed'
+REMOVED_KEY = '_removed'
+
+
+def record_key(record):
+    """record_key(record) -> <str obj.>, the ID or the joined address"""
+    if record.get(ID_KEY):
+        return str(record[ID_KEY])
+    return '|'.join(str(record.get(key, '')) for key in ADDRESS_KEYS)
+
+
+def diff(old, new):
+    """diff(old, new) -> (added dict, changed dict, removed list)
+
+    The keys are in the order of the new record, the removed keys in the
+    order of the old one.
+    """
+    added = {}
+    changed = {}
+    for key, value in new.items():
+        if key not in old:
+            added[key] = value
+        elif old[key] != value:
+            changed[key] = value
+    removed = [key for key in old if key not in new]
+    return added, changed, removed
+
+
+class DeltaStore(object):
+    """
+    :param:
+    :db_path: The path of the SQLite database file.
+    """
+
+    def __init__(self, db_path):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.keys_written = 0
+        self.keys_crawled = 0
+        # The number of the versions not committed yet.
+        self.staged = 0
+        self._keys = set()
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'key TEXT PRIMARY KEY, version INTEGER, value BLOB, '
+            'updated_at REAL)'
+        )
+        self._conn.commit()
+
+    def last(self, key):
+        """last(key) -> (version, record dict) or (0, None)"""
+        row = self._conn.execute(
+            'SELECT version, value FROM records WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return 0, None
+        return row[0], json.loads(zlib.decompress(row[1]).decode('utf-8'))
+
+    def delta(self, record):
+        """delta(record) -> <dict obj. of the delta record> or None
+
+        Compare the record with the last version of the same property, and
+        stage it as the next version if anything is changed.
+        """
+        key = record_key(record)
+        if key in self._keys:
+            raise ValueError("The property '{0}' is crawled twice by the "
+                             "same run.".format(key))
+        self._keys.add(key)
+        version, old = self.last(key)
+        added, changed, removed = diff(old or {}, record)
+        self.keys_crawled += len(record)
+        if not (added or changed or removed):
+            self.unchanged += 1
+            return None
+        if old is None:
+            self.new += 1
+        else:
+            self.changed += 1
+        version += 1
+        self._conn.execute(
+            'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)',
+            (key, version, zlib.compress(json.dumps(record).encode('utf-8')),
+             time.time()))
+        self.staged += 1
+        self.keys_written += len(added) + len(changed) + len(removed)
+        delta = {k: record[k] for k in (ID_KEY,) + ADDRESS_KEYS
+                 if k in record}
+        delta[VERSION_KEY] = version
+        delta[ADDED_KEY] = added
+        delta[CHANGED_KEY] = changed
+        delta[REMOVED_KEY] = removed
+        return delta
+
+    def commit(self):
+        """Commit the staged versions, once their delta records are written
+        into the sinks."""
+        if self.staged:
+            self._conn.commit()
+            self.staged = 0
+
+    def stats(self):
+        """Return the number of new, changed and unchanged properties, and
+        the keys written out of the keys crawled."""
+        return {
+            'new': self.new,
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'keys_written': self.keys_written,
+            'keys_crawled': self.keys_crawled
+        }
+
+    def close(self):
+        """Close the store, the versions not committed are dropped."""
+        self._conn.close()
@@ -0,0 +1,158 @@
+"""
+This module is used for resolving the duplicated label pairs of
+tool_funcs.pairs_gene() without asking the user (no input()), so a batch
+worker will never wait on stdin.
+
+The resolution policy is a json file loaded once per process, as following:
+
+    {
+        "default": "first",
+        "report": "output/duplicate_report.jsonl",
+        "rules": {
+            "For Lease": {"*": "first"},
+            "Building": {"Class": "regex:^[A-F]$", "Parking": "longest"}
+        }
+    }
+
+Rules are looked up by the segment prefix (like 'For Lease') and the label
+key without the prefix (like 'Total Avail'); '*' matches any key of the
+segment. The strategies are:
+    first:              The first one of the duplicated pairs.
+    last:               The last one of the duplicated pairs.
+    longest:            The one with the longest value.
+    first-non-empty:    The first one whose value is not blank.
+    regex:<pattern>:    The first one whose value matches the <pattern>.
+
+A duplicated key without rule, or whose rule can't pick any of the values,
+is resolved by the "default" strategy and recorded into the "report" file
+(one json per line) for checking later.
+
+Functions:
+    load_policy(path) -> policy dict
+    policy_hash(path) -> sha1 hex digest of the policy file, or ''
+    choose(seg_prefixes, key, values) -> choice number (1, 2, 3...)
+"""
+
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+
+DEFAULT_POLICY_FILE = 'duplicate_policy.json'
+DEFAULT_POLICY = {
+    'default': 'first',
+    'report': 'output/duplicate_report.jsonl',
+    'rules': {}
+}
+
+# The policy of current process, assigned by load_policy().
+_policy = None
+
+
+def load_policy(path=None):
+    """load_policy(path) -> <dict obj. of the policy>
+
+    :param:
+    :path: The json policy file. By default (None), the file in environment
+        variable 'COSTAR_DUP_POLICY' or DEFAULT_POLICY_FILE is used, and if
+        neither of them exists, DEFAULT_POLICY is used.
+
+    :return: The policy with the regex strategies compiled.
+    """
+    global _policy
+    path = policy_path(path)
+    policy = dict(DEFAULT_POLICY)
+    if os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8') as fr:
+            policy.update(json.load(fr))
+
+    rules = {}
+    for seg, seg_rules in policy['rules'].items():
+        rules[seg] = {key: _compile_strategy(strategy)
+                      for key, strategy in seg_rules.items()}
+    policy['rules'] = rules
+    policy['default'] = _compile_strategy(policy['default'])
+    _policy = policy
+    return _policy
+
+
+def policy_path(path=None):
+    """The json policy file, see load_policy()."""
+    return path or os.environ.get('COSTAR_DUP_POLICY', DEFAULT_POLICY_FILE)
+
+
+def policy_hash(path=None):
+    """policy_hash(path) -> <str obj. of the sha1 hex digest>
+
+    The hash of the policy file loaded by load_policy(path), '' if the file
+    doesn't exist (DEFAULT_POLICY is used).
+    """
+    path = policy_path(path)
+    if not os.path.isfile(path):
+        return ''
+    with open(path, 'rb') as fr:
+        return hashlib.sha1(fr.read()).hexdigest()
+
+
+def _compile_strategy(strategy):
+    if strategy.startswith('regex:'):
+        return re.compile(strategy[len('regex:'):])
+    if strategy not in ('first', 'last', 'longest', 'first-non-empty'):
+        raise ValueError("Unknown duplicate resolution strategy: '{0}'"
+                         .format(strategy))
+    return strategy
+
+
+def _apply_strategy(strategy, values):
+    """Return the choice number (1, 2, 3...) or None if nothing matches."""
+    if strategy == 'first':
+        return 1
+    if strategy == 'last':
+        return len(values)
+    if strategy == 'longest':
+        # max() keeps the first one of the same length.
+        return max(range(len(values)), key=lambda i: len(values[i])) + 1
+    if strategy == 'first-non-empty':
+        candidates = [i for i, v in enumerate(values) if v.strip()]
+    else:
+        candidates = [i for i, v in enumerate(values) if strategy.search(v)]
+    return candidates[0] + 1 if candidates else None
+
+
+def choose(seg_prefixes, key, values):
+    """choose(seg_prefixes, key, values) -> choice number
+
+    :param:
+    :seg_prefixes: The segment prefix of the pairs, like 'Sale', 'Building'.
+    :key: The duplicated label key without the segment prefix.
+    :values: All values of the duplicated key, in the order of the web-page.
+
+    :return: Which one (1, 2, 3...) of the duplicated pairs will be kept.
+    """
+    policy = _policy or load_policy()
+    seg_rules = policy['rules'].get(seg_prefixes.strip(), {})
+    strategy = seg_rules.get(key, seg_rules.get('*'))
+    choice = _apply_strategy(strategy, values) if strategy else None
+    if choice is None:
+        choice = _apply_strategy(policy['default'], values) or 1
+        _report(policy['report'], seg_prefixes, key, values, choice)
+    return choice
+
+
+def _report(report_file, seg_prefixes, key, values, choice):
+    """Append the unresolved case into the side report (json lines)."""
+    record = {'segment': seg_prefixes, 'key': key, 'values': values,
+              'chosen': choice, 'pid': os.getpid()}
+    logging.warning("Unresolved duplicate label: {0}".format(record))
+    if not report_file:
+        return
+    folder = os.path.dirname(report_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # One short write in append mode per record, so the lines of different
+    # worker processes won't be mixed up.
+    with open(report_file, 'a', encoding='utf-8') as fa:
+        fa.write(json.dumps(record, ensure_ascii=False) + '\n')
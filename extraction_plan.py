@@ -0,0 +1,308 @@
+"""
+This module is used for crawling the segments of summary.Summary by a
+declarative spec instead of a Python method per segment. The spec is a json
+file (summary_spec.json by default) as following:
+
+    {
+        "version": "1",
+        "ignore_titles": ["Documents", "Building Notes"],
+        "segments": {
+            "Sale": {"kind": "pairs", "prefix": "Sale",
+                     "selector": "[data-viewmodelname='propertySale']"},
+            "Traffic": {"kind": "table", "prefix": "Traffic",
+                        "layout": "numbering_headers",
+                        "tables": [{"headers": "#TrafficTable thead th",
+                                    "rows": "#TrafficTable tbody tr",
+                                    "cells": "td"}]},
+            "Market Conditions": {"kind": "method",
+                                  "method": "market_conditions"}
+        }
+    }
+
+The segments are looked up by the h1 titles of the page, their kinds are:
+    pairs:          tool_funcs.pairs_gene() of the label-value pairs under the
+                    "selector", with the "prefix", the choice "inp" of the
+                    duplicated labels, and the "extra_pairs" ({"name": css,
+                    "value": css}) added when their name is found.
+    table:          tool_funcs.crawl_table() of each one of the "tables"
+                    ({"headers", "rows", "cells", "extra_rows"}), rearranged
+                    by the "layout" (see in TABLE_LAYOUTS). With "skip_rows"
+                    or "skip_cells", the text of the cells is read first and
+                    the first rows/cells are skipped. The "prefix_format" is
+                    filled by the text of the "prefix_selector" if it's found.
+    subsections:    The "titles" and the text of their "content" (formatted by
+                    the {slug} of each title), its lines joined by "join".
+    method:         The Summary "method" of a segment whose layout can't be
+                    declared, like 'market_conditions'. Its selectors are
+                    listed in "keep" for the streaming, see stream_extract.py.
+
+The spec is compiled once per process into a Plan: the spec is checked, the
+defaults are filled in, and the css selectors are translated to XPath ahead
+(see in selector_cache.py). Then the same engine, Plan.run(), crawls any
+segment of any document. A new page type with the same structure (like Comps)
+only needs a new spec, no new code:
+
+    spec = extraction_plan.load_spec('comps_spec.json')
+    plan = extraction_plan.compile_spec(spec)
+    s = summary.Summary(pq_doc, web_id, plan=plan)
+
+Functions:
+    spec_path(path) -> path of the spec file
+    load_spec(path) -> spec dict
+    compile_spec(spec) -> Plan object
+    load_plan(path) -> Plan object, used by the Summary of current process
+    current_plan() -> Plan object
+Classes:
+    Plan(segments, ignore_titles, version) -> plan, plan.run(doc, title)
+"""
+
+
+import json
+import os
+import re
+import section_index
+import selector_cache
+import tool_funcs
+
+
+DEFAULT_SPEC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'summary_spec.json')
+TABLE_LAYOUTS = ('numbering_headers', 'cross_headers', 'same_headers')
+
+# The required keys and the defaults of each kind of segments.
+_REQUIRED = {
+    'pairs': ('selector', 'prefix'),
+    'table': ('prefix', 'tables'),
+    'subsections': ('titles', 'content'),
+    'method': ('method',)
+}
+_DEFAULTS = {
+    'pairs': {'inp': 0, 'extra_pairs': ()},
+    'table': {'layout': 'numbering_headers', 'replace_string': "",
+              'ignore_display_items': False, 'prefix_format': "",
+              'prefix_selector': ""},
+    'subsections': {'join': ", "},
+    'method': {'keep': []}
+}
+_TABLE_REQUIRED = ('headers', 'rows')
+_TABLE_DEFAULTS = {'cells': 'td', 'extra_rows': [], 'skip_rows': 0,
+                   'skip_cells': 0, 'data_start': None, 'data_end': None}
+_NAME_RE = re.compile(r'\W+')
+
+# The plan of current process, assigned by load_plan().
+_plan = None
+
+
+def spec_path(path=None):
+    """The json spec file. By default (None), the file in environment
+    variable 'COSTAR_SUMMARY_SPEC' or DEFAULT_SPEC_FILE is used."""
+    return path or os.environ.get('COSTAR_SUMMARY_SPEC', DEFAULT_SPEC_FILE)
+
+
+def load_spec(path=None):
+    """load_spec(path) -> <dict obj. of the spec>, see spec_path()"""
+    with open(spec_path(path), 'r', encoding='utf-8') as fr:
+        return json.load(fr)
+
+
+def compile_spec(spec):
+    """compile_spec(spec) -> <Plan obj.>
+
+    Raise ValueError if a segment of the spec has an unknown kind or layout,
+    or misses a required key.
+    """
+    segments = {title: _compile_segment(title, seg)
+                for title, seg in spec['segments'].items()}
+    return Plan(segments, spec.get('ignore_titles', []),
+                str(spec.get('version', '')))
+
+
+def _check_keys(required, spec, where):
+    missing = [key for key in required if key not in spec]
+    if missing:
+        raise ValueError("The {0} misses the keys {1}".format(where, missing))
+
+
+def _compile_segment(title, spec):
+    kind = spec.get('kind')
+    if kind not in _REQUIRED:
+        raise ValueError("Unknown kind '{0}' of the segment '{1}'"
+                         .format(kind, title))
+    where = "segment '{0}'".format(title)
+    _check_keys(_REQUIRED[kind], spec, where)
+    seg = dict(_DEFAULTS[kind], **spec)
+    # The name of the memoized segment and of its metrics, the same as the
+    # Summary method, like 'property_contacts'.
+    seg.setdefault('name', _NAME_RE.sub('_', title.strip().lower()))
+    if kind == 'pairs':
+        seg['extra_pairs'] = [(pair['name'], pair['value'])
+                              for pair in seg['extra_pairs']]
+    elif kind == 'table':
+        if seg['layout'] not in TABLE_LAYOUTS:
+            raise ValueError("Unknown layout '{0}' of the {1}".format(
+                seg['layout'], where))
+        for table in seg['tables']:
+            _check_keys(_TABLE_REQUIRED, table, 'table of the ' + where)
+        seg['tables'] = [dict(_TABLE_DEFAULTS, **table)
+                         for table in seg['tables']]
+    return seg
+
+
+def _selectors(seg):
+    """The css selectors of the segment known before the crawling."""
+    if seg['kind'] == 'pairs':
+        yield seg['selector']
+        for name, value in seg['extra_pairs']:
+            yield name
+            yield value
+    elif seg['kind'] == 'table':
+        if seg['prefix_selector']:
+            yield seg['prefix_selector']
+        for table in seg['tables']:
+            yield table['headers']
+            yield table['rows']
+            yield table['cells']
+            for extra in table['extra_rows']:
+                yield extra
+    elif seg['kind'] == 'subsections':
+        yield seg['titles']
+
+
+def _precompile(css_selector):
+    """Translate the selector (and the part of it run below the indexed
+    nodes, see in section_index.py) to XPath once for the process."""
+    parts = section_index.split_selector(css_selector)
+    for css in {css_selector, parts[2] if parts else ''}:
+        if css:
+            selector_cache.xpath(css)
+
+
+class Plan(object):
+    """
+    The compiled spec, see compile_spec().
+
+    :param:
+    :segments: Dict of {h1 title: compiled segment dict}.
+    :ignore_titles: The h1 titles which aren't crawled.
+    :version: The version of the spec.
+    """
+
+    def __init__(self, segments, ignore_titles=(), version=''):
+        self.segments = segments
+        self.ignore_titles = tuple(ignore_titles)
+        self.version = version
+        for seg in segments.values():
+            for css in _selectors(seg):
+                _precompile(css)
+
+    def run(self, doc, title, table_rows=None):
+        """run(doc, title, table_rows) -> <iterator obj. of the pairs>
+
+        :param:
+        :doc: The document, usually the section_index.SectionIndex of it.
+        :title: The h1 title of the segment, whose kind isn't 'method'.
+        :table_rows: Dict of {rows css selector: the rows already read as
+            lists of the cell texts}, these rows aren't crawled from the doc,
+            see in stream_extract.py.
+        """
+        seg = self.segments[title]
+        return _RUNNERS[seg['kind']](doc, seg, table_rows or {})
+
+    def check_only(self, only):
+        """Raise ValueError if any of the 'only' titles (see in
+        summary.Summary) isn't a segment of the plan, which would be crawled
+        as nothing."""
+        unknown = [title for title in only or () if title not in self.segments]
+        if unknown:
+            raise ValueError("Unknown segments {0}, the segments are {1}."
+                             .format(unknown, list(self.segments)))
+
+
+def _run_pairs(doc, seg, table_rows):
+    add_name = []
+    add_value = []
+    for name_css, value_css in seg['extra_pairs']:
+        names = doc(name_css)
+        if names:
+            add_name.append(names.text())
+            add_value.append(doc(value_css).text())
+    return tool_funcs.pairs_gene(doc, seg['selector'], seg['prefix'],
+                                 add_name, add_value, inp=seg['inp'])
+
+
+def _run_table(doc, seg, table_rows):
+    prefix = seg['prefix']
+    if seg['prefix_selector']:
+        value = doc(seg['prefix_selector']).text()
+        if value:
+            prefix = seg['prefix_format'].format(value)
+
+    t_h = []
+    t_d = []
+    for table in seg['tables']:
+        if table['skip_rows'] or table['skip_cells']:
+            data = [[item.text() for item in row(table['cells']).items()]
+                    [table['skip_cells']:]
+                    for row in doc(table['rows']).items()]
+            each_t_h, each_t_d = tool_funcs.crawl_table(
+                doc, headers_css=table['headers'],
+                prepared_table_data=data[table['skip_rows']:],
+                cell_css=table['cells'], seg_prefixes=prefix,
+                rearrange_table_method=seg['layout'],
+                data_start=table['data_start'])
+        else:
+            data = []
+            if table['rows'] in table_rows:
+                for css in [table['rows']] + table['extra_rows']:
+                    data += table_rows.get(css, [])
+            # Without the rows read ahead, the rows are crawled from the doc.
+            each_t_h, each_t_d = tool_funcs.crawl_table(
+                doc, table['headers'], table['rows'], table['cells'], prefix,
+                seg['layout'], replace_string=seg['replace_string'],
+                ignore_display_items=seg['ignore_display_items'],
+                additional_table_rows_css=table['extra_rows'],
+                prepared_table_data=data,
+                data_start=table['data_start'], data_end=table['data_end'])
+        t_h += each_t_h
+        t_d += each_t_d
+    return zip(t_h, t_d)
+
+
+def _run_subsections(doc, seg, table_rows):
+    titles = [item.text() for item in doc(seg['titles']).items()]
+    values = [doc(seg['content'].format(slug=title.lower().replace(' ', '-')))
+              .text().replace('\n', seg['join'])
+              for title in titles]
+    return zip(titles, values)
+
+
+def _run_method(doc, seg, table_rows):
+    raise ValueError("The segment '{0}' is crawled by the Summary method "
+                     "'{1}'".format(seg['name'], seg['method']))
+
+
+_RUNNERS = {
+    'pairs': _run_pairs,
+    'table': _run_table,
+    'subsections': _run_subsections,
+    'method': _run_method
+}
+
+
+def load_plan(path=None):
+    """load_plan(path) -> <Plan obj.>
+
+    Load and compile the spec (see in load_spec()) as the plan used by the
+    Summary of current process.
+    """
+    global _plan
+    _plan = compile_spec(load_spec(path))
+    return _plan
+
+
+def current_plan():
+    """The plan of current process, the default spec is loaded if no plan
+    has been loaded."""
+    if _plan is None:
+        load_plan()
+    return _plan
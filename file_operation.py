@@ -1,5 +1,15 @@
+import codecs
 import json
 import csv
+import re
+
+
+# The charset of <meta charset="..."> or of <meta http-equiv="Content-Type"
+# content="text/html; charset=...">.
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""",
+                           re.I)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'),
+         (codecs.BOM_UTF16_BE, 'utf-16'))
 
 
 def file_read(file_path):
@@ -8,21 +18,95 @@ def file_read(file_path):
     return html
 
 
+def detect_charset(head, default='utf-8'):
+    """detect_charset(head, default) -> <str obj. of the codec name>
+
+    Detect the encoding of a web-page from its first bytes (head), by the
+    BOM or the meta charset. The unknown charsets are ignored, and 'default'
+    is returned if nothing is found, as file_read() reads all files in utf-8.
+    """
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    m = _META_CHARSET.search(head)
+    if m:
+        try:
+            return codecs.lookup(m.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return default
+
+
 def save_json(json_file_path, json_file_name, content):
     with open(json_file_path + json_file_name + '.json', 'w') as fw:
         json.dump(content, fw)
 
 
-def json_to_csv(json_file, csv_file_path, csv_file_name):
-    with open(json_file, 'r') as fr:
-        data = fr.read()
+def iter_json_records(json_file, chunk_size=1024 * 1024):
+    """iter_json_records(json_file, chunk_size) -> <generator obj. of records>
+
+    Read the records of a json file one by one with bounded memory. The file
+    could be a json lines file (one record per line, see in jsonl_sink.py),
+    a json array of records, or a single record saved by save_json().
+
+    :param:
+    :json_file: The path of the json file.
+    :chunk_size: The number of characters read from the file at one time.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file, 'r', encoding='utf-8') as fr:
+        buffer, pos, eof = '', 0, False
+        while True:
+            # Skip the whitespaces between the records and the brackets/commas
+            # of a top level json array.
+            while pos < len(buffer) and \
+                    (buffer[pos] in '[,]' or buffer[pos].isspace()):
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    return
+                buffer, pos = fr.read(chunk_size), 0
+                eof = not buffer
+                continue
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The record is cut by the end of the chunk, read more.
+                more = fr.read(chunk_size)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield record
+
+
+def json_to_csv(json_file, csv_file_path, csv_file_name, fieldnames=None):
+    """json_to_csv(json_file, csv_file_path, csv_file_name, fieldnames)
+
+    Convert the records of json file(s) into a csv file with bounded memory.
+    The first pass over the records collects the union of all keys as the
+    csv header (in the order of first appearance), since the records may
+    have different keys, like 'Tenants_Name_57' only in some of them. The
+    second pass writes the rows, the missing keys of a record are left "".
 
-    json_data = json.loads(data)
+    :param:
+    :json_file: The path of a json file, or a list of paths (like all the
+        .jsonl shards), see in file_operation.iter_json_records().
+    :fieldnames: The csv header if it's known, then the first pass is skipped.
+    """
+    json_files = [json_file] if isinstance(json_file, str) else list(json_file)
+    if fieldnames is None:
+        # dict is used as an ordered set of the keys.
+        header = {}
+        for f in json_files:
+            for item in iter_json_records(f):
+                header.update(dict.fromkeys(item))
+        fieldnames = list(header)
 
     with open(csv_file_path + csv_file_name + '.csv', 'w', encoding='utf-8',
               newline="") as csvfw:
-        fieldnames = json_data[0].keys()
-        writer = csv.DictWriter(csvfw, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfw, fieldnames=fieldnames, restval="")
         writer.writeheader()
-        for item in json_data:
-            writer.writerow(item)
+        for f in json_files:
+            for item in iter_json_records(f):
+                writer.writerow(item)
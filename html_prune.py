@@ -0,0 +1,151 @@
+"""
+This module is used for shrinking the source code of a file/webpage before
+it's parsed. The saved CoStar pages have large <script>, <style>, <svg> and
+template blocks, mostly out of the parts read by Summary, but all of them
+are parsed into the tree.
+
+prune(html) empties these blocks with one regex scan, the tags (and their
+attributes) are kept so the structure of the tree stays the same; the html
+comments are deleted. Only the blocks out of the regions used by the
+crawling are emptied: the '.subHeaderContainer' header (see in
+id_add.address()) and the '#content' part of the page. The text of an <svg>
+(like its <title>), <noscript> or even <script> inside them is a part of the
+text extracted by Summary, so it's kept and the result is the same. If the
+'#content' part can't be found, only the comments are deleted. The regions
+are only searched out of the blocks and comments, so an 'id="content"' in a
+<script> string or a <template> isn't taken as the region.
+
+prune(html, keep_regions=True) also keeps only these regions, the page is
+kept as it is if the '#content' part can't be found.
+
+Both str and bytes source code are supported.
+
+Functions:
+    prune(html, keep_regions) -> pruned html
+"""
+
+
+import bisect
+import re
+
+
+PRUNED_TAGS = ('script', 'style', 'svg', 'template', 'noscript')
+# The attribute of the '#content' part and the header of the page.
+CONTENT_REGION = r'''(?<![\w-])id\s*=\s*["']content["']'''
+HEADER_REGION = \
+    r'''(?<![\w-])class\s*=\s*["'][^"']*\bsubHeaderContainer\b[^"']*["']'''
+
+
+def _compile(pattern, is_bytes):
+    if is_bytes:
+        pattern = pattern.encode('ascii')
+    return re.compile(pattern, re.S | re.I)
+
+
+# {is_bytes: compiled pattern}. The comments and the blocks are matched in
+# one scan, so a '<script>' in a comment (or '<!--' in a script) is skipped
+# as the html parser does.
+_PRUNED = {
+    b: _compile(r'<!--.*?-->|(<({0})\b[^>]*(?<!/)>).*?</\2\s*>'
+                .format('|'.join(PRUNED_TAGS)), b)
+    for b in (False, True)
+}
+_CONTENT_START = {
+    b: _compile(r'<(\w+)\b[^>]*{0}[^>]*>'.format(CONTENT_REGION), b)
+    for b in (False, True)
+}
+_HEADER_START = {
+    b: _compile(r'<(\w+)\b[^>]*{0}[^>]*>'.format(HEADER_REGION), b)
+    for b in (False, True)
+}
+
+
+def prune(html, keep_regions=False):
+    """prune(html, keep_regions) -> <str or bytes obj. of pruned html>
+
+    :param:
+    :html: The source code of the file/web-page (str or bytes).
+    :keep_regions: Whether to keep only the header and '#content' regions.
+    """
+    is_bytes = isinstance(html, bytes)
+    empty, close, end = (b'', b'</', b'>') if is_bytes else ('', '</', '>')
+    blocks = list(_PRUNED[is_bytes].finditer(html))
+    spans = _region_spans(html, blocks, is_bytes)
+    if keep_regions and spans:
+        html = _join_regions(html, spans, is_bytes)
+        spans = [(0, len(html))]
+        blocks = list(_PRUNED[is_bytes].finditer(html))
+
+    def empty_block(m):
+        # Comments are deleted, blocks are kept as empty elements.
+        if m.group(1) is None:
+            return empty
+        # The blocks in (or across) the crawled regions are kept.
+        if spans is None or any(m.start() < span_end and span_start < m.end()
+                                for span_start, span_end in spans):
+            return m.group(0)
+        return m.group(1) + close + m.group(2) + end
+
+    # The same as _PRUNED[is_bytes].sub(empty_block, html), with the matches
+    # already found.
+    parts = []
+    pos = 0
+    for m in blocks:
+        parts.append(html[pos:m.start()])
+        parts.append(empty_block(m))
+        pos = m.end()
+    parts.append(html[pos:])
+    return empty.join(parts)
+
+
+def _outside(matches, blocks):
+    """Filter the matches which start out of the blocks (the sorted and
+    not overlapping matches of _PRUNED)."""
+    starts = [m.start() for m in blocks]
+    for m in matches:
+        i = bisect.bisect_right(starts, m.start()) - 1
+        if i < 0 or blocks[i].end() <= m.start():
+            yield m
+
+
+def _region_spans(html, blocks, is_bytes):
+    """The sorted (start, end) of the '#content' and the header regions, or
+    None if the '#content' region can't be found."""
+    spans = []
+    for start_re in (_CONTENT_START[is_bytes], _HEADER_START[is_bytes]):
+        m = next(_outside(start_re.finditer(html), blocks), None)
+        end = _element_end(html, m, blocks, is_bytes) if m else None
+        if end is None:
+            if not spans:
+                return None
+            continue
+        spans.append((m.start(), end))
+    return sorted(spans)
+
+
+def _join_regions(html, spans, is_bytes):
+    parts = [html[start:end] for start, end in spans]
+    if is_bytes:
+        return b'<html><body>' + b'\n'.join(parts) + b'</body></html>'
+    return '<html><body>' + '\n'.join(parts) + '</body></html>'
+
+
+def _element_end(html, start_match, blocks, is_bytes):
+    """Find the end of the element by counting its nested open/close tags
+    (out of the blocks).
+    """
+    tag = start_match.group(1)
+    if is_bytes:
+        tag = tag.decode('ascii')
+    tag_re = _compile(r'<(/?){0}\b[^>]*?(/?)>'.format(re.escape(tag)),
+                      is_bytes)
+    depth = 0
+    for m in _outside(tag_re.finditer(html, start_match.start()), blocks):
+        if m.group(2):  # Self-closing tag.
+            if depth == 0:
+                return m.end()
+            continue
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.end()
+    return None
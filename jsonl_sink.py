@@ -0,0 +1,133 @@
+"""
+This module is used for saving the Summary.result records into append-only
+json lines (NDJSON) files, one record per line, instead of one .json file per
+record as file_operation.save_json() does.
+
+The records are buffered and written in batches, and the files are rotated by
+size or by number of records:
+
+    <path>/<prefix>-<shard>-<sequence>.jsonl
+    e.g. output/jsonl/summary-w12345-0000.jsonl
+
+Each process writes its own shard (by default 'w' + process id), so the
+worker processes of batch.py never write into the same file.
+
+orjson is used for encoding the records if it's installed, otherwise json.
+
+Classes:
+    JsonlSink(path, prefix, shard, ...) -> sink, sink.write(record)
+Functions:
+    dumps(record) -> bytes of one json line
+"""
+
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(record):
+    """dumps(record) -> <bytes obj. of the json line, with '\\n'>"""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class JsonlSink(object):
+    """
+    Append-only, batched and rotated json lines sink.
+
+    :param:
+    :path: The folder of the .jsonl files.
+    :prefix: The prefix of the file names.
+    :shard: The shard name of this writer, by default 'w' + process id.
+    :rotate_bytes: Start a new file after the file reaches this size.
+    :rotate_records: Start a new file after this number of records, by
+        default (None) only rotated by size.
+    :batch_records: The number of records buffered before writing.
+    :fsync: Whether to os.fsync() the file after each batch written.
+    """
+
+    def __init__(self, path='output/jsonl/', prefix='summary', shard=None,
+                 rotate_bytes=256 * 1024 * 1024, rotate_records=None,
+                 batch_records=1000, fsync=False):
+        self.path = path
+        self.prefix = prefix
+        self.shard = shard or 'w{0}'.format(os.getpid())
+        self.rotate_bytes = rotate_bytes
+        self.rotate_records = rotate_records
+        self.batch_records = batch_records
+        self.fsync = fsync
+        self.records = 0
+        self._buffer = []
+        self._file = None
+        self._file_bytes = 0
+        self._file_records = 0
+        self._sequence = -1
+        os.makedirs(path, exist_ok=True)
+
+    def _file_name(self, sequence):
+        return os.path.join(self.path, '{0}-{1}-{2:04d}.jsonl'
+                            .format(self.prefix, self.shard, sequence))
+
+    def _open_next(self):
+        self._close_file()
+        # Never append into the files of a former run of the same shard.
+        self._sequence += 1
+        while os.path.exists(self._file_name(self._sequence)):
+            self._sequence += 1
+        self._file = open(self._file_name(self._sequence), 'ab')
+        self._file_bytes = 0
+        self._file_records = 0
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, record):
+        """Buffer one record, the buffer is written every batch_records."""
+        self._buffer.append(dumps(record))
+        self.records += 1
+        if len(self._buffer) >= self.batch_records:
+            self.flush()
+
+    @property
+    def buffered(self):
+        """The number of records written but not flushed yet."""
+        return len(self._buffer)
+
+    def flush(self):
+        """Write the buffered records into the files (rotated if needed)."""
+        for line in self._buffer:
+            if self._file is None or \
+                    self._file_bytes >= self.rotate_bytes or \
+                    (self.rotate_records and
+                     self._file_records >= self.rotate_records):
+                self._sync()
+                self._open_next()
+            self._file.write(line)
+            self._file_bytes += len(line)
+            self._file_records += 1
+        self._buffer = []
+        self._sync()
+
+    def _sync(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
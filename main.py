@@ -1,9 +1,6 @@
-from pyquery import PyQuery as pq
-import file_operation
 import sys
-import summary
+import batch
 import id_add
-import re
 import logging
 import redisdb
 
@@ -32,12 +29,9 @@ def main():
                 r'{0}/{1}'.format(folder_name, file_id)
     logging.info(file_path)
 
-    file = file_operation.file_read(file_path)
-    doc = pq(file)
+    file_id = batch.get_file_id(file_path)
 
-    file_id = re.match(r".*(?=.htm)", file_id).group()
-
-    s = summary.Summary(doc, file_id)
+    s = batch.crawl_file(file_path)
     a = s.assessment()
 
     logging.info('=====>')
@@ -0,0 +1,111 @@
+"""
+This module is used for the incremental crawling. The manifest is a SQLite
+database recording each processed file as:
+
+    path, size, mtime, content hash (sha1), extractor version, time
+
+A file is skipped by the next run if it's unchanged since it was processed,
+and it was processed by the same extractor version (summary.EXTRACTOR_VERSION).
+The members of the archives (see in sources.py) are recorded as
+'<archive>!<member>' with the size and hash of the member (and mtime 0), and
+skipped if their content is the same.
+Each file is committed into the manifest once its result is written out of
+the buffers of the sinks (see in batch.py), so a crashed run resumes from the
+last committed file, and no result buffered by the crashed run is lost.
+
+Classes:
+    Manifest(db_path, extractor_version) -> manifest
+Functions:
+    file_hash(file_path) -> sha1 hex digest of the file content
+    fingerprint(file_path) -> (size, mtime, content hash)
+"""
+
+
+import hashlib
+import os
+import sqlite3
+import time
+
+
+def file_hash(file_path):
+    """Return the sha1 hex digest of the file content."""
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(file_path):
+    """fingerprint(file_path) -> (size, mtime, content hash)"""
+    st = os.stat(file_path)
+    return st.st_size, st.st_mtime, file_hash(file_path)
+
+
+class Manifest(object):
+    """
+    :param:
+    :db_path: The path of the SQLite database file.
+    :extractor_version: The version of the extraction, the files processed
+        by another version will be processed again.
+    """
+
+    def __init__(self, db_path, extractor_version):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.extractor_version = str(extractor_version)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime REAL, '
+            'content_hash TEXT, extractor_version TEXT, processed_at REAL)'
+        )
+        self._conn.commit()
+
+    def is_unchanged(self, file_path):
+        """Whether the file has been processed and not changed since then.
+
+        The size and mtime are checked first, the content hash is only
+        computed when they are different (e.g. the file is copied again).
+        """
+        row = self._conn.execute(
+            'SELECT size, mtime, content_hash, extractor_version '
+            'FROM files WHERE path = ?', (file_path,)).fetchone()
+        if row is None or row[3] != self.extractor_version:
+            return False
+        st = os.stat(file_path)
+        if (st.st_size, st.st_mtime) == (row[0], row[1]):
+            return True
+        if st.st_size != row[0] or file_hash(file_path) != row[2]:
+            return False
+        # Same content with a new mtime, remember it for the next run.
+        self._conn.execute('UPDATE files SET mtime = ? WHERE path = ?',
+                           (st.st_mtime, file_path))
+        self._conn.commit()
+        return True
+
+    def is_unchanged_member(self, name, size, content_hash):
+        """Whether the member of an archive, named as '<archive>!<member>',
+        has been processed with the same size and content hash."""
+        row = self._conn.execute(
+            'SELECT size, content_hash, extractor_version '
+            'FROM files WHERE path = ?', (name,)).fetchone()
+        return row == (size, content_hash, self.extractor_version)
+
+    def pending(self, file_paths):
+        """Return the files which need to be processed."""
+        return [f for f in file_paths if not self.is_unchanged(f)]
+
+    def record(self, file_path, size, mtime, content_hash):
+        """Commit one processed file into the manifest."""
+        self._conn.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+            (file_path, size, mtime, content_hash, self.extractor_version,
+             time.time()))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,246 @@
+"""
+This module is used for the instrumentation of the crawling: the wall time,
+rows and keys of each Summary segment, and the read, parse and sink time of
+each file, so a slow batch could be told where the time is spent.
+
+The metrics are disabled by default, then timer()/observe()/incr() return
+at once and cost almost nothing. After enable(), the values are recorded
+into the registry of the process:
+
+    histograms  name{labels} -> counts of the fixed buckets, sum and count
+                e.g. segment_seconds{segment="market_conditions"}
+    counters    name{labels} -> value, e.g. files_total{status="ok"}
+
+The names ending with '_seconds' use the time buckets, the others (rows,
+keys) use the count buckets. The worker processes of batch.py send their
+snapshot()s to the main process, which merge()s them, and the aggregated
+snapshot is written as json or Prometheus text format by SnapshotWriter.
+
+Classes:
+    SnapshotWriter(path, fmt, interval) -> writer, writer.maybe_write()
+Functions:
+    enable(), disable(), enabled() -> bool, reset()
+    timer(name, **labels) -> context manager recording the seconds
+    observe(name, value, **labels), incr(name, value, **labels)
+    snapshot() -> dict of the registry, merge(snapshot)
+    to_json(snapshot) -> str, to_prometheus(snapshot) -> str
+"""
+
+
+import bisect
+import contextlib
+import json
+import os
+import time
+
+
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROMETHEUS_PREFIX = 'costar_'
+FORMATS = ('json', 'prometheus')
+
+# {(name, labels): [bucket counts..., sum, count]} and
+# {(name, labels): value}, None when the metrics are disabled.
+_histograms = None
+_counters = None
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def enable():
+    global _histograms, _counters
+    if _histograms is None:
+        _histograms = {}
+        _counters = {}
+
+
+def disable():
+    global _histograms, _counters
+    _histograms = None
+    _counters = None
+
+
+def enabled():
+    return _histograms is not None
+
+
+def reset():
+    """Clear the recorded values, the metrics stay enabled (or disabled)."""
+    if _histograms is not None:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _buckets(name):
+    return TIME_BUCKETS if name.endswith('_seconds') else COUNT_BUCKETS
+
+
+def observe(name, value, **labels):
+    """Record one value into the histogram 'name' with the labels."""
+    if _histograms is None:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    buckets = _buckets(name)
+    h = _histograms.get(key)
+    if h is None:
+        # The counts of the buckets and of the larger values, sum, count.
+        h = _histograms[key] = [0] * (len(buckets) + 3)
+    h[bisect.bisect_left(buckets, value)] += 1
+    h[-2] += value
+    h[-1] += 1
+
+
+def incr(name, value=1, **labels):
+    """Add the value into the counter 'name' with the labels."""
+    if _counters is None:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+class _Timer(object):
+
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+def timer(name, **labels):
+    """timer(name, **labels) -> context manager
+
+    with metrics.timer('parse_seconds', backend='lxml'):
+        ...
+    """
+    if _histograms is None:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def snapshot():
+    """snapshot() -> <dict obj. of the recorded values>, json serializable
+
+    {'time': t, 'histograms': [{'name': n, 'labels': {...}, 'buckets': [...],
+    'counts': [...], 'sum': s, 'count': c}, ...],
+    'counters': [{'name': n, 'labels': {...}, 'value': v}, ...]}
+
+    The counts are not cumulative, the last one is of the values larger than
+    the last bucket.
+    """
+    snap = {'time': time.time(), 'histograms': [], 'counters': []}
+    if _histograms is None:
+        return snap
+    for (name, labels), h in sorted(_histograms.items()):
+        snap['histograms'].append({
+            'name': name, 'labels': dict(labels),
+            'buckets': list(_buckets(name)), 'counts': h[:-2],
+            'sum': h[-2], 'count': h[-1]
+        })
+    for (name, labels), value in sorted(_counters.items()):
+        snap['counters'].append({'name': name, 'labels': dict(labels),
+                                 'value': value})
+    return snap
+
+
+def merge(snap):
+    """Add the values of a snapshot (e.g. of a worker) into the registry."""
+    if _histograms is None:
+        return
+    for item in snap['histograms']:
+        key = (item['name'], tuple(sorted(item['labels'].items())))
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(item['counts']) + 2)
+        for i, n in enumerate(item['counts']):
+            h[i] += n
+        h[-2] += item['sum']
+        h[-1] += item['count']
+    for item in snap['counters']:
+        key = (item['name'], tuple(sorted(item['labels'].items())))
+        _counters[key] = _counters.get(key, 0) + item['value']
+
+
+def to_json(snap):
+    return json.dumps(snap, indent=2)
+
+
+def _prometheus_labels(labels, **extra):
+    items = sorted(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(
+        k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in items) + '}'
+
+
+def to_prometheus(snap):
+    """to_prometheus(snap) -> <str obj. of the Prometheus text format>"""
+    lines = []
+    typed = set()
+    for item in snap['histograms']:
+        name = PROMETHEUS_PREFIX + item['name']
+        if name not in typed:
+            typed.add(name)
+            lines.append('# TYPE {0} histogram'.format(name))
+        cumulative = 0
+        for le, n in zip(item['buckets'] + ['+Inf'], item['counts']):
+            cumulative += n
+            lines.append('{0}_bucket{1} {2}'.format(
+                name, _prometheus_labels(item['labels'], le=le), cumulative))
+        labels = _prometheus_labels(item['labels'])
+        lines.append('{0}_sum{1} {2}'.format(name, labels, item['sum']))
+        lines.append('{0}_count{1} {2}'.format(name, labels, item['count']))
+    for item in snap['counters']:
+        name = PROMETHEUS_PREFIX + item['name']
+        if name not in typed:
+            typed.add(name)
+            lines.append('# TYPE {0} counter'.format(name))
+        lines.append('{0}{1} {2}'.format(
+            name, _prometheus_labels(item['labels']), item['value']))
+    return '\n'.join(lines) + '\n'
+
+
+class SnapshotWriter(object):
+    """
+    Write the snapshot of the registry into a file every 'interval' seconds.
+    The file is replaced atomically, so a reader (e.g. the textfile collector
+    of the Prometheus node exporter) never sees a partial file.
+
+    :param:
+    :path: The path of the snapshot file.
+    :fmt: 'json' or 'prometheus'.
+    :interval: The min seconds between two snapshots of maybe_write().
+    """
+
+    def __init__(self, path, fmt='json', interval=10.0):
+        assert fmt in FORMATS, \
+            "In metrics.py, SnapshotWriter(), unknown format '{0}'".format(fmt)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def maybe_write(self):
+        """Write the snapshot if 'interval' seconds passed since the last."""
+        if time.monotonic() - self._last >= self.interval:
+            self.write()
+
+    def write(self):
+        snap = snapshot()
+        text = to_json(snap) if self.fmt == 'json' else to_prometheus(snap)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+        self._last = time.monotonic()
@@ -0,0 +1,164 @@
+"""
+This module is used for choosing the HTML parser backend of the crawling.
+summary.Summary, tool_funcs and id_add only use a small part of the PyQuery
+API on the document object:
+
+    doc(css), doc.find(css), doc.items(), doc.text(), doc.eq(i),
+    doc.extend(other_doc), doc.remove_attr(name), len(doc), bool(doc)
+
+so the same extraction code runs on each backend of BACKENDS:
+    'pyquery':  PyQuery object (the original behavior), with the css-to-xpath
+                translation cached, see in selector_cache.py.
+    'lxml':     LxmlQuery object, a plain list of lxml nodes which runs the
+                XPath translated from the css selectors directly, without
+                the wrapping overhead of PyQuery on every .items() and .text().
+
+Both backends build the same lxml tree and use the same css-to-xpath
+translation and text extraction as PyQuery, so the Summary.result is the
+same one.
+
+parse_file(file_path, backend) memory-maps the file and the lxml parser
+reads its bytes directly, in the encoding of the meta charset, instead of
+the file being read and decoded into a str (which lxml encodes again). The
+empty files and the fragments (not starting with '<html' or '<!doctype')
+are read by file_operation.file_read() and parse() as before.
+
+Functions:
+    parse(html, backend) -> document object of the backend
+    parse_file(file_path, backend) -> document object of the backend
+    is_full_html(head) -> bool
+Classes:
+    LxmlQuery(nodes) -> document object of the 'lxml' backend
+"""
+
+
+import mmap
+import re
+import lxml.html
+from lxml import etree
+from pyquery import PyQuery as pq
+from pyquery.pyquery import fromstring
+from pyquery.text import extract_text
+import file_operation
+import selector_cache
+
+
+BACKENDS = ('pyquery', 'lxml')
+# The number of the first bytes searched for the meta charset.
+CHARSET_HEAD_BYTES = 4096
+# The same check as lxml.html.fromstring() does, whether the source code is
+# a whole document, or a fragment which is parsed in another way.
+_FULL_HTML = re.compile(rb'^\s*<(?:html|!doctype)', re.I)
+
+
+class LxmlQuery(list):
+    """
+    The document object of the 'lxml' backend, a list of lxml nodes with the
+    same behavior as the PyQuery methods used by the crawling code.
+    """
+
+    def __call__(self, css_selector):
+        """doc(css) -> LxmlQuery of the matched nodes (including self)"""
+        if not css_selector:
+            return LxmlQuery()
+        xpath = selector_cache.xpath(css_selector)
+        nodes = LxmlQuery()
+        for node in self:
+            nodes += xpath(node)
+        return nodes
+
+    def find(self, css_selector):
+        """doc.find(css) -> LxmlQuery of the matched descendant nodes"""
+        xpath = selector_cache.xpath(css_selector)
+        nodes = LxmlQuery()
+        for node in self:
+            for child in node.getchildren():
+                nodes += xpath(child)
+        return nodes
+
+    def items(self):
+        for node in self:
+            yield LxmlQuery((node,))
+
+    def eq(self, index):
+        try:
+            return LxmlQuery((self[index],))
+        except IndexError:
+            return LxmlQuery()
+
+    def extend(self, other):
+        list.extend(self, other)
+        return self
+
+    def text(self):
+        if not self:
+            return ''
+        return ' '.join(
+            pq(node).html(escape=False) if node.tag == 'textarea' else
+            extract_text(node) for node in self
+        )
+
+    def remove_attr(self, name):
+        for node in self:
+            node.attrib.pop(name, None)
+        return self
+
+
+def parse(html, backend='pyquery'):
+    """parse(html, backend) -> document object of the backend
+
+    :param:
+    :html: The source code of the file/web-page.
+    :backend: One of BACKENDS.
+
+    :return: CachedPyQuery object ('pyquery') or LxmlQuery object ('lxml').
+    """
+    if backend == 'pyquery':
+        return selector_cache.CachedPyQuery(html)
+    if backend == 'lxml':
+        # The same parsing (xml first, then html) as PyQuery does.
+        return LxmlQuery(fromstring(html))
+    raise ValueError("Unknown parser backend: '{0}', should be one of {1}"
+                     .format(backend, BACKENDS))
+
+
+def parse_file(file_path, backend='pyquery'):
+    """parse_file(file_path, backend) -> document object of the backend
+
+    The same as parse(file_operation.file_read(file_path), backend), without
+    the str copy of the file.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown parser backend: '{0}', should be one of {1}"
+                         .format(backend, BACKENDS))
+    with open(file_path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file can't be mapped.
+            mapped = None
+        if mapped is not None:
+            with mapped:
+                head = mapped[:CHARSET_HEAD_BYTES]
+                if is_full_html(head):
+                    nodes = _parse_mapped(
+                        mapped, file_operation.detect_charset(head))
+                    if backend == 'pyquery':
+                        return selector_cache.CachedPyQuery(nodes)
+                    return LxmlQuery(nodes)
+    return parse(file_operation.file_read(file_path), backend)
+
+
+def is_full_html(head):
+    """Whether the first bytes are of a whole document, not a fragment."""
+    return _FULL_HTML.match(head) is not None
+
+
+def _parse_mapped(mapped, encoding):
+    """The same parsing (xml first, then html) as PyQuery does."""
+    try:
+        tree = etree.parse(mapped)
+    except etree.XMLSyntaxError:
+        mapped.seek(0)
+        tree = lxml.html.parse(mapped, lxml.html.HTMLParser(encoding=encoding))
+    return [tree.getroot()]
@@ -0,0 +1,309 @@
+"""
+This module is used for crawling the Summary files/webpages by an asyncio
+pipeline, whose stages run at the same time instead of one after another:
+
+    paths -> [read] -> queue -> [parse + Summary] -> queue -> [write]
+             threads            process pool                  threads
+
+Each stage has its own concurrency (readers, parsers, writers), and the
+queues between the stages are bounded, so a fast stage waits for the slow
+one (backpressure) instead of piling up the pages in memory. The throughput
+of the whole pipeline approaches the one of its slowest stage.
+
+On Ctrl+C (SIGINT) or SIGTERM, no new file is read, the files already read
+are still parsed and written (drained), then the sinks are flushed.
+
+Usage:
+    python pipeline.py F:/.../Offices -p 8 --readers 4 -s jsonl
+    python pipeline.py "dumps/**/*.html" -b lxml --queue-size 128
+
+Classes:
+    Pipeline(parsers, readers, writers, queue_size, ...) -> pipeline
+Functions:
+    run_pipeline(inputs, ...) -> stats dict
+"""
+
+
+import argparse
+import asyncio
+import concurrent.futures
+import logging
+import os
+import signal
+import threading
+import time
+import batch
+import dup_policy
+import extraction_plan
+import file_operation
+import parser_backend
+import record_store
+
+
+def _init_parser(dup_policy_file, spec_file):
+    # Ctrl+C is sent to the parser processes too, but they are stopped by
+    # the main process after the pipeline is drained.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Load the duplicate label resolution policy and compile the spec of the
+    # segments once per parser process.
+    dup_policy.load_policy(dup_policy_file)
+    extraction_plan.load_plan(spec_file)
+
+
+def _parse(html, file_id, backend, only, prune):
+    """The job of the parser processes -> Summary.result"""
+    return batch.crawl_html(html, file_id, backend, only, prune).result
+
+
+class Pipeline(object):
+    """
+    :param:
+    :parsers: The number of parser processes, by default (None) all cores.
+    :readers: The number of files read at the same time.
+    :writers: The number of results written at the same time.
+    :queue_size: The max number of items waiting between two stages.
+    :sinks, json_path, jsonl_path, csv_path, redis_url: See in
+        batch.run_batch().
+    :backend, only, prune: See in batch.crawl_file().
+    :dup_policy_file: See in dup_policy.load_policy().
+    :spec_file: See in extraction_plan.load_spec().
+    """
+
+    def __init__(self, parsers=None, readers=4, writers=2, queue_size=64,
+                 sinks=('json',), json_path='output/json/',
+                 jsonl_path='output/jsonl/', csv_path='output/csv/',
+                 redis_url='redis://localhost:6379/0', backend='pyquery',
+                 only=None, prune=None, dup_policy_file=None,
+                 spec_file=None):
+        self.parsers = parsers or os.cpu_count() or 1
+        self.readers = readers
+        self.writers = writers
+        self.queue_size = queue_size
+        self.sinks = tuple(sinks)
+        self.json_path = os.path.join(json_path, '')
+        self.jsonl_path = jsonl_path
+        self.csv_path = csv_path
+        self.redis_url = redis_url
+        self.backend = backend
+        self.only = only
+        self.prune = prune
+        self.dup_policy_file = dup_policy_file
+        self.spec_file = spec_file
+        self.stopping = False
+        self.stats = {'files': 0, 'read': 0, 'parsed': 0, 'written': 0,
+                      'failed': 0}
+        # The busy seconds of each stage, summed over its tasks.
+        self.busy = {'read': 0.0, 'parse': 0.0, 'write': 0.0}
+        # The batched writers (and the store) aren't thread safe.
+        self._write_lock = threading.Lock()
+
+    def stop(self):
+        """Stop reading new files, the read ones are still processed."""
+        if not self.stopping:
+            logging.warning("Stopping, draining the pipeline...")
+        self.stopping = True
+
+    def _failed(self, file_path, stage, e):
+        self.stats['failed'] += 1
+        logging.warning("Failed ({0}): {1} -> {2}: {3}".format(
+            stage, file_path, type(e).__name__, e))
+
+    async def _reader(self, paths, parse_queue, io_pool):
+        loop = asyncio.get_running_loop()
+        while paths and not self.stopping:
+            file_path = paths.pop()
+            start = time.perf_counter()
+            try:
+                html = await loop.run_in_executor(
+                    io_pool, file_operation.file_read, file_path)
+            except Exception as e:
+                self._failed(file_path, 'read', e)
+                continue
+            finally:
+                self.busy['read'] += time.perf_counter() - start
+            self.stats['read'] += 1
+            # Waits here when the parsers are behind (backpressure).
+            await parse_queue.put((file_path, html))
+
+    async def _parser(self, parse_queue, write_queue, cpu_pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await parse_queue.get()
+            if item is None:
+                return
+            file_path, html = item
+            start = time.perf_counter()
+            try:
+                file_id = batch.get_file_id(file_path)
+                result = await loop.run_in_executor(
+                    cpu_pool, _parse, html, file_id, self.backend, self.only,
+                    self.prune)
+            except Exception as e:
+                self._failed(file_path, 'parse', e)
+                continue
+            finally:
+                self.busy['parse'] += time.perf_counter() - start
+            self.stats['parsed'] += 1
+            await write_queue.put((file_path, file_id, result))
+
+    async def _writer(self, write_queue, io_pool, writers, store):
+        loop = asyncio.get_running_loop()
+
+        def write(result, file_id):
+            batch.save_result(result, file_id, self.sinks, self.json_path)
+            if writers or store is not None:
+                with self._write_lock:
+                    for writer in writers.values():
+                        writer.write(result)
+                    if store is not None:
+                        store.add(result)
+
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            file_path, file_id, result = item
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(io_pool, write, result, file_id)
+            except Exception as e:
+                self._failed(file_path, 'write', e)
+                continue
+            finally:
+                self.busy['write'] += time.perf_counter() - start
+            self.stats['written'] += 1
+
+    async def run(self, files):
+        """run(files) -> <dict obj. of the statistics>"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Not supported on Windows, or not in the main thread.
+                pass
+        self.stats['files'] = len(files)
+        if 'json' in self.sinks:
+            os.makedirs(self.json_path, exist_ok=True)
+        writers = batch.make_writers(self.sinks, self.jsonl_path,
+                                     self.redis_url)
+        store = record_store.RecordStore() if 'csv' in self.sinks else None
+        # pop() takes the files from the end.
+        paths = list(reversed(files))
+        parse_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        start = time.perf_counter()
+
+        io_pool = concurrent.futures.ThreadPoolExecutor(
+            self.readers + self.writers)
+        cpu_pool = concurrent.futures.ProcessPoolExecutor(
+            self.parsers, initializer=_init_parser,
+            initargs=(self.dup_policy_file, self.spec_file))
+        try:
+            readers = [asyncio.ensure_future(
+                self._reader(paths, parse_queue, io_pool))
+                for _ in range(self.readers)]
+            parsers = [asyncio.ensure_future(
+                self._parser(parse_queue, write_queue, cpu_pool))
+                for _ in range(self.parsers)]
+            writer_tasks = [asyncio.ensure_future(
+                self._writer(write_queue, io_pool, writers, store))
+                for _ in range(self.writers)]
+            # Drain the stages one after another: each stage ends after the
+            # former one ended and its queue is empty.
+            await asyncio.gather(*readers)
+            for _ in parsers:
+                await parse_queue.put(None)
+            await asyncio.gather(*parsers)
+            for _ in writer_tasks:
+                await write_queue.put(None)
+            await asyncio.gather(*writer_tasks)
+        finally:
+            cpu_pool.shutdown()
+            io_pool.shutdown()
+            for writer in writers.values():
+                writer.close()
+        if store is not None:
+            store.write_csv(self.csv_path, 'summary')
+
+        elapsed = time.perf_counter() - start
+        stats = dict(self.stats)
+        stats['stopped'] = self.stopping
+        stats['seconds'] = round(elapsed, 3)
+        stats['files_per_sec'] = round(stats['written'] / elapsed, 2) \
+            if elapsed else 0.0
+        stats['busy_seconds'] = {k: round(v, 3) for k, v in self.busy.items()}
+        return stats
+
+
+def run_pipeline(inputs, **kwargs):
+    """run_pipeline(inputs, **kwargs) -> <dict obj. of the statistics>
+
+    :param:
+    :inputs: See in batch.collect_files().
+    :kwargs: See in Pipeline().
+    """
+    files = batch.collect_files(inputs)
+    pipeline = Pipeline(**kwargs)
+    logging.info("Pipeline crawling {0} files with {1} readers, {2} parsers "
+                 "and {3} writers...".format(len(files), pipeline.readers,
+                                             pipeline.parsers,
+                                             pipeline.writers))
+    stats = asyncio.run(pipeline.run(files))
+    logging.info("Pipeline finished: {0}".format(stats))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Crawl the Summary files/webpages by an asyncio pipeline.')
+    parser.add_argument('inputs', nargs='+',
+                        help='folders, files or glob patterns')
+    parser.add_argument('-p', '--parsers', type=int, default=None,
+                        help='parser processes (default: all cores)')
+    parser.add_argument('--readers', type=int, default=4,
+                        help='files read at the same time')
+    parser.add_argument('--writers', type=int, default=2,
+                        help='results written at the same time')
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='max items waiting between two stages')
+    parser.add_argument('-s', '--sink', action='append', choices=batch.SINKS,
+                        dest='sinks', help='output sinks (default: json)')
+    parser.add_argument('--json-path', default='output/json/',
+                        help='folder of the json output files')
+    parser.add_argument('--jsonl-path', default='output/jsonl/',
+                        help='folder of the json lines output files')
+    parser.add_argument('--csv-path', default='output/csv/',
+                        help='folder of the csv output file')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/0',
+                        help='Redis url of the redis-batch sink')
+    parser.add_argument('-b', '--backend', default='pyquery',
+                        choices=parser_backend.BACKENDS,
+                        help='parser backend of the documents')
+    parser.add_argument('--only', action='append', default=None,
+                        help='only crawl this segment, like "Sale"')
+    parser.add_argument('--prune', default=None, choices=batch.PRUNE_MODES,
+                        help='shrink the html before it is parsed')
+    parser.add_argument('--dup-policy', default=None,
+                        help='json policy of the duplicate label resolution')
+    parser.add_argument('--spec', default=None,
+                        help='json spec of the segments to be crawled')
+    args = parser.parse_args()
+
+    logging.basicConfig(filename='CoStar_log.log', level=logging.DEBUG)
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logging.getLogger().addHandler(console)
+
+    run_pipeline(args.inputs, parsers=args.parsers, readers=args.readers,
+                 writers=args.writers, queue_size=args.queue_size,
+                 sinks=args.sinks or ('json',), json_path=args.json_path,
+                 jsonl_path=args.jsonl_path, csv_path=args.csv_path,
+                 redis_url=args.redis_url, backend=args.backend,
+                 only=args.only, prune=args.prune,
+                 dup_policy_file=args.dup_policy, spec_file=args.spec)
+
+
+if __name__ == '__main__':
+    main()
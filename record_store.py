@@ -0,0 +1,124 @@
+"""
+This module is used for keeping the Summary.result records of a batch in
+memory with a compact layout. Each result is a dict repeating the same long
+flattened keys (like 'Traffic_Collection Street_1'), which costs most of the
+memory of a large batch. The RecordStore keeps:
+
+    schema      key -> column id, one copy of each key of all records
+    layouts     the sequence of column ids of a record, shared by all records
+                with the same keys (like the pages of the same property type)
+    rows        per record, the layout id and a tuple of the values
+
+The schema grows when a record with new keys is added. The short values
+(like '-', '' or 'Office') are interned, so the repeated ones are stored once.
+
+The records are exported to the existing sinks as dicts, with the keys in
+their original order: one .json file per record (file_operation.save_json),
+json lines (jsonl_sink.JsonlSink), or a csv file whose header is the schema.
+
+Classes:
+    RecordStore() -> store, store.add(record)
+"""
+
+
+import array
+import csv
+import os
+import file_operation
+import jsonl_sink
+
+
+ID_KEY = '   ID'
+# The values up to this length are interned.
+INTERN_MAX_LEN = 64
+
+
+class RecordStore(object):
+
+    def __init__(self):
+        # The schema, {key: column id} and [key of each column id].
+        self._columns = {}
+        self.keys = []
+        # {bytes of the column ids: layout id} and [column ids array].
+        self._layout_ids = {}
+        self._layouts = []
+        # The layout id and the values of each record.
+        self._row_layouts = array.array('I')
+        self._rows = []
+        self._values = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return (self.get(i) for i in range(len(self._rows)))
+
+    def column_id(self, key):
+        """The column id of the key, the schema grows for a new key."""
+        cid = self._columns.get(key)
+        if cid is None:
+            cid = self._columns[key] = len(self.keys)
+            self.keys.append(key)
+        return cid
+
+    def _intern(self, value):
+        if isinstance(value, str) and len(value) <= INTERN_MAX_LEN:
+            return self._values.setdefault(value, value)
+        return value
+
+    def add(self, record):
+        """Add one record (a dict like Summary.result) into the store."""
+        ids = array.array('I', map(self.column_id, record))
+        layout_key = ids.tobytes()
+        layout_id = self._layout_ids.get(layout_key)
+        if layout_id is None:
+            layout_id = self._layout_ids[layout_key] = len(self._layouts)
+            self._layouts.append(ids)
+        self._row_layouts.append(layout_id)
+        self._rows.append(tuple(map(self._intern, record.values())))
+
+    def get(self, index):
+        """get(index) -> <dict obj. of the record>"""
+        layout = self._layouts[self._row_layouts[index]]
+        keys = self.keys
+        return {keys[cid]: value
+                for cid, value in zip(layout, self._rows[index])}
+
+    def stats(self):
+        return {
+            'records': len(self._rows),
+            'columns': len(self.keys),
+            'layouts': len(self._layouts),
+            'interned_values': len(self._values)
+        }
+
+    def write_json(self, json_path):
+        """Save each record as a .json file named by its ID."""
+        os.makedirs(json_path, exist_ok=True)
+        for i, record in enumerate(self):
+            file_operation.save_json(os.path.join(json_path, ''),
+                                     str(record.get(ID_KEY, i)), record)
+
+    def write_jsonl(self, path='output/jsonl/', prefix='summary'):
+        """Save the records into json lines files, see in jsonl_sink.py."""
+        with jsonl_sink.JsonlSink(path, prefix) as sink:
+            for record in self:
+                sink.write(record)
+
+    def write_csv(self, csv_file_path, csv_file_name):
+        """Save the records into a csv file, whose header is the schema.
+
+        The same as file_operation.json_to_csv(), the missing keys of a
+        record are left "".
+        """
+        os.makedirs(csv_file_path, exist_ok=True)
+        with open(os.path.join(csv_file_path, csv_file_name + '.csv'), 'w',
+                  encoding='utf-8', newline="") as csvfw:
+            writer = csv.writer(csvfw)
+            writer.writerow(self.keys)
+            width = len(self.keys)
+            for layout_id, values in zip(self._row_layouts, self._rows):
+                row = [""] * width
+                for cid, value in zip(self._layouts[layout_id], values):
+                    row[cid] = value
+                writer.writerow(row)
@@ -0,0 +1,170 @@
+"""
+This module is used for saving the Summary.result records into Redis in
+batches. redisdb.save_in_redis() costs one round-trip per record, while
+RedisBatchWriter queues the records in a pipeline and sends them together
+when the batch reaches batch_records records or batch_bytes bytes, and when
+the writer is flushed/closed at the end of the batch.
+
+Each record is saved as a hash named '<table>:<ID>', like 'Summary:020-1',
+whose fields are the keys of Summary.result. A record without ID is named by
+its address, the same key as delta_store.record_key(), so the hashes of the
+different worker processes never collide. The records with neither of them
+are skipped and counted. A delta record (see in delta_store.py) only updates
+the changed fields of the hash, with its '_version'.
+
+The Redis client is created from a connection pool of the 'redis' package,
+or passed in directly (client=...), e.g. a fake client for testing, which
+only needs the client.pipeline(transaction) -> pipe.hset(name, mapping),
+pipe.hdel(name, *keys), pipe.execute() methods.
+
+Classes:
+    RedisBatchWriter(url, table, ...) -> writer, writer.write(record),
+        writer.write_delta(delta)
+"""
+
+
+import logging
+import time
+import delta_store
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+ID_KEY = '   ID'
+
+
+class RedisBatchWriter(object):
+    """
+    Pipelined and pooled batch writer of Summary.result records.
+
+    :param:
+    :url: The Redis url, like 'redis://localhost:6379/0'.
+    :table: The prefix of the hash names, like 'Summary'.
+    :client: The Redis client, by default (None) created from a connection
+        pool of the url.
+    :batch_records: Send the pipeline after this number of records.
+    :batch_bytes: Send the pipeline after this size of keys and values.
+    :transaction: Whether to send each batch in MULTI/EXEC.
+    :max_connections: The size of the connection pool.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', table='Summary',
+                 client=None, batch_records=500, batch_bytes=4 * 1024 * 1024,
+                 transaction=False, max_connections=4):
+        if client is None:
+            if redis is None:
+                raise ImportError("The 'redis' package is needed by "
+                                  "RedisBatchWriter, or pass in the client.")
+            pool = redis.ConnectionPool.from_url(
+                url, max_connections=max_connections)
+            client = redis.Redis(connection_pool=pool)
+        self.client = client
+        self.table = table
+        self.batch_records = batch_records
+        self.batch_bytes = batch_bytes
+        self.transaction = transaction
+        self.records = 0
+        self.skipped = 0
+        self.round_trips = 0
+        self._pipe = None
+        self._pending = 0
+        self._pending_bytes = 0
+        self._start = time.perf_counter()
+
+    def hash_name(self, record):
+        """hash_name(record) -> <str obj.> or None
+
+        The name of the hash of the record, by its ID or its address, None if
+        it has neither of them.
+        """
+        if not (record.get(ID_KEY) or
+                any(record.get(key) for key in delta_store.ADDRESS_KEYS)):
+            return None
+        return '{0}:{1}'.format(self.table, delta_store.record_key(record))
+
+    def _skip(self, record):
+        self.skipped += 1
+        logging.warning("Redis writer: the record without ID or address is "
+                        "skipped, its keys are {0}".format(list(record)[:5]))
+
+    def write(self, record):
+        """Queue one record, the pipeline is sent when the batch is full."""
+        if not record:
+            return
+        name = self.hash_name(record)
+        if name is None:
+            self._skip(record)
+            return
+        if self._pipe is None:
+            self._pipe = self.client.pipeline(transaction=self.transaction)
+        self._pipe.hset(name, mapping=record)
+        self.records += 1
+        self._pending += 1
+        self._pending_bytes += sum(len(k) + len(str(v))
+                                   for k, v in record.items())
+        if self._pending >= self.batch_records or \
+                self._pending_bytes >= self.batch_bytes:
+            self.flush()
+
+    def write_delta(self, delta):
+        """Queue one delta record (see in delta_store.py), the fields of the
+        hash are updated in place: the added and changed keys are set, the
+        removed keys are deleted."""
+        name = self.hash_name(delta)
+        if name is None:
+            self._skip(delta)
+            return
+        if self._pipe is None:
+            self._pipe = self.client.pipeline(transaction=self.transaction)
+        mapping = dict(delta['_added'], **delta['_changed'])
+        mapping['_version'] = delta['_version']
+        self._pipe.hset(name, mapping=mapping)
+        if delta['_removed']:
+            self._pipe.hdel(name, *delta['_removed'])
+        self.records += 1
+        self._pending += 1
+        self._pending_bytes += sum(len(k) + len(str(v))
+                                   for k, v in mapping.items())
+        if self._pending >= self.batch_records or \
+                self._pending_bytes >= self.batch_bytes:
+            self.flush()
+
+    @property
+    def buffered(self):
+        """The number of records queued but not sent yet."""
+        return self._pending
+
+    def flush(self):
+        """Send the queued records in one round-trip."""
+        if self._pending:
+            self._pipe.execute()
+            self.round_trips += 1
+        self._pipe = None
+        self._pending = 0
+        self._pending_bytes = 0
+
+    def stats(self):
+        """Return the records (and those skipped), records/sec and the
+        round-trips saved."""
+        elapsed = time.perf_counter() - self._start
+        return {
+            'records': self.records,
+            'skipped': self.skipped,
+            'round_trips': self.round_trips,
+            'round_trips_saved': self.records - self.round_trips,
+            'records_per_sec': round(self.records / elapsed, 2)
+            if elapsed else 0.0
+        }
+
+    def close(self):
+        self.flush()
+        logging.info("Redis writer: {0}".format(self.stats()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
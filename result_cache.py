@@ -0,0 +1,132 @@
+"""
+This module is used for caching the Summary.result of each file/webpage on
+disk. The same page snapshot often appears in several dumps (the same
+property under different folders or dates), the cache returns the stored
+result directly instead of parsing it again.
+
+The results are saved in a SQLite database (zlib compressed json), keyed by
+the content hash of the html and the extractor version
+(summary.EXTRACTOR_VERSION). The cache is bounded by size, the least recently
+used results are evicted first.
+
+The '   ID' of the result comes from the file name, not the content, so it's
+replaced by the ID of the file when the result is taken from the cache.
+
+Classes:
+    ResultCache(db_path, extractor_version, max_bytes) -> cache
+"""
+
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+
+class ResultCache(object):
+    """
+    :param:
+    :db_path: The path of the SQLite database file.
+    :extractor_version: The version of the extraction, part of the key.
+    :max_bytes: The max total size of the stored (compressed) results.
+    """
+
+    # Re-read the total size after this number of puts, since the other
+    # worker processes write into the same database.
+    SYNC_EVERY = 100
+
+    def __init__(self, db_path, extractor_version, max_bytes=1024 ** 3):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.extractor_version = str(extractor_version)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._conn = sqlite3.connect(db_path, timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, value BLOB, size INTEGER, '
+            'last_access REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_last_access '
+                           'ON results (last_access)')
+        self._conn.commit()
+        self._puts = 0
+        self._total = self._total_bytes()
+
+    def _key(self, content_hash):
+        return '{0}:{1}'.format(self.extractor_version, content_hash)
+
+    def _total_bytes(self):
+        return self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def get(self, content_hash, html_size=0):
+        """get(content_hash, html_size) -> result dict or None
+
+        :param:
+        :content_hash: The hash of the html, see in manifest.file_hash().
+        :html_size: The size of the html, counted into bytes_saved if hit.
+        """
+        key = self._key(content_hash)
+        row = self._conn.execute('SELECT value FROM results WHERE key = ?',
+                                 (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._conn.execute('UPDATE results SET last_access = ? WHERE key = ?',
+                           (time.time(), key))
+        self._conn.commit()
+        self.hits += 1
+        self.bytes_saved += html_size
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, content_hash, result):
+        """Store the result, and evict the old ones if the cache is full."""
+        value = zlib.compress(json.dumps(result).encode('utf-8'))
+        self._conn.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+            (self._key(content_hash), value, len(value), time.time()))
+        self._conn.commit()
+        self._puts += 1
+        self._total += len(value)
+        if self._puts % self.SYNC_EVERY == 0:
+            self._total = self._total_bytes()
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used results down to 90% of max_bytes.
+        """
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute(
+            'SELECT key, size FROM results ORDER BY last_access')
+        total = self._total_bytes()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        rows.close()
+        self._conn.executemany('DELETE FROM results WHERE key = ?', evicted)
+        self._conn.commit()
+        self._total = total
+
+    def stats(self):
+        """Return the hit ratio and the html bytes saved from parsing."""
+        looked_up = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / looked_up, 4) if looked_up else 0.0,
+            'bytes_saved': self.bytes_saved
+        }
+
+    def close(self):
+        self._conn.close()
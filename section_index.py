@@ -0,0 +1,249 @@
+"""
+This module is used for indexing the sections of a Summary file/webpage in
+one pass, so the segment extractors query the small subtree of their own
+section instead of the whole page.
+
+The index maps:
+    h1 title                ->  the section (parent node) of the h1 title
+    id                      ->  nodes, like '#TrafficTable'
+    data-viewmodelname      ->  nodes, like "[data-viewmodelname='propertySale']"
+    data-bind               ->  nodes, like "[data-bind='visible: hasAirports']"
+    class in SECTION_CLASSES -> nodes, like '.property-marketConditions'
+
+SectionIndex is called as the document object it wraps (PyQuery object or
+the other backend in parser_backend.py), index(css_selector).
+If the first part of the css selector is one of the indexed nodes, the rest
+part of the selector only runs in the subtree of these nodes, which gives
+the same result as the global query. Otherwise it runs over the whole page.
+
+The nodes selected by each distinct css selector are memoized per document,
+so the selectors repeated by the segments (like the data-bind of the Market
+Conditions sub-tables) run only once. The leading part of a selector is
+memoized as well, so the part shared by the headers and the rows of a table
+isn't selected again. Each call returns a new object of the memoized nodes,
+which could be changed (e.g. by .extend()) by the caller. The document itself
+isn't supposed to be changed after it's indexed.
+
+Classes:
+    SectionIndex(pq_doc) -> index, index(css_selector) -> PyQuery object
+Functions:
+    split_selector(css_selector) -> (index kind, value, rest part) or None
+    has_positional(css_selector) -> bool
+    stats() -> {'hits': n, 'misses': n}, the memo of all documents
+    clear() -> None
+"""
+
+
+import re
+from lxml import etree
+import selector_cache
+
+
+# The classes used as the first part of the selectors in Summary and id_add.
+SECTION_CLASSES = {
+    'property-location', 'property-contacts', 'property-marketConditions',
+    'public-transportation-layout', 'amenities-header', 'subHeaderContainer'
+}
+
+# The first part of a css selector, which could be looked up in the index.
+_ROOT_RE = re.compile(
+    r"""^(?:\#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)|"""
+    r"""\[(?P<attr>data-viewmodelname|data-bind)=(?P<q>['"])(?P<val>.*?)(?P=q)\])"""
+    r"""(?=\s|$)"""
+)
+# The jQuery positional pseudo-classes, which count the nodes of the whole
+# query, so they can't run in the subtrees of the indexed nodes.
+_POSITIONAL_RE = re.compile(
+    r':(?:first|last|even|odd)(?![\w-])|:(?:eq|gt|lt)\(')
+
+# The memo counters of all documents of current process.
+_stats = {'hits': 0, 'misses': 0}
+
+
+class SectionIndex(object):
+    """
+    Build the index of the PyQuery object of a whole page in one pass.
+
+    :param:
+    :pq_doc: The PyQuery object of the web-page source code.
+
+    Attributes:
+    :titles: The h1 titles of '#content' in the order of the web-page.
+    :sections: Dict of {h1 title: the section node of the title}.
+    :memo_hits, memo_misses: The memo counters of this document.
+    """
+
+    def __init__(self, pq_doc):
+        # A plain PyQuery object is switched to the one with the cached
+        # css-to-xpath translation, see in selector_cache.py.
+        pq_doc = selector_cache.cached(pq_doc)
+        self._pq_doc = pq_doc
+        # {css selector: tuple of the selected nodes}
+        self._memo = {}
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self._nodes = {'id': {}, 'cls': {}, 'data-viewmodelname': {},
+                       'data-bind': {}}
+        ids = self._nodes['id']
+        classes = self._nodes['cls']
+        view_models = self._nodes['data-viewmodelname']
+        binds = self._nodes['data-bind']
+
+        for root in pq_doc:
+            for node in root.iter(tag=etree.Element):
+                attrib = node.attrib
+                if not attrib:
+                    continue
+                if 'id' in attrib:
+                    ids.setdefault(attrib['id'], []).append(node)
+                if 'data-viewmodelname' in attrib:
+                    view_models.setdefault(attrib['data-viewmodelname'],
+                                           []).append(node)
+                if 'data-bind' in attrib:
+                    binds.setdefault(attrib['data-bind'], []).append(node)
+                if 'class' in attrib:
+                    for cls in attrib['class'].split():
+                        if cls in SECTION_CLASSES:
+                            classes.setdefault(cls, []).append(node)
+
+        self.titles = []
+        self.sections = {}
+        for content in ids.get('content', []):
+            for h1 in content.iterdescendants('h1'):
+                title = pq_doc.__class__([h1]).text()
+                self.titles.append(title)
+                self.sections.setdefault(title, h1.getparent())
+
+    def __call__(self, css_selector):
+        """index(css_selector) -> PyQuery object, same as pq_doc(css_selector)
+        """
+        return self._pq_doc.__class__(list(self._memoized(css_selector)))
+
+    def _memoized(self, css_selector):
+        """The tuple of the nodes selected by the css selector, selected only
+        once for the document."""
+        nodes = self._memo.get(css_selector)
+        if nodes is None:
+            self.memo_misses += 1
+            _stats['misses'] += 1
+            nodes = tuple(self._select(css_selector))
+            self._memo[css_selector] = nodes
+        else:
+            self.memo_hits += 1
+            _stats['hits'] += 1
+        return nodes
+
+    def _select(self, css_selector):
+        roots, rest = self._lookup(css_selector)
+        if roots is None:
+            return self._pq_doc(css_selector)
+        if not rest:
+            return roots
+        steps = _descendant_steps(rest)
+        if len(steps) > 1:
+            # The leading part is shared by the selectors of the same table
+            # (like the headers and rows of the Public Transportation), so
+            # it's memoized too, only the last step runs below its nodes.
+            rest = steps[-1]
+            roots = self._memoized(css_selector.strip()[:-len(rest)].rstrip())
+        nodes = self._pq_doc.__class__(list(roots)).find(rest)
+        if len(roots) > 1:
+            # The subtrees of nested roots may find the same node twice.
+            seen = set()
+            nodes = [n for n in nodes if not (n in seen or seen.add(n))]
+        return nodes
+
+    def _lookup(self, css_selector):
+        """Split the css selector -> (indexed root nodes or None, rest part)
+        """
+        parts = split_selector(css_selector)
+        if parts is None:
+            return None, css_selector.strip()
+        kind, value, rest = parts
+        return self._nodes[kind].get(value, []), rest
+
+    def section(self, title):
+        """Return the PyQuery object of the section of the h1 title."""
+        node = self.sections.get(title)
+        return self._pq_doc.__class__([node] if node is not None else [])
+
+    def memo_stats(self):
+        """Return the memo counters and the number of memoized selectors of
+        this document."""
+        return {'hits': self.memo_hits, 'misses': self.memo_misses,
+                'size': len(self._memo)}
+
+
+def split_selector(css_selector):
+    """split_selector(css_selector) -> (index kind, value, rest part) or None
+
+    The index kind is 'id', 'cls', 'data-viewmodelname' or 'data-bind', the
+    rest part is the selector run in the subtree of the indexed nodes. None
+    if the selector isn't looked up in the index.
+    """
+    css_selector = css_selector.strip()
+    m = _ROOT_RE.match(css_selector)
+    if not m:
+        return None
+    rest = css_selector[m.end():].strip()
+    # Selector groups, child/sibling combinators and positional
+    # pseudo-classes after the first part are not supported by the index,
+    # use the global query instead.
+    if rest[:1] in ('>', '+', '~') or \
+            ',' in re.sub(r'\[.*?\]', '', css_selector) or \
+            has_positional(rest):
+        return None
+    if m.group('id'):
+        return 'id', m.group('id'), rest
+    if m.group('cls'):
+        if m.group('cls') not in SECTION_CLASSES:
+            return None
+        return 'cls', m.group('cls'), rest
+    return m.group('attr'), m.group('val'), rest
+
+
+def has_positional(css_selector):
+    """Whether the css selector has a jQuery positional pseudo-class (out
+    of the attribute brackets), like ':first', ':eq(1)' or ':gt(0)'."""
+    return _POSITIONAL_RE.search(re.sub(r'\[.*?\]', '', css_selector)) \
+        is not None
+
+
+def _descendant_steps(css_selector):
+    """Split the css selector by its descendant combinators (the spaces out
+    of the brackets and quotes) -> list of the steps, or the whole selector
+    in a list if it has the other combinators or a positional pseudo-class
+    (whose leading part selects other nodes, see in has_positional())."""
+    if has_positional(css_selector):
+        return [css_selector]
+    steps = ['']
+    depth = 0
+    quote = None
+    for char in css_selector:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif not depth:
+            if char in '>+~,':
+                return [css_selector]
+            if char.isspace():
+                if steps[-1]:
+                    steps.append('')
+                continue
+        steps[-1] += char
+    return [step for step in steps if step]
+
+
+def stats():
+    """Return the memo counters of all documents of current process."""
+    return dict(_stats)
+
+
+def clear():
+    _stats['hits'] = _stats['misses'] = 0
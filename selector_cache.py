@@ -0,0 +1,85 @@
+"""
+This module is used for translating each css selector to XPath only once per
+process. All selectors of summary.Summary, tool_funcs and id_add run through
+the document objects of parser_backend.py, which look up this registry:
+
+    'lxml' backend:     xpath(css) -> compiled lxml.etree.XPath object
+    'pyquery' backend:  CachedPyQuery, a PyQuery object whose css-to-xpath
+                        translation is looked up by translate(css)
+
+The translation is the same as PyQuery's (JQueryTranslator), so the selected
+nodes are the same ones.
+
+Functions:
+    translate(css_selector, prefix) -> XPath string
+    xpath(css_selector, prefix) -> compiled XPath object
+    stats() -> {'hits': n, 'misses': n, 'size': n}
+    clear() -> None
+Classes:
+    CachedPyQuery -> PyQuery with the cached css-to-xpath translation
+"""
+
+
+from lxml import etree
+from pyquery import PyQuery
+from pyquery.cssselectpatch import JQueryTranslator
+
+
+_translator = JQueryTranslator(xhtml=False)
+# {(css selector, prefix): [XPath string, compiled XPath object or None]}
+_registry = {}
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _entry(css_selector, prefix):
+    key = (css_selector, prefix)
+    entry = _registry.get(key)
+    if entry is None:
+        _stats['misses'] += 1
+        entry = [_translator.css_to_xpath(css_selector.replace('[@', '['),
+                                          prefix), None]
+        _registry[key] = entry
+    else:
+        _stats['hits'] += 1
+    return entry
+
+
+def translate(css_selector, prefix='descendant-or-self::'):
+    """translate(css_selector, prefix) -> <str obj. of XPath>"""
+    return _entry(css_selector, prefix)[0]
+
+
+def xpath(css_selector, prefix='descendant-or-self::'):
+    """xpath(css_selector, prefix) -> <lxml.etree.XPath obj.>"""
+    entry = _entry(css_selector, prefix)
+    if entry[1] is None:
+        entry[1] = etree.XPath(entry[0])
+    return entry[1]
+
+
+def stats():
+    """Return the hit/miss counters and the number of cached selectors."""
+    return dict(_stats, size=len(_registry))
+
+
+def clear():
+    _registry.clear()
+    _stats['hits'] = _stats['misses'] = 0
+
+
+class CachedPyQuery(PyQuery):
+    """
+    PyQuery object with the css-to-xpath translation looked up in the
+    registry. All PyQuery objects derived from it (doc(css), .items(),
+    .find(), ...) are CachedPyQuery objects too.
+    """
+
+    def _css_to_xpath(self, selector, prefix='descendant-or-self::'):
+        return translate(selector, prefix)
+
+
+def cached(pq_doc):
+    """Switch a plain PyQuery object to CachedPyQuery (same nodes)."""
+    if type(pq_doc) is PyQuery:
+        return CachedPyQuery(pq_doc[:])
+    return pq_doc
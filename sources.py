@@ -0,0 +1,166 @@
+"""
+This module is used for reading the Summary pages straight out of the
+archives of the CoStar dumps (.zip, .tar, .tar.gz/.tgz, .tar.bz2, .tar.xz),
+without extracting them to disk first.
+
+The pages are handed to the batch workers as tasks:
+
+    'F:/.../Offices/020-1.html'                     a file on disk
+    ('zip', 'dump.zip', 'Offices/020-1.html')       a member of a zip archive
+    ('tar', 'dump.tar.gz', 'Offices/020-1.html', b'<html>...')
+                                                    a member of a tar archive
+
+The zip members are read by the workers themselves (each worker opens the
+archive once), since a zip archive could be read at any member. A compressed
+tar archive could only be read from its start, so it's streamed once by the
+main process, and the content of each member is sent with its task. The
+BoundedFeed limits the number of tasks sent but not finished, so a large tar
+archive is never loaded into memory at once.
+
+The name of a member task is '<archive>!<member>', like
+'dump.zip!Offices/020-1.html' (the drive of a Windows path has a ':'), and
+its file id is taken from the member name, like '020-1'. The members are
+recorded into the manifest by this name, see in batch.py.
+
+Classes:
+    BoundedFeed(tasks, limit) -> iterable of the tasks, feed.release()
+Functions:
+    is_archive(path) -> bool
+    collect_archives(inputs) -> sorted list of the archive paths
+    iter_archive_tasks(archive_paths) -> generator of the member tasks
+    task_name(task) -> str
+    read_task(task) -> bytes of the member
+    decode(data) -> str of the page
+"""
+
+
+import glob
+import logging
+import os
+import tarfile
+import threading
+import zipfile
+import file_operation
+
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2',
+                      '.tar.xz', '.txz')
+HTML_EXTENSIONS = ('.html', '.htm')
+
+# The zip archives opened by this process, {archive path: ZipFile}.
+_zip_files = {}
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def collect_archives(inputs):
+    """collect_archives(inputs) -> <list obj. of the archive paths>
+
+    :param:
+    :inputs: The same as batch.collect_files(), the archive files and the
+        archives matched by the glob patterns are collected, the folders
+        aren't searched for archives.
+    """
+    archives = set()
+    for item in inputs:
+        if os.path.isfile(item):
+            if is_archive(item):
+                archives.add(item)
+        elif not os.path.isdir(item):
+            archives.update(path for path in glob.glob(item, recursive=True)
+                            if os.path.isfile(path) and is_archive(path))
+    return sorted(archives)
+
+
+def _is_page(member_name):
+    return member_name.lower().endswith(HTML_EXTENSIONS)
+
+
+def iter_archive_tasks(archive_paths):
+    """iter_archive_tasks(archive_paths) -> <generator obj. of the tasks>
+
+    The zip members are listed in the order of their names, the tar members
+    are streamed in the order of the archive. A broken archive is logged and
+    skipped.
+    """
+    for archive in archive_paths:
+        try:
+            if archive.lower().endswith('.zip'):
+                with zipfile.ZipFile(archive) as zf:
+                    names = sorted(
+                        info.filename for info in zf.infolist()
+                        if not info.is_dir() and _is_page(info.filename))
+                for name in names:
+                    yield 'zip', archive, name
+            else:
+                # 'r|*' reads the (compressed) archive as a stream, without
+                # seeking back.
+                with tarfile.open(archive, 'r|*') as tf:
+                    for member in tf:
+                        if member.isfile() and _is_page(member.name):
+                            yield ('tar', archive, member.name,
+                                   tf.extractfile(member).read())
+        except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+            # The members read before are still crawled.
+            logging.warning("Failed: {0} -> {1}: {2}".format(
+                archive, type(e).__name__, e))
+
+
+def task_name(task):
+    """task_name(task) -> <str obj.>, the path or '<archive>!<member>'"""
+    if isinstance(task, str):
+        return task
+    return '{0}!{1}'.format(task[1], task[2])
+
+
+def read_task(task):
+    """read_task(task) -> <bytes obj. of the member of the archive task>"""
+    if task[0] == 'tar':
+        return task[3]
+    zf = _zip_files.get(task[1])
+    if zf is None:
+        zf = _zip_files[task[1]] = zipfile.ZipFile(task[1])
+    return zf.read(task[2])
+
+
+def decode(data):
+    """Decode the page by its BOM or meta charset, by default in utf-8 as
+    file_operation.file_read() does."""
+    return data.decode(file_operation.detect_charset(data[:4096]))
+
+
+class BoundedFeed(object):
+    """
+    The iterable of the tasks for multiprocessing.Pool.imap_unordered(),
+    which waits when 'limit' tasks have been taken but not released (one
+    release() per finished task). The limit has to be larger than the
+    chunksize of imap_unordered().
+
+    :param:
+    :tasks: The iterable of the tasks.
+    :limit: The max number of the tasks taken but not finished.
+    """
+
+    def __init__(self, tasks, limit):
+        self._tasks = tasks
+        self._semaphore = threading.Semaphore(limit)
+        self._closed = False
+
+    def __iter__(self):
+        for task in self._tasks:
+            # The timeout lets the feeding thread of the pool stop when the
+            # feed is closed (e.g. the batch failed).
+            while not self._semaphore.acquire(timeout=0.5):
+                if self._closed:
+                    return
+            if self._closed:
+                return
+            yield task
+
+    def release(self):
+        self._semaphore.release()
+
+    def close(self):
+        self._closed = True
@@ -0,0 +1,377 @@
+"""
+This module is used for crawling the very large Summary files/webpages
+without building the whole document tree. parser_backend.parse() builds the
+tree of the whole page before the crawling starts, so the memory grows with
+the page (like thousands of Tenants or Leasing Activity rows).
+
+Here the file is read by the pull parser of lxml (etree.iterparse), and the
+nodes are checked as they stream past:
+
+    kept        The nodes which could be selected by the segments of the plan
+                (see in extraction_plan.py), by the '#content h1' titles and
+                by id_add.address(), with their subtrees. Their ancestors are
+                kept as empty "shells" (tag and attributes, without text), so
+                each selector selects the same nodes as on the whole tree.
+    read ahead  The table rows of the plan (like '#TenantsTable tbody tr'),
+                which are read into lists of the cell texts as soon as they're
+                parsed (see in tool_funcs.crawl_each_row()), then dropped.
+    dropped     All other nodes, as soon as they're parsed.
+
+So the tree in memory is bounded by the kept sections and one table row,
+regardless of the number of the rows. The kept skeleton is crawled by the
+same summary.Summary, with the rows read ahead, and gives the same result as
+batch.crawl_file().
+
+The selectors of the plan are matched by StreamRules, which supports the
+compound selectors of tag, #id, .class and [attr=value] with the descendant
+combinator (all selectors of summary_spec.json).
+
+Usage:
+    s = stream_extract.crawl_file('F:/.../Offices/020-1.html', '020-1')
+    python batch.py F:/.../Offices --input stream
+
+Functions:
+    skeleton(source, rules, html, encoding) -> (root node, table rows)
+    crawl_file(file_path, file_id, backend, only, plan) -> Summary object
+Classes:
+    StreamRules(plan) -> rules, the nodes kept and the rows read ahead
+"""
+
+
+import re
+from lxml import etree
+import extraction_plan
+import file_operation
+import metrics
+import parser_backend
+import selector_cache
+import summary
+import tool_funcs
+
+
+# The selectors used out of the plan: the titles of section_index.py, and
+# the ones of id_add.address().
+FIXED_SELECTORS = ('#content h1', '[style="float:left"]',
+                   '.subHeaderContainer b')
+
+# The compounds of a selector, split by the spaces out of the brackets.
+_COMPOUNDS_RE = re.compile(r"""(?:\[[^\]]*\]|[^\s\[])+""")
+_ATTR = r"""\[[\w-]+(?:=(?:"[^"]*"|'[^']*'|[\w-]+))?\]"""
+_COMPOUND_RE = re.compile(
+    r"""^(?P<tag>[\w-]+|\*)?"""
+    r"""(?P<parts>(?:\#[\w-]+|\.[\w-]+|""" + _ATTR + r""")*)$""")
+# The fields formatted later, like '{slug}'.
+_FIELD_RE = re.compile(r"\{\w*\}")
+_PART_RE = re.compile(
+    r"""\#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)|"""
+    r"""\[(?P<attr>[\w-]+)"""
+    r"""(?:=(?:"(?P<v1>[^"]*)"|'(?P<v2>[^']*)'|(?P<v3>[\w-]+)))?\]""")
+
+
+def _parse_compound(text):
+    """'tr.odd[data-bind="x"]' -> (tag, id, classes, ((attr, value), ...))"""
+    m = _COMPOUND_RE.match(text)
+    if not m:
+        raise ValueError("The selector '{0}' can't be streamed".format(text))
+    tag = m.group('tag') if m.group('tag') != '*' else None
+    node_id = None
+    classes = []
+    attrs = []
+    for part in _PART_RE.finditer(m.group('parts')):
+        if part.group('id'):
+            node_id = part.group('id')
+        elif part.group('cls'):
+            classes.append(part.group('cls'))
+        else:
+            value = [v for v in part.group('v1', 'v2', 'v3') if v is not None]
+            attrs.append((part.group('attr'), value[0] if value else None))
+    return tag, node_id, tuple(classes), tuple(attrs)
+
+
+def _parse_selector(css_selector):
+    """The css selector -> tuple of the compounds of the descendants chain.
+
+    The compounds formatted later (like '.{slug}' of the 'subsections') are
+    left out, so the chain selects more nodes, never less.
+    """
+    compounds = _COMPOUNDS_RE.findall(css_selector)
+    chain = tuple(_parse_compound(c) for c in compounds
+                  if not _FIELD_RE.search(c))
+    if not chain:
+        raise ValueError("The selector '{0}' can't be streamed"
+                         .format(css_selector))
+    return chain
+
+
+def _match(node, compound):
+    tag, node_id, classes, attrs = compound
+    if tag is not None and node.tag != tag:
+        return False
+    if node_id is not None and node.get('id') != node_id:
+        return False
+    if classes:
+        node_classes = node.get('class', '').split()
+        if not all(cls in node_classes for cls in classes):
+            return False
+    for name, value in attrs:
+        node_value = node.get(name)
+        if node_value is None or (value is not None and node_value != value):
+            return False
+    return True
+
+
+def _match_chain(node, ancestors, chain):
+    """Whether the node (with its ancestors, from the root) is selected by the
+    descendants chain."""
+    if not _match(node, chain[-1]):
+        return False
+    i = len(chain) - 2
+    for ancestor in reversed(ancestors):
+        if i < 0:
+            break
+        if _match(ancestor, chain[i]):
+            i -= 1
+    return i < 0
+
+
+class _ChainIndex(object):
+    """The chains looked up by the id, a class, an attribute or the tag of
+    their last compound, so each node is only matched with a few chains."""
+
+    def __init__(self):
+        self._chains = {}
+
+    def add(self, chain, value):
+        tag, node_id, classes, attrs = chain[-1]
+        if node_id is not None:
+            key = ('id', node_id)
+        elif classes:
+            key = ('class', classes[0])
+        elif attrs:
+            key = ('attr',) + attrs[0]
+        else:
+            key = ('tag', tag)
+        self._chains.setdefault(key, []).append((chain, value))
+
+    def find(self, node, ancestors):
+        """find(node, ancestors) -> <list obj. of the values of the chains
+        selecting the node>"""
+        get = self._chains.get
+        candidates = []
+        attrib = node.attrib
+        if attrib:
+            if 'id' in attrib:
+                candidates += get(('id', attrib['id']), ())
+            if 'class' in attrib:
+                for cls in attrib['class'].split():
+                    candidates += get(('class', cls), ())
+            for name, value in attrib.items():
+                candidates += get(('attr', name, value), ())
+                candidates += get(('attr', name, None), ())
+        candidates += get(('tag', node.tag), ())
+        candidates += get(('tag', None), ())
+        return [value for chain, value in candidates
+                if _match_chain(node, ancestors, chain)]
+
+
+class StreamRules(object):
+    """
+    The selectors of the plan compiled for the streaming.
+
+    :param:
+    :plan: extraction_plan.Plan object, by default (None) the plan of
+        current process.
+
+    Raise ValueError if a selector of the plan can't be streamed.
+    """
+
+    def __init__(self, plan=None):
+        plan = plan or extraction_plan.current_plan()
+        self.keep = _ChainIndex()
+        self.rows = _ChainIndex()
+        self.row_selectors = []
+        for css in FIXED_SELECTORS:
+            self._keep(css)
+        for seg in plan.segments.values():
+            kind = seg['kind']
+            if kind == 'pairs':
+                self._keep(seg['selector'])
+                for name, value in seg['extra_pairs']:
+                    self._keep(name)
+                    self._keep(value)
+            elif kind == 'subsections':
+                self._keep(seg['titles'])
+                self._keep(seg['content'])
+            elif kind == 'method':
+                for css in seg['keep']:
+                    self._keep(css)
+            else:
+                if seg['prefix_selector']:
+                    self._keep(seg['prefix_selector'])
+                for table in seg['tables']:
+                    self._keep(table['headers'])
+                    if table['skip_rows'] or table['skip_cells']:
+                        # The cells are read from the kept rows.
+                        self._keep(table['rows'])
+                        continue
+                    for css in [table['rows']] + table['extra_rows']:
+                        self._read_ahead(css, table['cells'],
+                                         seg['replace_string'],
+                                         table['data_start'],
+                                         table['data_end'])
+
+    def _keep(self, css_selector):
+        self.keep.add(_parse_selector(css_selector), css_selector)
+
+    def _read_ahead(self, css_selector, cells, replace, start, end):
+        if css_selector in self.row_selectors:
+            # Read by another table of the plan.
+            return
+        self.row_selectors.append(css_selector)
+        self.rows.add(_parse_selector(css_selector),
+                      (css_selector, cells, replace, start, end))
+
+
+def _drop(node):
+    parent = node.getparent()
+    if parent is not None:
+        parent.remove(node)
+
+
+def skeleton(source, rules, html=True, encoding=None):
+    """skeleton(source, rules, html, encoding) -> (root node, table rows)
+
+    :param:
+    :source: The file path or file object of the page.
+    :rules: StreamRules object.
+    :html: Parse the source as html, or as xml (False).
+    :encoding: The encoding of the html, by default (None) from the source.
+
+    :return: The root node of the kept skeleton, and the dict of
+        {rows css selector: [the cell texts of each row]}.
+    """
+    table_rows = {css: [] for css in rules.row_selectors}
+    # The open nodes from the root, and their states as [in a kept subtree,
+    # root of a kept subtree, rules of the row read ahead, row with a kept
+    # node inside].
+    open_nodes = []
+    states = []
+    open_rows = []
+    # {open node: its shell in the skeleton}
+    shells = {}
+    root = None
+
+    def keep(node):
+        nonlocal root
+        # The tail text belongs to the parent, which isn't kept.
+        node.tail = None
+        parent = None
+        for ancestor in open_nodes:
+            shell = shells.get(ancestor)
+            if shell is None:
+                if parent is None:
+                    shell = root = etree.Element(ancestor.tag,
+                                                 dict(ancestor.attrib))
+                else:
+                    shell = etree.SubElement(parent, ancestor.tag,
+                                             dict(ancestor.attrib))
+                shells[ancestor] = shell
+            parent = shell
+        if parent is None:
+            root = node
+        else:
+            parent.append(node)
+
+    kwargs = {'html': True, 'encoding': encoding} if html else {}
+    for event, node in etree.iterparse(source, events=('start', 'end'),
+                                       **kwargs):
+        if event == 'start':
+            kept = bool(states) and states[-1][0]
+            is_root = not kept and bool(rules.keep.find(node, open_nodes))
+            state = [kept or is_root, is_root,
+                     rules.rows.find(node, open_nodes), False]
+            open_nodes.append(node)
+            states.append(state)
+            if state[2]:
+                open_rows.append(state)
+            continue
+
+        open_nodes.pop()
+        kept, is_root, rows, has_kept = states.pop()
+        shells.pop(node, None)
+        if rows:
+            open_rows.pop()
+            row_doc = parser_backend.LxmlQuery((node,))
+            for css, cells, replace, start, end in rows:
+                table_rows[css].append(tool_funcs.crawl_each_row(
+                    row_doc, cells, replace, start, end))
+            if has_kept or is_root:
+                keep(node)
+            else:
+                _drop(node)
+        elif is_root:
+            if open_rows:
+                # Kept with the row, whose cells aren't read yet.
+                open_rows[-1][3] = True
+            else:
+                keep(node)
+        elif not kept and not open_rows:
+            _drop(node)
+    if root is None:
+        root = etree.Element('html')
+    return root, table_rows
+
+
+def crawl_file(file_path, file_id, backend='pyquery', only=None, plan=None):
+    """crawl_file(file_path, file_id, backend, only, plan)
+        -> <summary.Summary obj.>
+
+    The same as batch.crawl_file(), by streaming the file. The empty files
+    and the fragments (not starting with '<html' or '<!doctype') are parsed
+    as before, see in parser_backend.parse_file().
+
+    :param:
+    :backend: The backend of the document object of the kept skeleton, see in
+        parser_backend.py.
+    :only: The segments titles to be crawled, by default (None) all of them.
+    :plan: extraction_plan.Plan object, by default (None) the plan of
+        current process.
+    """
+    plan = plan or extraction_plan.current_plan()
+    rules = _rules_of(plan)
+    table_rows = None
+    with open(file_path, 'rb') as f:
+        head = f.read(parser_backend.CHARSET_HEAD_BYTES)
+        if not parser_backend.is_full_html(head):
+            doc = parser_backend.parse(file_operation.file_read(file_path),
+                                       backend)
+        else:
+            with metrics.timer('parse_seconds', backend=backend,
+                               input='stream'):
+                # The same parsing (xml first, then html) as PyQuery does.
+                try:
+                    f.seek(0)
+                    root, table_rows = skeleton(f, rules, html=False)
+                except etree.XMLSyntaxError:
+                    f.seek(0)
+                    root, table_rows = skeleton(
+                        f, rules, encoding=file_operation.detect_charset(head))
+            if backend == 'pyquery':
+                doc = selector_cache.CachedPyQuery([root])
+            else:
+                doc = parser_backend.LxmlQuery([root])
+    with metrics.timer('summary_seconds'):
+        return summary.Summary(doc, file_id, only=only, plan=plan,
+                               table_rows=table_rows)
+
+
+# {id of the plan: (plan, StreamRules)}, compiled once per process.
+_rules = {}
+
+
+def _rules_of(plan):
+    entry = _rules.get(id(plan))
+    if entry is None or entry[0] is not plan:
+        entry = _rules[id(plan)] = (plan, StreamRules(plan))
+    return entry[1]
+
@@ -1,11 +1,38 @@
 # from pyquery import PyQuery as pq
+import functools
 import sys
 import tool_funcs
 import id_add
+import extraction_plan
+import metrics
+import section_index
 # from decorator import pairs
 import decorator
 
 
+# The version of the extraction, it has to be changed when the result of any
+# segment is changed, so the files processed by the former version will be
+# processed again by the incremental crawling (see in manifest.py). The same
+# applies to the changes of summary_spec.json.
+EXTRACTOR_VERSION = '1'
+
+
+def segment(method):
+    """Decorator of the segment methods of Summary.
+
+    The pairs of the segment are computed on the first call and memoized on
+    the instance, the later calls (and the Summary.result) reuse them. The
+    wall time and the number of keys of each segment are recorded if the
+    metrics are enabled, see in metrics.py.
+
+    :return: An iterator of the (key, value) pairs of the segment.
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        return self._crawl_segment(method.__name__, lambda: method(self))
+    return wrapper
+
+
 class Summary(object):
     """
     This class is used for crawling data in Summary page.
@@ -22,49 +49,73 @@ class Summary(object):
         generator of the data, result_generator = s.sale()
         3. get the data from the generator by result = dict(result_generator)
 
+    Each segment is only computed once, on the first call of its method.
+    With lazy=True, nothing is crawled when the class is initialized, and
+    s.result is built on its first access. With only=['Sale', ...], the
+    s.result only contains these segments (and the ID and address), the
+    titles which aren't segments of the plan raise a ValueError.
+
+    The selectors, prefixes and table layouts of the segments are declared
+    in summary_spec.json, and crawled by the compiled plan of the spec, see
+    in extraction_plan.py. Another plan (like of the Comps pages) could be
+    passed by plan=..., by default the plan of current process is used.
+
     Modify the class:
         If there are some new segments appearing in the Summary page which
-        needs to be crawled, the following step needs to be following to add
-        the segment into class:
-            1. build new class method -> def new_seg(self):
-            2. add a new key-value, which value is the function pointer
-            without parentheses '()', as following:
-
-                self.all_title_methods = {
-                    ...
-                    'New Title From the File/Web-page': self.new_seg
+        needs to be crawled, add the segment into the 'segments' of
+        summary_spec.json, with the h1 title of the File/Web-page as its key.
+        Only the segment which can't be declared by the spec needs a new
+        class method:
+            1. build new class method with the @segment decorator
+                -> def new_seg(self):
+            2. add the segment into the spec as following:
+
+                "New Title From the File/Web-page": {
+                    "kind": "method", "method": "new_seg"
                 }
     """
 
-    def __init__(self, pq_doc, web_id):
+    def __init__(self, pq_doc, web_id, lazy=False, only=None, plan=None,
+                 table_rows=None):
         # The type of 'pq_doc' is PyQuery object.
         self._pq_doc = pq_doc
+        # The sections index is built once, all segments query the document
+        # through it, see in section_index.py.
+        self._doc = section_index.SectionIndex(pq_doc)
         self._id = id_add.ID(web_id)
-        self.result = {}
-        self.titles_in_web = self.crawl_titles_in_web('Documents',
-                                                      'Building Notes')
-        self.all_titles_methods = {
-            'Sale': self.sale,
-            'Building': self.building,
-            'Land': self.land,
-            'Location': self.location,
-            'Property Contacts': self.property_contacts,
-            'For Lease': self.for_lease,
-            'Amenities': self.amenities,
-            'Traffic': self.traffic,
-            'Tenants': self.tenants,
-            'Unit Mix': self.unit_mix,
-            'Demographics': self.demographics,
-            'Assessment': self.assessment,
-            'Market Conditions': self.market_conditions,
-            'Public Transportation': self.public_transportation,
-            'Space': self.space,
-            'Leasing Activity': self.leasing_activity
-        }
+        self._only = only
+        # The memoized pairs of each segment method, see in segment().
+        self._segments = {}
+        self._result = None
+        self._plan = plan or extraction_plan.current_plan()
+        self._plan.check_only(only)
+        # The table rows read ahead, see in extraction_plan.Plan.run().
+        self._table_rows = table_rows
+        self.titles_in_web = self.crawl_titles_in_web(
+            *self._plan.ignore_titles)
+        self.all_titles_methods = {}
+        for title, seg in self._plan.segments.items():
+            if seg['kind'] == 'method':
+                method = getattr(self, seg['method'])
+            else:
+                method = functools.partial(self.run_segment, title)
+            self.all_titles_methods[title] = method
+        if not lazy:
+            self._materialize()
+
+    @property
+    def result(self):
+        """The dict of all (or the 'only') segments, the ID and address."""
+        if self._result is None:
+            self._materialize()
+        return self._result
+
+    def _materialize(self):
+        self._result = {}
         self.run_crawl()
-        self._address = id_add.address(pq_doc)
-        self.result.update(self._id)
-        self.result.update(self._address)
+        self._address = id_add.address(self._doc)
+        self._result.update(self._id)
+        self._result.update(self._address)
 
     def run_crawl(self):
         print(">>>>>>>>>>>>>>>")
@@ -74,7 +125,8 @@ class Summary(object):
               set(self.all_titles_methods.keys()))
         try:
             for seg in self.titles_in_web:
-                self.result.update(dict(self.all_titles_methods[seg]()))
+                if self._only is None or seg in self._only:
+                    self.result.update(dict(self.all_titles_methods[seg]()))
 
         # 下面except语句以后可以修改为写入日志，这里先正常报错以便写完程序
         except KeyError as ke:
@@ -99,8 +151,8 @@ class Summary(object):
 
         :return: segments titles list generator
         """
-        css_selector = '#content h1'
-        titles = [item.text() for item in self._pq_doc(css_selector).items()]
+        # The '#content h1' titles have been crawled by the sections index.
+        titles = list(self._doc.titles)
 
         # Delete the first ignored title, if default (None), jump out of 'if'
         # and 'for' statement.
@@ -110,179 +162,64 @@ class Summary(object):
                 titles.remove(ig_t)
         return titles
 
+    def _crawl_segment(self, name, crawl):
+        """Memoize the pairs of crawl() as the segment 'name', see in
+        segment()."""
+        if name not in self._segments:
+            with metrics.timer('segment_seconds', segment=name):
+                self._segments[name] = list(crawl())
+            metrics.observe('segment_keys', len(self._segments[name]),
+                            segment=name)
+        return iter(self._segments[name])
+
+    def run_segment(self, title):
+        """run_segment(self, title) -> <iterator obj. of the pairs>
+
+        Crawl the segment of the h1 title by the plan, only once for each
+        Summary, see in segment().
+        """
+        seg = self._plan.segments[title]
+        return self._crawl_segment(
+            seg['name'],
+            lambda: self._plan.run(self._doc, title, self._table_rows))
+
     def sale(self):
-        css_selector = "[data-viewmodelname='propertySale']"
-        # _sale is a dict generator
-        _sale = tool_funcs.pairs_gene(self._pq_doc, css_selector, 'Sale')
-        return _sale
+        return self.run_segment('Sale')
 
     def building(self):
-        css_selector = '[data-viewmodelname="propertyBuildingInformation"]'
-
-        add_name = []
-        add_value = []
-        # For judging whether there is 'Walk Score' in Building segment.
-        if self._pq_doc('[data-bind="attr: { href: WalkScoreHelpLink }"]'):
-            name = self._pq_doc('[data-bind='
-                                '"attr: { href: WalkScoreHelpLink }"]').text()
-            add_name.append(name)
-            value = self._pq_doc('[data-bind='
-                                 '"text: FormattedWalkScore"]').text()
-            add_value.append(value)
-
-        # For judging whether there is 'Transit Score' in Building segment.
-        if self._pq_doc('[data-bind="attr: { href: TransitScoreHelpLink }"]'):
-            name = self._pq_doc('[data-bind="attr: '
-                                '{ href: TransitScoreHelpLink }"]').text()
-            add_name.append(name)
-            value = self._pq_doc('[data-bind='
-                                 '"text: FormattedTransitScore"]').text()
-            add_value.append(value)
-
-        _building = tool_funcs.pairs_gene(self._pq_doc, css_selector,
-                                          'Building', add_name, add_value)
-        return _building
+        return self.run_segment('Building')
 
     def land(self):
-        css_selector = '[data-viewmodelname="propertyLand"]'
-        _land = tool_funcs.pairs_gene(self._pq_doc, css_selector, 'Land')
-        return _land
+        return self.run_segment('Land')
 
     def location(self):
-        css_selector = '.property-location'
-        _location = tool_funcs.pairs_gene(self._pq_doc, css_selector,
-                                          ' Location')
-        return _location
+        return self.run_segment('Location')
 
     def property_contacts(self):
-        css_selector = '.property-contacts'
-        _property_contacts = tool_funcs.pairs_gene(self._pq_doc, css_selector,
-                                                   'Property Contacts')
-        return _property_contacts
+        return self.run_segment('Property Contacts')
 
     def for_lease(self):
-        css_selector = '[data-viewmodelname="propertyForLease"]'
-        # inp is the choice of the repeated key-value pair.
-        _for_lease = tool_funcs.pairs_gene(self._pq_doc, css_selector,
-                                           'For Lease', inp=1)
-        return _for_lease
+        return self.run_segment('For Lease')
 
     def amenities(self):
-        """This segment usually includes tow parts, 'Unit Amenities' and
-        'Site Amenities'. Each part contains several amenities. To list all of
-        these stuff, a comma ',' will be used to separate these stuff.
-
-        :param:
-        :amen_subtitles: Subsections of the Amenities segment, usually contains
-            two subsections, 'Unit Amenities' and 'Site Amenities'.
-        :value_li: The corresponding stuff to each subsection.
-
-        :return: An amenities zip object (an object of combination of
-            several tuples)
-        """
-        amen_subtitles = [item.text()
-                          for item in self._pq_doc('.amenities-header').items()]
-        value_css_selector_li = [".{0} {1}".format(
-            item.lower().replace(' ', '-'), '.amenities-content')
-            for item in amen_subtitles]
-        value_li = [self._pq_doc(css).text().replace('\n', ', ')
-                    for css in value_css_selector_li]
-        _amenities = zip(amen_subtitles, value_li)
-        return _amenities
+        return self.run_segment('Amenities')
 
     def traffic(self):
-        """traffic(self) -> <zip obj. of (list, list)>
-
-        The Traffic segments contains a table with a row of table-header and
-        several data rows.
-
-        :param:
-        :table: See in tool_funcs.py
-            -> def rearrange_table_numbering_headers(table)
-        :t_h: See in tool_funcs.py
-            -> def rearrange_table_numbering_headers(table)
-        :t_d: See in tool_funcs.py
-            -> def rearrange_table_numbering_headers(table)
-
-        :return: A <zip obj.> consists of the
-            <generator obj. of table_headers> and <iterator obj. of table_rows>
-        """
-        headers_css_selector = '#TrafficTable thead th'
-        row_css_selector = '#TrafficTable tbody tr'
-        cell_css_selector = 'td'
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css_selector,
-            row_css_selector, cell_css_selector,
-            'Traffic', 'numbering_headers'
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Traffic')
 
     def tenants(self):
-        headers_css_selector = '#TenantsTable thead th'
-        row_css_selector = '#TenantsTable tbody tr'
-        cell_css_selector = 'td'
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css_selector,
-            row_css_selector, cell_css_selector,
-            'Tenants', 'numbering_headers',
-            replace_string="•\n"
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Tenants')
 
     def unit_mix(self):
-        headers_css_selector = '#UnitMixTable thead th'
-        row_css_selector = '#UnitMixTable tbody tr'
-        cell_css_selector = 'td'
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css_selector,
-            row_css_selector, cell_css_selector,
-            'Unit Mix', 'numbering_headers'
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Unit Mix')
 
     def demographics(self):
-        headers_css_selector = '#DemogrpahicsTable thead th'
-        top_row_css_selector = '#DemogrpahicsTable tbody tr'
-        bot_row_css_selector = '#DemogrpahicsTrendTable tbody tr'
-        cell_css_selector = 'td'
-
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css_selector,
-            top_row_css_selector, cell_css_selector,
-            'Demographics', 'cross_headers',
-            ignore_display_items=False,
-            additional_table_rows_css=[bot_row_css_selector]
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Demographics')
 
     def assessment(self):
-        year_css_selector = "#assesmentInformationContainer " \
-                            "[data-bind='if: showAssessedYear()'] span"
-        year = self._pq_doc(year_css_selector).text()
-        if year:
-            seg_prefixes = 'Assessment_{0} Assessment'.format(year)
-        else:
-            seg_prefixes = 'Assessment'
-
-        headers_css_selector = '#assesmentInformationContainer .subheader'
-        row_css_selector = '#assesmentInformationContainer .column'
-        cell_selector = '.row'
-
-        crawl_data = []
-        for r in self._pq_doc(row_css_selector).items():
-            crawl_data.append([item.text() for item in r(".row").items()][1:])
-        crawl_data = crawl_data[1:]
-
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css=headers_css_selector,
-            prepared_table_data=crawl_data,
-            cell_css=cell_selector,
-            seg_prefixes=seg_prefixes,
-            rearrange_table_method='numbering_headers',
-            data_start=1
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Assessment')
 
+    @segment
     def market_conditions(self):
         """market_conditions(self) -> <zip obj. of (list, list)>
 
@@ -309,17 +246,17 @@ class Summary(object):
         """
         segments_css_selectors = '.property-marketConditions h4'
         segments = [item.text()
-                    for item in self._pq_doc(segments_css_selectors).items()]
+                    for item in self._doc(segments_css_selectors).items()]
         up_headers_css_selectors = '.property-marketConditions ' \
                                    '.section-header.column'
         up_headers = [item.text()
                       for item
-                      in self._pq_doc(up_headers_css_selectors).items()]
+                      in self._doc(up_headers_css_selectors).items()]
         bot_headers_css_selectors = '.property-marketConditions ' \
                                     '.headerLabel'
         bot_headers = [item.text()
                        for item
-                       in self._pq_doc(bot_headers_css_selectors).items()]
+                       in self._doc(bot_headers_css_selectors).items()]
 
         segments_data_bind_css = {
             'Submarket Leasing Activity':
@@ -349,18 +286,18 @@ class Summary(object):
                 seg_headers = [seg] + up_headers
                 seg_data = [
                     item.text().split('\n')
-                    for item in self._pq_doc(data_css_selector).items()
+                    for item in self._doc(data_css_selector).items()
                 ]
             else:
                 # The last sub-table, which has a different table structure.
                 seg_headers = [seg] + bot_headers
                 seg_data = [
                     item.text().split('\n')
-                    for item in self._pq_doc(data_css_selector).items()
+                    for item in self._doc(data_css_selector).items()
                 ][1:]
             # seg_t_h, seg_t_d corresponds to each sub-table's headers and data.
             seg_t_h, seg_t_d = tool_funcs.crawl_table(
-                self._pq_doc,
+                self._doc,
                 seg_prefixes='Market Conditions',
                 prepared_table_headers=seg_headers,
                 prepared_table_data=seg_data,
@@ -372,74 +309,10 @@ class Summary(object):
         return zip(t_h, t_d)
 
     def public_transportation(self):
-        """public_transportation(self) -> <zip obj. of (list, list)>
-
-        This part usually has at most three sub-tables, which are 'Airport',
-        'Commuter Rail' and 'Transit/Subway'. Therefore, all there three
-        sub-tables' headers-css and rows-css are put in a list and then passed
-        to the tool_funcs.crawl_table() function.
-
-        :return: <zip obj. of the 1-D headers and data>
-        """
-        headers_css_selectors = [
-            ".public-transportation-layout "
-            "[data-bind='visible: hasSubways'] .head .column",
-
-            ".public-transportation-layout "
-            "[data-bind='visible: hasCommuterRail'] .head .column",
-
-            ".public-transportation-layout "
-            "[data-bind='visible: hasAirports'] .head .column"
-        ]
-
-        rows_css_selectors = [
-            ".public-transportation-layout "
-            "[data-bind='visible: hasSubways'] "
-            "[data-bind='foreach: data.Items'] .row",
-
-            ".public-transportation-layout "
-            "[data-bind='visible: hasCommuterRail'] "
-            "[data-bind='foreach: data.Items'] .row",
-
-            ".public-transportation-layout "
-            "[data-bind='visible: hasAirports'] "
-            "[data-bind='foreach: data.Items'] .row"
-        ]
-        cell_css_selector = '.column'
-
-        t_h = []
-        t_d = []
-        for i, h_css in enumerate(headers_css_selectors):
-            each_t_h, each_t_d = tool_funcs.crawl_table(
-                self._pq_doc,
-                h_css,
-                rows_css_selectors[i],
-                cell_css_selector,
-                'Public Transportation',
-                'same_headers'
-            )
-            t_h += each_t_h
-            t_d += each_t_d
-        return zip(t_h, t_d)
+        return self.run_segment('Public Transportation')
 
     def space(self):
-        headers_css_selector = "[data-viewmodelname='propertySpaces'] thead th"
-        row_css_selector = "[data-viewmodelname='propertySpaces'] tbody tr"
-        cell_css_selector = 'td'
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css_selector,
-            row_css_selector, cell_css_selector,
-            'Space', 'numbering_headers'
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Space')
 
     def leasing_activity(self):
-        headers_css_selector = "#LeasingActivityTable thead th"
-        row_css_selector = "#LeasingActivityTable tbody tr"
-        cell_css_selector = 'td'
-        t_h, t_d = tool_funcs.crawl_table(
-            self._pq_doc, headers_css_selector,
-            row_css_selector, cell_css_selector,
-            'Leasing Activity', 'numbering_headers'
-        )
-        return zip(t_h, t_d)
+        return self.run_segment('Leasing Activity')
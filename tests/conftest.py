@@ -0,0 +1,23 @@
+"""
+The modules of the repository are imported by their names (like
+'import section_index'), as the scripts in the root folder do.
+"""
+
+
+import os
+import sys
+import pytest
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from benchmark import page_gen  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def pages(tmp_path_factory):
+    """A few small synthetic Summary pages, see in benchmark/page_gen.py."""
+    folder = tmp_path_factory.mktemp('pages')
+    return page_gen.write_pages(str(folder), 4, tenants=3, traffic=2,
+                                market_tables=2, amenities=2, demographics=2)
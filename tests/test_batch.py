@@ -0,0 +1,51 @@
+"""
+The version of the results used by the manifest and the result cache of
+batch.py, and the options of run_batch().
+"""
+
+
+import csv
+import os
+import pytest
+import batch
+import summary
+
+
+def test_extractor_version_of_dup_policy(tmp_path, monkeypatch):
+    monkeypatch.delenv('COSTAR_DUP_POLICY', raising=False)
+    monkeypatch.chdir(tmp_path)
+    assert batch.extractor_version() == summary.EXTRACTOR_VERSION
+
+    policy = tmp_path / 'policy.json'
+    policy.write_text('{"default": "first"}')
+    first = batch.extractor_version(dup_policy_file=str(policy))
+    assert first != summary.EXTRACTOR_VERSION
+    assert batch.extractor_version(dup_policy_file=str(policy)) == first
+
+    policy.write_text('{"default": "last"}')
+    assert batch.extractor_version(dup_policy_file=str(policy)) != first
+    assert batch.extractor_version(['Sale'], dup_policy_file=str(policy)) \
+        .endswith(':Sale')
+
+
+def read_csv_ids(csv_path):
+    with open(os.path.join(csv_path, 'summary.csv'), encoding='utf-8',
+              newline="") as f:
+        return sorted(row['   ID'] for row in csv.DictReader(f))
+
+
+def test_csv_of_each_run(pages, tmp_path):
+    csv_path = str(tmp_path / 'csv')
+    for _ in range(2):
+        stats = batch.run_batch(pages, 1, sinks=('csv',), csv_path=csv_path)
+        assert stats['files'] == len(pages)
+        assert read_csv_ids(csv_path) == sorted(
+            batch.get_file_id(path) for path in pages)
+
+
+@pytest.mark.parametrize('option', ['manifest_path', 'delta_path'])
+def test_csv_rejected_with_skipping_options(pages, tmp_path, option):
+    with pytest.raises(ValueError):
+        batch.run_batch(pages, 1, sinks=('csv',),
+                        csv_path=str(tmp_path / 'csv'),
+                        **{option: str(tmp_path / 'state.db')})
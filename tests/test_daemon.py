@@ -0,0 +1,21 @@
+"""
+The requests and the sinks of the Daemon.
+"""
+
+
+import pytest
+import daemon
+
+
+def test_csv_sink_rejected():
+    assert 'csv' not in daemon.SINKS
+    with pytest.raises(ValueError):
+        daemon.Daemon(sinks=('json', 'csv'))
+
+
+def test_commands():
+    d = daemon.Daemon()
+    assert d.handle('{"cmd": "ping"}')['ok']
+    assert d.handle('{"cmd": "stats"}')['requests'] == 0
+    assert not d.handle('{"cmd": "restart"}')['ok']
+    assert not d.handle('{"path": ')['ok']
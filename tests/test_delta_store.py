@@ -0,0 +1,108 @@
+"""
+The delta records and the versions of the DeltaStore, and the batch
+options which can't be used with the delta output.
+"""
+
+
+import shutil
+import pytest
+import batch
+import delta_store
+
+
+def test_versions(tmp_path):
+    db_path = str(tmp_path / 'delta.db')
+    first = {'   ID': '020-1', 'Sale_Price': '$1', 'Land_Zoning': 'C-1'}
+    records = [
+        first, dict(first),
+        {'   ID': '020-1', 'Sale_Price': '$2', 'Tenants_Name_1': 'Tenant 0'}
+    ]
+    deltas = []
+    for record in records:
+        # Each run compares a property once.
+        store = delta_store.DeltaStore(db_path)
+        deltas.append(store.delta(record))
+        store.commit()
+        store.close()
+    assert deltas[0]['_version'] == 1
+    assert deltas[0]['_added'] == first
+    assert deltas[1] is None
+    delta = deltas[2]
+    assert delta['   ID'] == '020-1'
+    assert delta['_version'] == 2
+    assert delta['_added'] == {'Tenants_Name_1': 'Tenant 0'}
+    assert delta['_changed'] == {'Sale_Price': '$2'}
+    assert delta['_removed'] == ['Land_Zoning']
+    assert store.stats() == {'new': 0, 'changed': 1, 'unchanged': 0,
+                             'keys_written': 3, 'keys_crawled': 3}
+
+    store = delta_store.DeltaStore(db_path)
+    assert store.last('020-1')[0] == 2
+    store.close()
+
+
+def test_uncommitted_versions_dropped(tmp_path):
+    db_path = str(tmp_path / 'delta.db')
+    store = delta_store.DeltaStore(db_path)
+    assert store.delta({'   ID': '020-1', 'Sale_Price': '$1'})
+    assert store.staged == 1
+    assert store.last('020-1')[0] == 1
+    store.close()
+    store = delta_store.DeltaStore(db_path)
+    assert store.last('020-1') == (0, None)
+    store.close()
+
+
+def test_same_key_twice(tmp_path):
+    store = delta_store.DeltaStore(str(tmp_path / 'delta.db'))
+    store.delta({'   ID': '020-1', 'Sale_Price': '$1'})
+    with pytest.raises(ValueError):
+        store.delta({'   ID': '020-1', 'Sale_Price': '$2'})
+    store.close()
+
+
+def test_record_key():
+    assert delta_store.record_key({'   ID': '020-1', '  City': 'X'}) == \
+        '020-1'
+    assert delta_store.record_key({'  Address': '1 Main St', '  City': 'X',
+                                   '  State': 'NC', '  Zip': '27514'}) == \
+        '1 Main St|X|NC|27514'
+
+
+@pytest.mark.parametrize('sinks,only', [
+    (('redis',), None), (('json',), ['Sale'])])
+def test_unsupported_batch_options(tmp_path, sinks, only):
+    with pytest.raises(ValueError):
+        batch.run_batch([str(tmp_path)], 1, sinks, only=only,
+                        delta_path=str(tmp_path / 'delta.db'))
+
+
+def test_batch_duplicate_id_failed(pages, tmp_path):
+    folders = [tmp_path / 'a', tmp_path / 'b']
+    for folder in folders:
+        folder.mkdir()
+    for page in pages:
+        shutil.copy(page, str(folders[0]))
+    shutil.copy(pages[0], str(folders[1]))
+    db_path = str(tmp_path / 'delta.db')
+    stats = batch.run_batch([str(folder) for folder in folders], 1,
+                            json_path=str(tmp_path / 'json'),
+                            delta_path=db_path,
+                            manifest_path=str(tmp_path / 'manifest.db'))
+    assert (stats['files'], stats['failed']) == (len(pages) + 1, 1)
+    assert stats['delta']['new'] == len(pages)
+    assert len(list((tmp_path / 'json').iterdir())) == len(pages)
+
+
+def test_batch_not_committed_if_sink_fails(pages, tmp_path, monkeypatch):
+    def save_delta(delta, sinks, json_path, writers=None):
+        raise OSError('disk full')
+    monkeypatch.setattr(batch, 'save_delta', save_delta)
+    db_path = str(tmp_path / 'delta.db')
+    with pytest.raises(OSError):
+        batch.run_batch(pages, 1, json_path=str(tmp_path / 'json'),
+                        delta_path=db_path)
+    store = delta_store.DeltaStore(db_path)
+    assert [store.last(batch.get_file_id(page)) for page in pages] == \
+        [(0, None)] * len(pages)
+    store.close()
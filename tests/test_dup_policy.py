@@ -0,0 +1,75 @@
+"""
+The strategies of the duplicate label resolution policy, the side report of
+the unresolved duplicates and the hash of the policy file.
+"""
+
+
+import json
+import pytest
+import dup_policy
+
+
+@pytest.fixture
+def load(tmp_path, monkeypatch):
+    """Load a policy written into a temp file, the report is in tmp_path."""
+    monkeypatch.setattr(dup_policy, '_policy', None)
+
+    def load_policy(rules, default='first'):
+        path = tmp_path / 'policy.json'
+        path.write_text(json.dumps({
+            'default': default, 'rules': rules,
+            'report': str(tmp_path / 'report.jsonl')}))
+        return dup_policy.load_policy(str(path))
+    return load_policy
+
+
+def read_report(tmp_path):
+    path = tmp_path / 'report.jsonl'
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.parametrize('strategy,values,choice', [
+    ('first', ['a', 'bb', 'c'], 1),
+    ('last', ['a', 'bb', 'c'], 3),
+    ('longest', ['a', 'bb', 'cc'], 2),
+    ('first-non-empty', ['', ' ', 'c', 'd'], 3),
+    ('regex:^[A-F]$', ['Class B', 'B', 'C'], 2),
+])
+def test_strategies(load, tmp_path, strategy, values, choice):
+    load({'Building': {'Class': strategy}})
+    assert dup_policy.choose('Building', 'Class', values) == choice
+    assert read_report(tmp_path) == []
+
+
+def test_segment_wildcard(load):
+    load({'For Lease': {'*': 'last'}})
+    assert dup_policy.choose('For Lease', 'Total Avail', ['1', '2']) == 2
+
+
+def test_unresolved_reported(load, tmp_path):
+    load({'Building': {'Class': 'regex:^[A-F]$'}}, default='last')
+    # The rule can't pick any value, and the key without rule.
+    assert dup_policy.choose('Building', 'Class', ['x', 'y']) == 2
+    assert dup_policy.choose('Sale', 'Price', ['$1', '$2', '$3']) == 3
+    report = read_report(tmp_path)
+    assert [(r['segment'], r['key'], r['values'], r['chosen'])
+            for r in report] == [('Building', 'Class', ['x', 'y'], 2),
+                                 ('Sale', 'Price', ['$1', '$2', '$3'], 3)]
+
+
+def test_unknown_strategy(load):
+    with pytest.raises(ValueError):
+        load({'Building': {'Class': 'shortest'}})
+
+
+def test_policy_hash(tmp_path):
+    path = tmp_path / 'policy.json'
+    assert dup_policy.policy_hash(str(path)) == ''
+    path.write_text('{"default": "first"}')
+    first = dup_policy.policy_hash(str(path))
+    assert len(first) == 40
+    assert dup_policy.policy_hash(str(path)) == first
+    path.write_text('{"default": "last"}')
+    assert dup_policy.policy_hash(str(path)) != first
@@ -0,0 +1,32 @@
+"""
+The plan compiled from the spec gives the same Summary.result as the plan
+of the process, and Plan.run() on the document gives the same pairs as the
+segments of the Summary.
+"""
+
+
+import pytest
+import extraction_plan
+import parser_backend
+import summary
+
+
+@pytest.mark.parametrize('backend', parser_backend.BACKENDS)
+@pytest.mark.parametrize('index', range(4))
+def test_same_result(pages, backend, index):
+    default = summary.Summary(parser_backend.parse_file(pages[index],
+                                                        backend), 'x')
+    plan = extraction_plan.compile_spec(extraction_plan.load_spec())
+    s = summary.Summary(parser_backend.parse_file(pages[index], backend),
+                        'x', plan=plan)
+    assert s.result == default.result
+    assert list(s.result) == list(default.result)
+
+    doc = parser_backend.parse_file(pages[index], backend)
+    titles = [title for title in s.titles_in_web
+              if plan.segments[title]['kind'] != 'method']
+    assert titles
+    for title in titles:
+        # The global queries of the document, without the sections index.
+        assert list(plan.run(doc, title)) == \
+            list(default.all_titles_methods[title]())
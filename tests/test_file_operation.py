@@ -0,0 +1,82 @@
+"""
+The records of the json lines, json array and single record files are read
+one by one, and converted into a csv file whose header is the union of the
+keys.
+"""
+
+
+import csv
+import json
+import os
+import pytest
+import file_operation
+
+
+RECORDS = [
+    {'   ID': '001-1', 'Sale_Price': '$1', 'Note': 'a, "b"\n[c]'},
+    {'   ID': '002-1', 'Tenants_Name_1': 'Tenant {0}'},
+    {'   ID': '003-1', 'Sale_Price': '', 'Nested': {'k': [1, 2]}},
+]
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(params=['jsonl', 'array', 'indented-array'])
+def json_file(request, tmp_path):
+    if request.param == 'jsonl':
+        text = ''.join(json.dumps(r) + '\n' for r in RECORDS)
+    elif request.param == 'array':
+        text = json.dumps(RECORDS)
+    else:
+        text = json.dumps(RECORDS, indent=4)
+    return write(tmp_path / 'records.json', text)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1024 * 1024])
+def test_records(json_file, chunk_size):
+    # The small chunks cut the records (and their strings) at any point.
+    assert list(file_operation.iter_json_records(json_file, chunk_size)) == \
+        RECORDS
+
+
+def test_single_record(tmp_path):
+    file_operation.save_json(str(tmp_path) + '/', '001-1', RECORDS[0])
+    assert list(file_operation.iter_json_records(
+        str(tmp_path / '001-1.json'), 5)) == [RECORDS[0]]
+
+
+def test_truncated_file(tmp_path):
+    path = write(tmp_path / 'cut.jsonl', json.dumps(RECORDS[0]) + '\n{"a": ')
+    records = file_operation.iter_json_records(path, 8)
+    assert next(records) == RECORDS[0]
+    with pytest.raises(json.JSONDecodeError):
+        next(records)
+
+
+def test_json_to_csv(json_file, tmp_path):
+    jsonl = write(tmp_path / 'more.jsonl',
+                  json.dumps({'   ID': '004-1', 'Land_Zoning': 'C-1'}))
+    file_operation.json_to_csv([json_file, jsonl], str(tmp_path) + '/',
+                               'summary')
+    with open(str(tmp_path / 'summary.csv'), encoding='utf-8',
+              newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['   ID', 'Sale_Price', 'Note', 'Tenants_Name_1',
+                       'Nested', 'Land_Zoning']
+    assert rows[1] == ['001-1', '$1', 'a, "b"\n[c]', '', '', '']
+    assert rows[2] == ['002-1', '', '', 'Tenant {0}', '', '']
+    assert rows[3][:2] == ['003-1', '']
+    assert rows[4] == ['004-1', '', '', '', '', 'C-1']
+
+
+def test_json_to_csv_fieldnames(json_file, tmp_path):
+    file_operation.json_to_csv(json_file, str(tmp_path) + os.sep, 'summary',
+                               fieldnames=['   ID', 'Sale_Price', 'Note',
+                                           'Tenants_Name_1', 'Nested'])
+    with open(str(tmp_path / 'summary.csv'), encoding='utf-8',
+              newline="") as f:
+        assert [row['Sale_Price'] for row in csv.DictReader(f)] == \
+            ['$1', '', '']
@@ -0,0 +1,63 @@
+"""
+The pruned html gives the same text of the crawled regions, for both
+parser backends.
+"""
+
+
+import pytest
+import html_prune
+import parser_backend
+
+
+HTML = """<html><head><script>var page = {};</script><style>.a {}</style>
+</head><body><svg><title>logo</title></svg>
+<div class="subHeaderContainer"><b>Chapel Hill, NC 27514</b></div>
+<div id="content"><div class="label-value-pair">
+<span class="a">$1<svg><title>up 5%</title><text>5%</text></svg></span>
+<span class="b"><noscript>n/a</noscript>x<!-- note --></span>
+<span class="c">y<script>var z = 1;</script></span>
+<span class="d"><template>t</template>w</span>
+</div></div>
+<script>var tail = 2;</script></body></html>"""
+SELECTORS = ('.a', '.b', '.c', '.d', '.subHeaderContainer b')
+
+
+@pytest.mark.parametrize('backend', parser_backend.BACKENDS)
+@pytest.mark.parametrize('keep_regions', [False, True])
+def test_same_text(backend, keep_regions):
+    doc = parser_backend.parse(HTML, backend)
+    pruned = parser_backend.parse(html_prune.prune(HTML, keep_regions),
+                                  backend)
+    assert [pruned(css).text() for css in SELECTORS] == \
+        [doc(css).text() for css in SELECTORS]
+
+
+def test_blocks_out_of_regions_emptied():
+    pruned = html_prune.prune(HTML)
+    for text in ('var page', '.a {}', 'logo', 'var tail', 'note'):
+        assert text not in pruned
+    assert '<svg></svg>' in pruned
+    assert html_prune.prune(HTML.encode('utf-8')) == pruned.encode('utf-8')
+
+
+def test_without_content_region():
+    html = '<html><body><script>var a;</script><!-- c --></body></html>'
+    assert html_prune.prune(html) == \
+        '<html><body><script>var a;</script></body></html>'
+    assert html_prune.prune(html, True) == \
+        '<html><body><script>var a;</script></body></html>'
+
+
+@pytest.mark.parametrize('decoy', [
+    '<script>var t = \'<div id="content"></div>\';</script>',
+    '<template><div id="content"></div></template>',
+    '<!-- <div id="content"> -->',
+])
+@pytest.mark.parametrize('keep_regions', [False, True])
+def test_region_decoy_skipped(decoy, keep_regions):
+    html = HTML.replace('<body>', '<body>' + decoy, 1)
+    doc = parser_backend.parse(html, 'lxml')
+    pruned = parser_backend.parse(html_prune.prune(html, keep_regions),
+                                  'lxml')
+    assert [pruned(css).text() for css in SELECTORS] == \
+        [doc(css).text() for css in SELECTORS]
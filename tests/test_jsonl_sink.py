@@ -0,0 +1,74 @@
+"""
+The JsonlSink buffers the records, writes one shard per process and rotates
+its files by size or by number of records.
+"""
+
+
+import json
+import os
+import batch
+import jsonl_sink
+
+
+def read_lines(path, name):
+    with open(os.path.join(path, name), encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_shard_of_process(tmp_path):
+    with jsonl_sink.JsonlSink(str(tmp_path)) as sink:
+        sink.write({'   ID': '001-1'})
+    assert os.listdir(str(tmp_path)) == [
+        'summary-w{0}-0000.jsonl'.format(os.getpid())]
+
+
+def test_flush_on_close(tmp_path):
+    sink = jsonl_sink.JsonlSink(str(tmp_path), shard='s', batch_records=3)
+    for i in range(4):
+        sink.write({'n': i})
+    assert sink.buffered == 1
+    assert read_lines(str(tmp_path), 'summary-s-0000.jsonl') == \
+        [{'n': i} for i in range(3)]
+    sink.close()
+    assert sink.buffered == 0
+    assert read_lines(str(tmp_path), 'summary-s-0000.jsonl') == \
+        [{'n': i} for i in range(4)]
+
+
+def test_rotate_records(tmp_path):
+    with jsonl_sink.JsonlSink(str(tmp_path), shard='s', rotate_records=2,
+                              batch_records=1) as sink:
+        for i in range(5):
+            sink.write({'n': i})
+    assert sorted(os.listdir(str(tmp_path))) == [
+        'summary-s-000{0}.jsonl'.format(i) for i in range(3)]
+    assert read_lines(str(tmp_path), 'summary-s-0002.jsonl') == [{'n': 4}]
+
+
+def test_rotate_bytes(tmp_path):
+    line = jsonl_sink.dumps({'n': 0})
+    with jsonl_sink.JsonlSink(str(tmp_path), shard='s', fsync=True,
+                              rotate_bytes=len(line) * 3) as sink:
+        for i in range(7):
+            sink.write({'n': i})
+    names = sorted(os.listdir(str(tmp_path)))
+    assert [len(read_lines(str(tmp_path), name)) for name in names] == \
+        [3, 3, 1]
+
+
+def test_never_appends_to_former_run(tmp_path):
+    for run in range(2):
+        with jsonl_sink.JsonlSink(str(tmp_path), shard='s') as sink:
+            sink.write({'run': run})
+    assert read_lines(str(tmp_path), 'summary-s-0001.jsonl') == [{'run': 1}]
+
+
+def test_batch_rotation(pages, tmp_path):
+    jsonl_path = str(tmp_path / 'jsonl')
+    batch.run_batch(pages, 1, sinks=('jsonl',), jsonl_path=jsonl_path,
+                    jsonl_rotate_records=3, jsonl_fsync=True)
+    names = sorted(os.listdir(jsonl_path))
+    assert [len(read_lines(jsonl_path, name)) for name in names] == [3, 1]
+    assert sorted(record['   ID'] for name in names
+                  for record in read_lines(jsonl_path, name)) == \
+        sorted(batch.get_file_id(page) for page in pages)
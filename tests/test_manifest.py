@@ -0,0 +1,143 @@
+"""
+The incremental crawling of the manifest: the unchanged files (and archive
+members) are skipped, the files of another extractor version are processed
+again, and a file is only recorded once its result is flushed out of the
+sink writers.
+"""
+
+
+import os
+import sqlite3
+import tarfile
+import zipfile
+import pytest
+import batch
+import jsonl_sink
+import manifest
+
+
+def recorded(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(row[0] for row in conn.execute('SELECT path FROM files'))
+    finally:
+        conn.close()
+
+
+def test_unchanged_and_version(tmp_path):
+    page = tmp_path / '001-1.html'
+    page.write_text('<html></html>')
+    db_path = str(tmp_path / 'manifest.db')
+    mf = manifest.Manifest(db_path, 'v1')
+    assert mf.pending([str(page)]) == [str(page)]
+    mf.record(str(page), *manifest.fingerprint(str(page)))
+    assert mf.pending([str(page)]) == []
+    # The same content with a new mtime is still unchanged.
+    os.utime(str(page), (1, 1))
+    assert mf.is_unchanged(str(page))
+    page.write_text('<html><body></body></html>')
+    assert not mf.is_unchanged(str(page))
+    mf.close()
+    mf = manifest.Manifest(db_path, 'v2')
+    page.write_text('<html></html>')
+    assert not mf.is_unchanged(str(page))
+    mf.close()
+
+
+def test_batch_skips_unchanged(pages, tmp_path):
+    db_path = str(tmp_path / 'manifest.db')
+    json_path = str(tmp_path / 'json')
+    stats = batch.run_batch(pages, 1, json_path=json_path,
+                            manifest_path=db_path)
+    assert (stats['files'], stats['skipped']) == (len(pages), 0)
+    assert recorded(db_path) == sorted(pages)
+    stats = batch.run_batch(pages, 1, json_path=json_path,
+                            manifest_path=db_path)
+    assert (stats['files'], stats['skipped']) == (0, len(pages))
+
+
+def test_batch_reprocesses_other_version(pages, tmp_path):
+    db_path = str(tmp_path / 'manifest.db')
+    json_path = str(tmp_path / 'json')
+    batch.run_batch(pages, 1, json_path=json_path, manifest_path=db_path)
+    policy = tmp_path / 'policy.json'
+    policy.write_text('{"default": "last"}')
+    stats = batch.run_batch(pages, 1, json_path=json_path,
+                            manifest_path=db_path,
+                            dup_policy_file=str(policy))
+    assert (stats['files'], stats['skipped']) == (len(pages), 0)
+
+
+def test_batch_resumes_partial_run(pages, tmp_path):
+    db_path = str(tmp_path / 'manifest.db')
+    jsonl_path = str(tmp_path / 'jsonl')
+    batch.run_batch(pages[:2], 1, sinks=('jsonl',), jsonl_path=jsonl_path,
+                    manifest_path=db_path)
+    stats = batch.run_batch(pages, 1, sinks=('jsonl',),
+                            jsonl_path=jsonl_path, manifest_path=db_path)
+    assert (stats['files'], stats['skipped']) == (2, 2)
+    assert recorded(db_path) == sorted(pages)
+
+
+def test_recorded_after_flush(pages, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'manifest.db')
+    monkeypatch.setattr(batch, '_worker_settings', {
+        'sinks': ('jsonl',), 'json_path': '', 'backend': 'pyquery',
+        'manifest': db_path, 'only': None, 'prune': None,
+        'input_mode': 'mmap', 'delta': False, 'spec_file': None,
+        'dup_policy_file': None})
+    sink = jsonl_sink.JsonlSink(str(tmp_path / 'jsonl'), batch_records=2)
+    monkeypatch.setattr(batch, '_worker_writers', {'jsonl': sink})
+    monkeypatch.setattr(batch, '_worker_unflushed', [])
+    monkeypatch.setattr(batch, '_worker_manifest', manifest.Manifest(
+        db_path, batch.extractor_version()))
+    # The first result is buffered, both are flushed with the second one.
+    assert batch._crawl_worker(pages[0])[2]['flushed'] == []
+    assert [path for path, _ in batch._crawl_worker(pages[1])[2]
+            ['flushed']] == pages[:2]
+    assert batch._crawl_worker(pages[2])[2]['flushed'] == []
+    # The buffered one is recorded by the worker when it exits.
+    batch._close_worker()
+    assert recorded(db_path) == [pages[2]]
+    assert sink.records == 3 and sink.buffered == 0
+
+
+def write_archive(path, pages):
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path, 'w') as zf:
+            for page in pages:
+                zf.write(page, 'Offices/' + os.path.basename(page))
+    else:
+        with tarfile.open(path, 'w:gz') as tf:
+            for page in pages:
+                tf.add(page, 'Offices/' + os.path.basename(page))
+
+
+@pytest.mark.parametrize('name', ['dump.zip', 'dump.tar.gz'])
+def test_batch_skips_unchanged_members(pages, tmp_path, name):
+    archive = str(tmp_path / name)
+    write_archive(archive, pages[:3])
+    db_path = str(tmp_path / 'manifest.db')
+    json_path = str(tmp_path / 'json')
+    stats = batch.run_batch([archive], 1, json_path=json_path,
+                            manifest_path=db_path)
+    assert (stats['files'], stats['skipped']) == (3, 0)
+    assert recorded(db_path) == [
+        '{0}!Offices/{1}'.format(archive, os.path.basename(page))
+        for page in pages[:3]]
+
+    stats = batch.run_batch([archive], 1, json_path=json_path,
+                            manifest_path=db_path)
+    assert (stats['files'], stats['skipped']) == (0, 3)
+
+    # The archive of the next dump, with a changed and a new member.
+    with open(pages[3], 'rb') as f:
+        changed = f.read()
+    os.remove(archive)
+    changed_page = str(tmp_path / os.path.basename(pages[1]))
+    with open(changed_page, 'wb') as f:
+        f.write(changed)
+    write_archive(archive, [pages[0], changed_page, pages[2], pages[3]])
+    stats = batch.run_batch([archive], 1, json_path=json_path,
+                            manifest_path=db_path)
+    assert (stats['files'], stats['skipped']) == (2, 2)
@@ -0,0 +1,110 @@
+"""
+The histograms and counters of metrics.py, the merge of the worker
+snapshots, the Prometheus text format and the disabled metrics.
+"""
+
+
+import pytest
+import metrics
+
+
+@pytest.fixture
+def registry():
+    metrics.enable()
+    metrics.reset()
+    yield
+    metrics.disable()
+
+
+def histogram(snap, name):
+    return next(h for h in snap['histograms'] if h['name'] == name)
+
+
+def test_disabled_is_noop():
+    metrics.disable()
+    assert not metrics.enabled()
+    with metrics.timer('parse_seconds', backend='lxml'):
+        pass
+    metrics.observe('table_rows', 3)
+    metrics.incr('files_total', status='ok')
+    metrics.merge({'histograms': [{'name': 'x', 'labels': {}, 'counts': [1],
+                                   'sum': 1, 'count': 1}], 'counters': []})
+    assert metrics.timer('parse_seconds') is metrics._NULL_TIMER
+    snap = metrics.snapshot()
+    assert (snap['histograms'], snap['counters']) == ([], [])
+
+
+def test_buckets(registry):
+    metrics.observe('parse_seconds', 0.003)
+    metrics.observe('table_rows', 3)
+    metrics.observe('table_rows', 20000)
+    snap = metrics.snapshot()
+    seconds = histogram(snap, 'parse_seconds')
+    assert seconds['buckets'] == list(metrics.TIME_BUCKETS)
+    assert seconds['counts'][metrics.TIME_BUCKETS.index(0.005)] == 1
+    rows = histogram(snap, 'table_rows')
+    assert rows['buckets'] == list(metrics.COUNT_BUCKETS)
+    assert rows['counts'][metrics.COUNT_BUCKETS.index(5)] == 1
+    # The values larger than the last bucket.
+    assert rows['counts'][-1] == 1
+    assert (rows['sum'], rows['count']) == (20003, 2)
+
+
+def test_timer_and_labels(registry):
+    with metrics.timer('segment_seconds', segment='Sale'):
+        pass
+    with metrics.timer('segment_seconds', segment='Land'):
+        pass
+    metrics.incr('files_total', status='ok')
+    metrics.incr('files_total', 2, status='ok')
+    snap = metrics.snapshot()
+    assert [h['labels'] for h in snap['histograms']] == \
+        [{'segment': 'Land'}, {'segment': 'Sale'}]
+    assert snap['counters'] == [{'name': 'files_total',
+                                 'labels': {'status': 'ok'}, 'value': 3}]
+
+
+def test_merge(registry):
+    metrics.observe('table_rows', 3, segment='Tenants')
+    metrics.incr('files_total', status='ok')
+    worker = metrics.snapshot()
+    metrics.reset()
+    metrics.observe('table_rows', 7, segment='Tenants')
+    metrics.merge(worker)
+    metrics.merge(worker)
+    snap = metrics.snapshot()
+    rows = histogram(snap, 'table_rows')
+    assert (rows['sum'], rows['count']) == (13, 3)
+    assert rows['counts'][metrics.COUNT_BUCKETS.index(5)] == 2
+    assert rows['counts'][metrics.COUNT_BUCKETS.index(10)] == 1
+    assert snap['counters'][0]['value'] == 2
+
+
+def test_to_prometheus(registry):
+    metrics.observe('table_rows', 3, segment='Sale "A"')
+    metrics.observe('table_rows', 30, segment='Sale "A"')
+    metrics.incr('files_total', status='ok')
+    lines = metrics.to_prometheus(metrics.snapshot()).splitlines()
+    labels = 'segment="Sale \\"A\\""'
+    assert lines[0] == '# TYPE costar_table_rows histogram'
+    assert lines[1] == 'costar_table_rows_bucket{{{0},le="1"}} 0'.format(
+        labels)
+    assert 'costar_table_rows_bucket{{{0},le="5"}} 1'.format(labels) in lines
+    assert 'costar_table_rows_bucket{{{0},le="50"}} 2'.format(labels) in lines
+    assert 'costar_table_rows_bucket{{{0},le="+Inf"}} 2'.format(labels) \
+        in lines
+    assert 'costar_table_rows_sum{{{0}}} 33'.format(labels) in lines
+    assert 'costar_table_rows_count{{{0}}} 2'.format(labels) in lines
+    assert lines[-2:] == ['# TYPE costar_files_total counter',
+                          'costar_files_total{status="ok"} 1']
+
+
+def test_snapshot_writer(registry, tmp_path):
+    metrics.incr('files_total', status='ok')
+    path = str(tmp_path / 'metrics' / 'costar.prom')
+    writer = metrics.SnapshotWriter(path, 'prometheus', interval=3600)
+    writer.maybe_write()
+    assert not (tmp_path / 'metrics' / 'costar.prom').exists()
+    writer.write()
+    with open(path, encoding='utf-8') as f:
+        assert 'costar_files_total{status="ok"} 1\n' in f.read()
@@ -0,0 +1,27 @@
+"""
+Both parser backends give the same Summary.result, whether the file is
+memory-mapped or read into a str.
+"""
+
+
+import os
+import pytest
+import file_operation
+import parser_backend
+import summary
+
+
+@pytest.mark.parametrize('index', range(4))
+def test_same_result(pages, index):
+    path = pages[index]
+    file_id = os.path.basename(path)[:-len('.html')]
+    html = file_operation.file_read(path)
+    results = [summary.Summary(doc, file_id).result for doc in
+               [parser_backend.parse(html, backend)
+                for backend in parser_backend.BACKENDS] +
+               [parser_backend.parse_file(path, backend)
+                for backend in parser_backend.BACKENDS]]
+    assert len(results[0]) > 10
+    for result in results[1:]:
+        assert result == results[0]
+        assert list(result) == list(results[0])
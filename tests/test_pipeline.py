@@ -0,0 +1,34 @@
+"""
+The asyncio pipeline writes the result of every input exactly once, the
+same one as the batch crawling gives.
+"""
+
+
+import json
+import os
+import pytest
+import batch
+import pipeline
+
+
+@pytest.mark.parametrize('queue_size', [1, 64])
+def test_each_input_written_once(pages, tmp_path, queue_size):
+    jsonl_path = str(tmp_path / 'jsonl')
+    # The pages are given twice (a folder and the files), they're collected
+    # once.
+    stats = pipeline.run_pipeline(
+        [os.path.dirname(pages[0])] + pages, parsers=2, readers=3, writers=2,
+        queue_size=queue_size, sinks=('jsonl',), jsonl_path=jsonl_path,
+        backend='lxml')
+    assert (stats['files'], stats['read'], stats['parsed'],
+            stats['written'], stats['failed']) == (len(pages),) * 4 + (0,)
+    records = []
+    for name in os.listdir(jsonl_path):
+        with open(os.path.join(jsonl_path, name), encoding='utf-8') as f:
+            records += [json.loads(line) for line in f]
+    assert sorted(record['   ID'] for record in records) == \
+        sorted(batch.get_file_id(page) for page in pages)
+    for record in records:
+        page = next(page for page in pages
+                    if batch.get_file_id(page) == record['   ID'])
+        assert record == batch.crawl_file(page).result
@@ -0,0 +1,82 @@
+"""
+The RecordStore keeps the records with a shared schema and layouts, and
+gives them back (and writes them) with the keys in their original order.
+"""
+
+
+import os
+import file_operation
+import parser_backend
+import record_store
+import summary
+
+
+RECORDS = [
+    {'   ID': '001-1', 'Sale_Price': '$1', 'Land_Zoning': 'C-1'},
+    {'   ID': '002-1', 'Sale_Price': '$2', 'Land_Zoning': 'C-1'},
+    # New keys, and the same keys in another order.
+    {'   ID': '003-1', 'Tenants_Name_1': 'Tenant 0', 'Sale_Price': '-'},
+    {'Land_Zoning': 'C-2', '   ID': '004-1', 'Sale_Price': '$4'},
+    {},
+]
+
+
+def build(records):
+    store = record_store.RecordStore()
+    for record in records:
+        store.add(record)
+    return store
+
+
+def test_round_trip():
+    store = build(RECORDS)
+    assert len(store) == len(RECORDS)
+    records = list(store)
+    assert records == RECORDS
+    # The keys are in the order of each record.
+    assert [list(r) for r in records] == [list(r) for r in RECORDS]
+    assert store.get(3) == RECORDS[3]
+
+
+def test_schema_growth_and_layouts():
+    store = build(RECORDS[:2])
+    assert store.keys == ['   ID', 'Sale_Price', 'Land_Zoning']
+    assert store.stats()['layouts'] == 1
+    store.add(RECORDS[2])
+    assert store.keys == ['   ID', 'Sale_Price', 'Land_Zoning',
+                          'Tenants_Name_1']
+    store.add(RECORDS[3])
+    stats = store.stats()
+    assert (stats['records'], stats['columns'], stats['layouts']) == \
+        (4, 4, 3)
+    # The first two records share their layout and the interned values.
+    assert store._row_layouts[0] == store._row_layouts[1]
+    assert store._rows[0][2] is store._rows[1][2]
+
+
+def test_csv_same_as_json_to_csv(pages, tmp_path):
+    records = [summary.Summary(parser_backend.parse_file(page, 'lxml'),
+                               os.path.basename(page)[:-5]).result
+               for page in pages]
+    records.append(RECORDS[2])
+    store = build(records)
+    store.write_jsonl(str(tmp_path / 'jsonl'))
+    store.write_csv(str(tmp_path / 'store'), 'summary')
+    jsonl_files = [os.path.join(str(tmp_path / 'jsonl'), name)
+                   for name in sorted(os.listdir(str(tmp_path / 'jsonl')))]
+    assert list(file_operation.iter_json_records(jsonl_files[0])) == records
+    os.makedirs(str(tmp_path / 'json'))
+    file_operation.json_to_csv(jsonl_files, str(tmp_path / 'json') + '/',
+                               'summary')
+    with open(str(tmp_path / 'store' / 'summary.csv'), 'rb') as f:
+        store_csv = f.read()
+    with open(str(tmp_path / 'json' / 'summary.csv'), 'rb') as f:
+        assert f.read() == store_csv
+
+
+def test_write_json(tmp_path):
+    store = build(RECORDS[:2])
+    store.write_json(str(tmp_path))
+    assert sorted(os.listdir(str(tmp_path))) == ['001-1.json', '002-1.json']
+    assert list(file_operation.iter_json_records(
+        str(tmp_path / '002-1.json'))) == [RECORDS[1]]
@@ -0,0 +1,101 @@
+"""
+The RedisBatchWriter sends the records in batches, checked with a stub
+client which records the pipelines.
+"""
+
+
+import math
+import pytest
+import redis_writer
+
+
+class StubPipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hset(self, name, mapping):
+        self.commands.append(('hset', name, dict(mapping)))
+
+    def hdel(self, name, *keys):
+        self.commands.append(('hdel', name, keys))
+
+    def execute(self):
+        self.client.executed.append(self.commands)
+
+
+class StubClient(object):
+
+    def __init__(self):
+        self.executed = []
+
+    def pipeline(self, transaction=False):
+        return StubPipeline(self)
+
+
+@pytest.mark.parametrize('records,batch_records', [
+    (0, 10), (1, 10), (10, 10), (25, 10), (1000, 500), (7, 1)])
+def test_batches(records, batch_records):
+    client = StubClient()
+    writer = redis_writer.RedisBatchWriter(client=client,
+                                           batch_records=batch_records)
+    for i in range(records):
+        writer.write({'   ID': str(i), 'Sale_Price': '$1'})
+    writer.close()
+    assert len(client.executed) == math.ceil(records / batch_records)
+    assert writer.round_trips == len(client.executed)
+    assert [len(batch) for batch in client.executed[:-1]] == \
+        [batch_records] * (len(client.executed) - 1)
+    names = [cmd[1] for batch in client.executed for cmd in batch]
+    assert names == ['Summary:{0}'.format(i) for i in range(records)]
+
+
+def test_close_flushes_the_remainder():
+    client = StubClient()
+    writer = redis_writer.RedisBatchWriter(client=client, batch_records=4)
+    for i in range(6):
+        writer.write({'   ID': str(i)})
+    assert len(client.executed) == 1
+    writer.close()
+    assert [len(batch) for batch in client.executed] == [4, 2]
+    writer.close()
+    assert len(client.executed) == 2
+
+
+def test_batch_bytes():
+    client = StubClient()
+    writer = redis_writer.RedisBatchWriter(client=client, batch_records=100,
+                                           batch_bytes=50)
+    for i in range(3):
+        writer.write({'   ID': str(i), 'Note': 'x' * 40})
+    assert len(client.executed) == 3
+
+
+def test_write_delta():
+    client = StubClient()
+    with redis_writer.RedisBatchWriter(client=client) as writer:
+        writer.write_delta({'   ID': '020-1', '_version': 2,
+                            '_added': {'Sale_Price': '$2'},
+                            '_changed': {'Land_Zoning': 'C-2'},
+                            '_removed': ['Sale_Type']})
+    assert client.executed == [[
+        ('hset', 'Summary:020-1', {'Sale_Price': '$2', 'Land_Zoning': 'C-2',
+                                   '_version': 2}),
+        ('hdel', 'Summary:020-1', ('Sale_Type',))
+    ]]
+
+
+def test_records_without_id():
+    client = StubClient()
+    with redis_writer.RedisBatchWriter(client=client) as writer:
+        writer.write({'  Address': '1 Main St', '  City': 'Chapel Hill',
+                      '  State': 'NC', '  Zip': '27514', 'Sale_Price': '$1'})
+        writer.write({'Sale_Price': '$2'})
+        writer.write({'   ID': '', '  Address': '', 'Sale_Price': '$3'})
+        writer.write_delta({'_version': 1, '_added': {'Sale_Price': '$4'},
+                            '_changed': {}, '_removed': []})
+    assert [cmd[1] for batch in client.executed for cmd in batch] == \
+        ['Summary:1 Main St|Chapel Hill|NC|27514']
+    assert writer.stats()['skipped'] == 3
+    assert writer.records == 1
@@ -0,0 +1,27 @@
+"""
+The results of the ResultCache are keyed by the content hash and the
+extractor version.
+"""
+
+
+import batch
+import result_cache
+
+
+def test_other_version_misses(tmp_path, monkeypatch):
+    monkeypatch.delenv('COSTAR_DUP_POLICY', raising=False)
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'cache.db')
+    policy = tmp_path / 'policy.json'
+    policy.write_text('{"default": "first"}')
+    cache = result_cache.ResultCache(
+        db_path, batch.extractor_version(dup_policy_file=str(policy)))
+    cache.put('hash', {'   ID': '020-1', 'Building_Class': 'A'})
+    assert cache.get('hash') == {'   ID': '020-1', 'Building_Class': 'A'}
+    cache.close()
+
+    policy.write_text('{"default": "last"}')
+    cache = result_cache.ResultCache(
+        db_path, batch.extractor_version(dup_policy_file=str(policy)))
+    assert cache.get('hash') is None
+    cache.close()
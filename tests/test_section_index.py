@@ -0,0 +1,79 @@
+"""
+The SectionIndex has to select the same nodes as the global query of the
+document, for both parser backends.
+"""
+
+
+import pytest
+import parser_backend
+import section_index
+
+
+HTML = """<html><body><div id="content"><h1>Location</h1>
+<div class="property-location">
+<div class="x"><span>a</span><span>b</span></div>
+<div class="x"><span>c</span><span>d</span></div>
+</div></div></body></html>"""
+
+POSITIONAL_SELECTORS = [
+    '.property-location .x:first',
+    '.property-location .x:last',
+    '.property-location .x span:gt(0)',
+    '.property-location .x span:lt(1)',
+    '.property-location span:eq(1)',
+    '.property-location .x span:last',
+    '.property-location span:odd',
+    '.property-location span:even',
+]
+
+
+@pytest.fixture(params=parser_backend.BACKENDS)
+def doc(request):
+    return parser_backend.parse(HTML, request.param)
+
+
+@pytest.mark.parametrize('css_selector', POSITIONAL_SELECTORS + [
+    '.property-location .x span',
+    '.property-location span:first-child',
+    "#content [data-bind='visible: x'] span",
+])
+def test_same_nodes_as_global_query(doc, css_selector):
+    index = section_index.SectionIndex(doc)
+    assert list(index(css_selector)) == list(doc(css_selector))
+    # The memoized nodes are the same.
+    assert list(index(css_selector)) == list(doc(css_selector))
+
+
+@pytest.mark.parametrize('css_selector', POSITIONAL_SELECTORS)
+def test_positional_selectors_not_split(css_selector):
+    assert section_index.has_positional(css_selector)
+    assert section_index.split_selector(css_selector) is None
+
+
+def test_colon_in_attribute_isnt_positional():
+    css_selector = "[data-bind='visible: hasSubways'] .head .column"
+    assert not section_index.has_positional(css_selector)
+    assert section_index.split_selector(css_selector) == (
+        'data-bind', 'visible: hasSubways', '.head .column')
+
+
+@pytest.mark.parametrize('css_selector', POSITIONAL_SELECTORS)
+def test_positional_prefix_not_memoized(css_selector):
+    rest = css_selector.split(' ', 1)[1]
+    assert section_index._descendant_steps(rest) == [rest]
+
+
+def test_prefix_memoized(doc):
+    index = section_index.SectionIndex(doc)
+    assert list(index('.property-location .x span')) == \
+        list(doc('.property-location .x span'))
+    # The leading part '.property-location .x' is selected only once.
+    assert list(index('.property-location .x b')) == []
+    assert index.memo_stats() == {'hits': 1, 'misses': 3, 'size': 3}
+
+
+def test_memoized_nodes_are_copied(doc):
+    index = section_index.SectionIndex(doc)
+    spans = index('.property-location span')
+    spans.extend(index('#content h1'))
+    assert len(index('.property-location span')) == 4
@@ -0,0 +1,39 @@
+"""
+Each css selector is translated to XPath once per process, counted by the
+hits and misses of selector_cache.stats().
+"""
+
+
+import pytest
+import parser_backend
+import selector_cache
+import summary
+
+
+@pytest.fixture(autouse=True)
+def clear():
+    selector_cache.clear()
+    yield
+    selector_cache.clear()
+
+
+def test_hits_and_misses():
+    xpath = selector_cache.xpath('.a span')
+    assert selector_cache.stats() == {'hits': 0, 'misses': 1, 'size': 1}
+    assert selector_cache.xpath('.a span') is xpath
+    assert selector_cache.translate('.a span') == xpath.path
+    assert selector_cache.stats() == {'hits': 2, 'misses': 1, 'size': 1}
+    selector_cache.translate('.a span', 'descendant::')
+    assert selector_cache.stats() == {'hits': 2, 'misses': 2, 'size': 2}
+
+
+@pytest.mark.parametrize('backend', parser_backend.BACKENDS)
+def test_translated_once(pages, backend):
+    summary.Summary(parser_backend.parse_file(pages[0], backend), '001-1')
+    first = selector_cache.stats()
+    assert first['misses'] == first['size'] > 0
+    # The pages of the same structure use the same selectors.
+    summary.Summary(parser_backend.parse_file(pages[1], backend), '002-1')
+    second = selector_cache.stats()
+    assert second['misses'] == first['misses']
+    assert second['hits'] > first['hits']
@@ -0,0 +1,32 @@
+"""
+The stream input mode, which keeps only the nodes to be crawled, gives the
+same Summary.result as the document parsed as a whole.
+"""
+
+
+import pytest
+import batch
+import parser_backend
+from benchmark import page_gen
+
+
+@pytest.fixture(scope='module')
+def large_page(tmp_path_factory):
+    path = tmp_path_factory.mktemp('large') / '100-1.html'
+    path.write_text(page_gen.page(tenants=300, traffic=100, market_tables=6,
+                                  amenities=50, demographics=20, seed=7),
+                    encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('backend', parser_backend.BACKENDS)
+@pytest.mark.parametrize('only', [None, ['Sale', 'Tenants']])
+def test_same_result(pages, large_page, backend, only):
+    for path in pages + [large_page]:
+        default = batch.crawl_file(path, backend, only).result
+        stream = batch.crawl_file(path, backend, only,
+                                  input_mode='stream').result
+        assert stream == default
+        assert list(stream) == list(default)
+        assert stream == batch.crawl_file(path, backend, only,
+                                          input_mode='read').result
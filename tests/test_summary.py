@@ -0,0 +1,37 @@
+"""
+The lazy and the 'only' crawling of summary.Summary.
+"""
+
+
+import pytest
+import batch
+import parser_backend
+import summary
+
+
+def test_lazy_only(pages):
+    doc = parser_backend.parse_file(pages[0], 'lxml')
+    whole = summary.Summary(doc, '001-1').result
+    s = summary.Summary(parser_backend.parse_file(pages[0], 'lxml'),
+                        '001-1', lazy=True, only=['Sale', 'Tenants'])
+    # Nothing is crawled before the result is accessed.
+    assert s._segments == {}
+    result = s.result
+    # The ID and the address keys start with two or three spaces.
+    assert result == {key: value for key, value in whole.items()
+                      if key.startswith(('  ', 'Sale_', 'Tenants_'))}
+    assert any(key.startswith('Tenants_') for key in result)
+    assert s.result is result
+
+
+@pytest.mark.parametrize('only', [['Sales'], ['Sale', 'sale']])
+def test_unknown_only_segments(pages, only):
+    doc = parser_backend.parse_file(pages[0], 'lxml')
+    with pytest.raises(ValueError):
+        summary.Summary(doc, '001-1', lazy=True, only=only)
+
+
+def test_unknown_only_segments_of_batch(pages, tmp_path):
+    with pytest.raises(ValueError):
+        batch.run_batch(pages, 1, json_path=str(tmp_path), only=['Sales'])
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,95 @@
+"""
+The repeated label pairs of tool_funcs.PairsRecord, resolved by
+choose_duplicate(), and the column-major order of the numbered-header
+tables.
+"""
+
+
+import json
+import pytest
+import dup_policy
+import tool_funcs
+
+
+@pytest.fixture(autouse=True)
+def policy(tmp_path, monkeypatch):
+    """The 'last' default policy, so it's told from the first pair."""
+    path = tmp_path / 'policy.json'
+    path.write_text(json.dumps({'default': 'last',
+                                'report': str(tmp_path / 'report.jsonl')}))
+    monkeypatch.setattr(dup_policy, '_policy', None)
+    dup_policy.load_policy(str(path))
+
+
+@pytest.mark.parametrize('values,inp,choice', [
+    (['', '', ''], 0, 1),
+    (['', '', ''], 3, 1),
+    (['', '$5', ''], 0, 2),
+    (['$5', '', '$5'], 3, 1),
+    (['$5', '$6'], 1, 1),
+    (['$5', '$6'], 2, 2),
+    # Out of range, chosen by the policy.
+    (['$5', '$6'], 3, 2),
+    (['$5', '$6'], -1, 2),
+    (['$5', '$6', ''], 0, 3),
+])
+def test_choose_duplicate(values, inp, choice):
+    assert tool_funcs.choose_duplicate('Sale_Price', values, inp,
+                                       'Sale') == choice
+
+
+def build(pairs):
+    record = tool_funcs.PairsRecord()
+    for key, value in pairs:
+        record.add(key, value)
+    return record
+
+
+def test_pairs_without_repeated_keys():
+    pairs = [('a', '1'), ('b', '2'), ('c', '3')]
+    record = build(pairs)
+    record.resolve(lambda key, values: pytest.fail('no repeated key'))
+    assert list(record.pairs()) == pairs
+
+
+def test_non_contiguous_repeated_keys():
+    record = build([('a', '1'), ('b', '2'), ('a', ''), ('c', '3'),
+                    ('b', '4'), ('a', '5')])
+    chosen = {}
+
+    def choose(key, values):
+        chosen[key] = values
+        return {'a': 3, 'b': 1}[key]
+    record.resolve(choose)
+    assert chosen == {'a': ['1', '', '5'], 'b': ['2', '4']}
+    # The kept pairs stay in the order of the web-page.
+    assert list(record.pairs()) == [('b', '2'), ('c', '3'), ('a', '5')]
+
+
+def test_resolved_by_choose_duplicate():
+    record = build([('Sale_Price', ''), ('Sale_Type', 'Investment'),
+                    ('Sale_Price', '$5'), ('Sale_Type', '')])
+    record.resolve(lambda key, values: tool_funcs.choose_duplicate(
+        key, values, 0, 'Sale'))
+    assert list(record.pairs()) == [('Sale_Type', 'Investment'),
+                                    ('Sale_Price', '$5')]
+
+
+def test_column_major_pads_ragged_rows():
+    rows = [['a1', 'a2', 'a3'], ['b1'], [], ['d1', 'd2']]
+    assert list(tool_funcs.column_major(rows)) == [
+        'a1', 'b1', '', 'd1', 'a2', '', '', 'd2', 'a3', '', '', '']
+    assert list(tool_funcs.column_major([['a'], []], pad='-')) == \
+        ['a', '-']
+    assert list(tool_funcs.column_major([])) == []
+
+
+def test_numbering_headers_same_as_numpy():
+    numpy = pytest.importorskip('numpy')
+    rows = [['r{0}_{1}'.format(r, c) for c in range(4)] for r in range(3)]
+    headers, data = tool_funcs.rearrange_table_numbering_headers(
+        {'headers': ['h0', 'h1', 'h2', 'h3'], 'data': rows}, 'Tenants')
+    assert data == numpy.array(rows).ravel('F').tolist()
+    assert headers[:4] == ['Tenants_h0_1', 'Tenants_h0_2', 'Tenants_h0_3',
+                           'Tenants_h1_1']
+    assert len(headers) == len(data)
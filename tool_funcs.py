@@ -1,5 +1,7 @@
-import numpy
+import itertools
 import sys
+import dup_policy
+import metrics
 
 
 def pairs_gene(pq_doc, css_selector, seg_prefixes,
@@ -21,153 +23,119 @@ def pairs_gene(pq_doc, css_selector, seg_prefixes,
         assigned, there would be "two possible case":
             1. there is no repeated key in the pair-name list, then the
             code will continue normally;
-            2. the repeated key hasn't been recognized, it needs to be chosen
-            manually.
+            2. the repeated key hasn't been recognized, it will be chosen by
+            the duplicate resolution policy, see in dup_policy.py.
 
     :return: A <zip object> of the pair_name list and pair_value list
     """
     assert isinstance(add_name, list) and isinstance(add_value, list), \
         "In tool_funcs.py, label_pairs()," \
         "add_name or add_value is not type of list"
+    assert len(add_name) == len(add_value), \
+        "In tool_funcs.py, label_pairs(), pair-length doesn't match" \
+        "len(add_name) != len(add_value)"
 
     # filter_doc is the PyQuery doc corresponding to the crawling part
     filter_doc = pq_doc(css_selector).find('.label-value-pair')
-    k = [seg_prefixes + '_' + item('span').eq(0).text()
-         for item in filter_doc.items()] + add_name
-    v = [item('span:gt(0)').text()
-         for item in filter_doc.items()] + add_value
-
-    # judge whether there are repeated keys in k-list(pair_name list)
-    # and decide which one will be used
-    if len(set(k)) != len(k):
-        # rep_k is a list contains all repeated keys as
-        # (key start position, key, repeat No. of the key)
-        rep_k = [(k.index(rep_k), rep_k, k.count(rep_k))
-                 for rep_k in set(k)
-                 if k.count(rep_k) > 1]
-        # for each repeated key, choose one of them
-        # del_po is the list containing all the positions of repeated k-v
-        # pairs which will be deleted
-        del_po = []
-        for item in rep_k:
-            del_po += select_duplicate_k_v(item, k, v, inp)
-        delete_duplicate(del_po, k, v)
-    assert len(k) == len(v), \
-        "In tool_funcs.py, label_pairs(), pair-length doesn't match" \
-        "len(pair_name) != len(pair_value)"
-    return zip(k, v)
-
-
-def delete_duplicate(del_po, k_li, v_li):
-    for item in del_po:
-        del k_li[item]
-        del v_li[item]
-
-
-def select_duplicate_k_v(item, k_li, v_li, inp):
-    """select_duplicate_k_v(item, k_li, v_li, inp) -> del_position list
-
-    This method is used for determining whether there are repeated pair-name
-    in the pair-name list, e.g., ["sale", "building", "properties", "sale],
-    whose "sale" is the repeated pair-name in this list. If it is, this
-    method will return a list to indicate which position of the pair-name
-    and pair-value will be delete.
+    record = PairsRecord()
+    for item in filter_doc.items():
+        # The first span is the label, the others are the value.
+        spans = item('span')
+        record.add(seg_prefixes + '_' + spans.eq(0).text(),
+                   spans.__class__(spans[1:]).text())
+    for name, value in zip(add_name, add_value):
+        record.add(name, value)
+
+    # Decide which one of each repeated key will be used.
+    record.resolve(lambda key, values: choose_duplicate(
+        key, values, inp, seg_prefixes))
+    return record.pairs()
+
+
+class PairsRecord(object):
+    """
+    The record builder of the label pairs of pairs_gene(). The pairs are
+    collected in one pass, and the positions of each key are tracked in a
+    dict, so the repeated keys are found without searching the lists. The
+    resolution of the repeated keys only marks the dropped positions, and the
+    kept pairs are built once in pairs(), in the order of the web-page.
+    """
 
-    This method only affect one duplicate item in the list, if there are more
-    than one key value duplicated , rerun the method, or build a loop.
+    __slots__ = ('keys', 'values', '_positions', '_repeated', '_dropped')
+
+    def __init__(self):
+        self.keys = []
+        self.values = []
+        # {key: [positions of the key]}
+        self._positions = {}
+        # The repeated keys, in the order of their second appearance.
+        self._repeated = []
+        self._dropped = set()
+
+    def add(self, key, value):
+        positions = self._positions.get(key)
+        if positions is None:
+            self._positions[key] = [len(self.keys)]
+        else:
+            if len(positions) == 1:
+                self._repeated.append(key)
+            positions.append(len(self.keys))
+        self.keys.append(key)
+        self.values.append(value)
+
+    def resolve(self, choose):
+        """Keep one pair of each repeated key.
+
+        :param:
+        :choose: Function of (key, values of the key) -> which one (1, 2,
+            3...) of the pairs will be kept.
+        """
+        for key in self._repeated:
+            positions = self._positions[key]
+            choice = choose(key, [self.values[i] for i in positions])
+            self._dropped.update(i for n, i in enumerate(positions, 1)
+                                 if n != choice)
+
+    def pairs(self):
+        """pairs() -> <zip obj. of the kept pair_name and pair_value>"""
+        if not self._dropped:
+            return zip(self.keys, self.values)
+        kept = [i for i in range(len(self.keys)) if i not in self._dropped]
+        return zip([self.keys[i] for i in kept],
+                   [self.values[i] for i in kept])
+
+
+def choose_duplicate(key, values, inp=0, seg_prefixes=""):
+    """choose_duplicate(key, values, inp, seg_prefixes) -> choice number
+
+    This function is used for choosing one of the pairs with the same
+    pair-name, e.g., "sale" in ["sale", "building", "properties", "sale"].
 
     :param:
-    :inp: See function 'label_pairs()', by default value of 0 in
-        order to be checked in the if statement of '1<=inp<=n'. Otherwise, it
-        would go through the check directly.
-    :item: A tuple contains 3 parts as (po, k, n) as following
-        (repeated key's start position, the repeated key, the No. of the key)
-    :k_li: The original pair-name list.
-    :v_li: The original pair-value list.
-    :k_li_rep_k_idx: The repeated key index in the original pair-name list.
-    :rep_k_v: The list contains all values of the repeated key.
-    :rep_k_v_set: Convert the rep_k_v list to set (without repeated item).
-    :ori_k_idx_inp: A dict contains the original key index(key) and
-        repeated ky index(value) plus 1 (+1) as the 'inp' value.
-        For example,
-        pair-name list is: ['a', 'c' 'bb', 'd', 'bb', 'bb', 'k', 'y', 'bb']
-        repeated key list is: ['bb', 'bb', 'bb', 'bb']
-        (po, k, n) is: (2, 'bb', 4)
-        Thus, the ori_k_idx_inp is {2:1, 4:2, 5:3, 8:4}
-        Key of the dict 'ori_k_idx_inp' is the index of the pair-name list.
-        Value of the dict 'ori_k_idx_inp' is the repeated time as the 'inp'
-        value.
-    :inp_ori_k_idx: Switch the key, value of the ori_k_idx_inp as the
-        'value':'key' dict.
-
-    :return: A list contains the repeated keys' positions to be deleted.
+    :key: The repeated pair-name (with the segment prefix).
+    :values: All values of the repeated key, in the order of the web-page.
+    :inp: See function 'pairs_gene()', the choice assigned in the code, it's
+        used when it's in '1<=inp<=n' and the values can't decide.
+    :seg_prefixes: See function 'pairs_gene()', used for looking up the
+        rule of the repeated key in the duplicate resolution policy.
+
+    :return: Which one (1, 2, 3...) of the pairs will be kept:
+        1. the first one if all values are "";
+        2. the only one with a valid value, if only one value isn't "";
+        3. the 'inp' one;
+        4. otherwise, the one chosen by the duplicate resolution policy (see
+        dup_policy.py) instead of asking the user to input the choice.
     """
-    po, k, n = item[0], item[1], item[2]
-    # The following loop is used for print all the k-v pairs
-    # with the same k.
-    k_li_rep_k_idx = 0
-    rep_k_v = []
-    ori_k_idx_inp = {}
-    inp_ori_k_idx = {}
-
-    for i in range(n):
-        k_li_rep_k_idx = k_li.index(k, k_li_rep_k_idx)
-        # print("The {0} key is: {1}, value is {2}"
-        #       .format(str(i + 1), k_li[k_li_rep_k_idx], v_li[k_li_rep_k_idx]))
-        rep_k_v.append(v_li[k_li_rep_k_idx])
-        ori_k_idx_inp[k_li_rep_k_idx] = i + 1
-        inp_ori_k_idx[i + 1] = k_li_rep_k_idx
-        k_li_rep_k_idx += 1
-
-    rep_k_v_set = set(rep_k_v)
-    if rep_k_v_set == {""}:  # Repeated key only corresponds to "" value.
-        inp = 1
-    elif len(rep_k_v_set - {""}) == 1:  # Only 1 valid value to the rep key.
-        v_idx = v_li.index(tuple(rep_k_v_set - {""})[0])  # Find the index
-        # of the only valid value in the original pair-name/value list.
-        inp = ori_k_idx_inp[v_idx]  # Find the 'inp' value corresponding to
-        # this valid value index by the 'ori_k_idx_inp' dict.
-
-    # The following part is for user to input a valid int number
-    # to decide which of the repeat keys will be used. If the input is
-    # invalid, the default key will be first one.
-    if 1 <= inp <= 3:
-        pass
-    else:
-        for i in range(n):
-            try:
-                print("There are duplicated label pairs as following:")
-                print("-----" * 20, end="")
-                for h in range(n):
-                    print("\nThe {0} label-name is:\t{1}"
-                          "\n\t  label-value is:\t{2}"
-                          .format(str(h + 1), k_li[inp_ori_k_idx[h + 1]],
-                                  v_li[inp_ori_k_idx[h + 1]]))
-                print("-----" * 20)
-
-                inp = int(input("Enter which one you want "
-                                "(int number, like 1, 2, 3...):"))
-                if inp < 1 or inp > n:
-                    if i < n - 1:
-                        print('invalid input, should only input int number '
-                              'between 1 and %d, try again!'
-                              '(remaining %d times, default the first one)'
-                              % (n, (n - 1 - i)))
-                        continue
-                    else:
-                        inp = 1
-                else:
-                    break
-            except ValueError:
-                print(
-                    'invalid input, should only input int number '
-                    'between 1 and %d, '
-                    'try again! (remaining %d times, default the first one)'
-                    % (n, (n - 1 - i)))
-                if i == n - 1:
-                    inp = 1
-    del_po = [po + i for i in range(n) if i + 1 != inp]
-    return del_po
+    valid = set(values) - {""}
+    if not valid:
+        return 1
+    if len(valid) == 1:
+        return values.index(valid.pop()) + 1
+    if 1 <= inp <= len(values):
+        return inp
+    return dup_policy.choose(seg_prefixes, key[len(seg_prefixes) + 1:]
+                             if key.startswith(seg_prefixes + '_') else key,
+                             values)
 
 
 def crawl_table(pq_doc, headers_css="", first_table_row_css="", cell_css="",
@@ -240,6 +208,9 @@ def crawl_table(pq_doc, headers_css="", first_table_row_css="", cell_css="",
                                       cell_css, replace_string, data_start,
                                       data_end)
 
+    # The sub-tables (like of the Market Conditions) are counted together.
+    metrics.observe('table_rows', len(table_data),
+                    segment=seg_prefixes.split('_')[0])
     table = dict(headers=table_headers, data=table_data)
 
     table_method = {
@@ -351,6 +322,18 @@ def row_filter(data_per_row, row_start, row_end):
     return data_per_row[row_start:row_end]
 
 
+def column_major(rows, pad=""):
+    """column_major(rows, pad) -> <iterator obj. of the cells>
+
+    Stream the cells of the row lists column by column, as
+    [r1_1, r2_1, r3_1, ..., r1_2, r2_2, r3_2, ...]. The rows shorter than the
+    longest one (ragged table) are padded with 'pad', so each column has one
+    cell per row and matches the numbered headers.
+    """
+    return itertools.chain.from_iterable(
+        itertools.zip_longest(*rows, fillvalue=pad))
+
+
 def rearrange_table_numbering_headers(table, pre_add):
     """rearrange_table_numbering_headers(table)
         -> <tuple obj. of headers and data>
@@ -373,9 +356,8 @@ def rearrange_table_numbering_headers(table, pre_add):
     h = ["{0}_{1}".format(pre_add, item) for item in table['headers']]
     d = table['data']
     t_headers = [item + "_" + str(i + 1) for item in h for i in range(len(d))]
-    # Switch flatten to ravel
-    # t_data = list(numpy.array(d).flatten('F'))
-    t_data = numpy.array(d).ravel('F').tolist()
+    # The column-major order of the data, see in tool_funcs.column_major().
+    t_data = list(column_major(d))
     return t_headers, t_data
 
 